@@ -0,0 +1,87 @@
+"""
+Micro-benchmark of the constants substitution done by expr2sympy on every
+line, compared to the previous one that parsed every constant and
+substituted them one by one.
+
+Run from the repository root:
+
+    python benchmarks/bench_constants.py [--repeat N]
+"""
+
+import argparse
+import sys
+from os.path import join, dirname, abspath
+from timeit import default_timer
+
+sys.path.insert(0, join(dirname(abspath(__file__)), "..", "symi"))
+
+from sympy.parsing.sympy_parser import parse_expr  # noqa: E402
+from expr2sympy import replace_constants, replacement_tables  # noqa: E402
+from special_values import get_values  # noqa: E402
+
+
+# Lines _______________________________________________________________________
+
+LINES = ["x**2 + 2*x + 1", "e**(i*pi) + 1", "cos(tau) + itau/2", "inf - x",
+         "Matrix([[a, b], [c, d]])*j",
+         "(a*x + b*y + c*z)**3 - ipi*sin(omega*t + phi)"]
+
+
+# Substitutions _______________________________________________________________
+
+def previous(sym, options):
+    """
+    Constants substitution used before replace_constants()
+    """
+    constants = dict(get_values()[2])
+    if options["tau_kills_pi"]:
+        constants["itau"] = "I*tau"
+    for const in constants:
+        sym = sym.subs(parse_expr(const), parse_expr(constants[const]))
+    if options["tau_kills_pi"]:
+        sym = sym.subs(parse_expr("tau"), parse_expr("2*pi"))
+    return sym
+
+
+def current(sym, options):
+    """
+    Constants substitution of expr2sympy
+    """
+    return replace_constants(sym,
+                             replacement_tables(options)["constants_tau"])
+
+
+# Main ________________________________________________________________________
+
+def timing(substitution, sym, options, repeat):
+    start = default_timer()
+    for _ in range(repeat):
+        substitution(sym, options)
+    return (default_timer() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=200,
+                        help="Number of substitutions timed per line")
+    args = parser.parse_args()
+
+    print(f"{'tau_kills_pi':<14}{'line':<48}{'previous (us)':>15}"
+          f"{'current (us)':>14}{'speedup':>10}")
+    for tau_kills_pi in [False, True]:
+        options = {"implicit_multiplication": True,
+                   "tau_kills_pi": tau_kills_pi,
+                   "diff_variable": None,
+                   "integration_variable": None,
+                   "simplify_level": "full"}
+        for line in LINES:
+            sym = parse_expr(line)
+            assert previous(sym, options) == current(sym, options)
+            prev = timing(previous, sym, options, args.repeat) * 1e6
+            cur = timing(current, sym, options, args.repeat) * 1e6
+            print(f"{str(tau_kills_pi):<14}{line[:46]:<48}{prev:>15.1f}"
+                  f"{cur:>14.1f}{prev / cur:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
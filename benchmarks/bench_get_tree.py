@@ -0,0 +1,121 @@
+"""
+Benchmark of expr_manager.get_tree on expressions with 10 to 10,000
+operations, compared to the previous builder that looked for the leaf of
+every operand in the whole operations list.
+
+Run from the repository root:
+
+    python benchmarks/bench_get_tree.py [--max-reference N]
+"""
+
+import argparse
+import sys
+from os.path import join, dirname, abspath
+from timeit import default_timer
+
+sys.path.insert(0, join(dirname(abspath(__file__)), "..", "symi"))
+
+from expr_manager import Operation, get_tree  # noqa: E402
+
+
+# Previous tree builder _______________________________________________________
+
+def get_tree_reference(operations_list):
+    """
+    Tree builder used before the interval nesting one, kept as a reference.
+    """
+    def find_leaf(min_index, max_index, exclude_op):
+        max_len = -1
+        index = None
+        for i_op, op in enumerate(operations_list):
+            if op.indices[0][0] < min_index or \
+                    op.indices[-1][1] > max_index or i_op == exclude_op:
+                continue
+            if op.length > max_len:
+                max_len = op.length
+                index = i_op
+        return index
+
+    parents = [-1] * len(operations_list)
+    for i_op, op in enumerate(operations_list):
+        for i_i, leaf_index in enumerate(op.indices):
+            leaf = find_leaf(leaf_index[0], leaf_index[1], i_op)
+            if leaf is not None:
+                parents[leaf] = i_op
+                op.children[i_i] = leaf
+    return parents
+
+
+# Synthetic operations lists __________________________________________________
+
+def operation(operator, indices, is_fct=False):
+    """
+    Operation formatted like the ones of expr_manager.find_everything
+    """
+    return Operation(operator, operator, is_fct, indices, [''] * len(indices))
+
+
+def polynomial(n_terms):
+    """
+    Operations of 1*x^1+2*x^2+...+n*x^n (3 operations per term)
+    """
+    all_op = []
+    plus = []
+    begin = 1
+    for i in range(1, n_terms + 1):
+        coef, power = str(i), str(i)
+        end = begin + len(coef) + 3 + len(power)
+        x = begin + len(coef) + 1
+        plus.append((begin, end))
+        all_op.append(operation('*', [(begin, begin + len(coef)),
+                                      (x, end)]))
+        all_op.append(operation('^', [(x, x + 1), (x + 2, end)]))
+        begin = end + 1
+    all_op.append(operation('+', plus))
+    return all_op
+
+
+def composition(depth):
+    """
+    Operations of sin(sin(...sin(x)...)) (one operation per level)
+    """
+    return [operation('sin', [(4 * i + 1, 5 * depth + 2 - i)], True)
+            for i in range(1, depth + 1)]
+
+
+# Main ________________________________________________________________________
+
+def timing(builder, all_op):
+    for op in all_op:
+        op.children = [None] * len(op.indices)
+    start = default_timer()
+    builder(all_op)
+    return default_timer() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-reference", type=int, default=2000,
+                        help="Largest number of operations timed with the "
+                             "previous builder (it is quadratic)")
+    args = parser.parse_args()
+
+    print(f"{'expression':<12}{'operations':>12}{'previous (s)':>16}"
+          f"{'current (s)':>14}{'speedup':>10}")
+    for name, generator, sizes in [
+            ("polynomial", polynomial, [3, 30, 300, 3333]),
+            ("composition", composition, [10, 100, 1000, 10000])]:
+        for size in sizes:
+            all_op = generator(size)
+            current = timing(get_tree, all_op)
+            if len(all_op) <= args.max_reference:
+                previous = timing(get_tree_reference, all_op)
+                print(f"{name:<12}{len(all_op):>12}{previous:>16.4f}"
+                      f"{current:>14.4f}{previous / current:>9.1f}x")
+            else:
+                print(f"{name:<12}{len(all_op):>12}{'-':>16}"
+                      f"{current:>14.4f}{'-':>10}")
+
+
+if __name__ == "__main__":
+    main()
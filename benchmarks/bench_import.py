@@ -0,0 +1,63 @@
+"""
+Benchmark of the startup time of Symi, launched many times like from a shell
+script. SymPy is only imported when the first expression is evaluated, so the
+launches that do not evaluate any expression do not pay for it.
+
+Run from the repository root:
+
+    python benchmarks/bench_import.py [--runs N]
+"""
+
+import argparse
+import subprocess
+import sys
+from os.path import join, dirname, abspath
+from statistics import median
+from timeit import default_timer
+
+SYMI = join(dirname(abspath(__file__)), "..", "symi", "__main__.py")
+
+
+# Launches ____________________________________________________________________
+
+LAUNCHES = [
+    ("python", [sys.executable, "-c", "pass"], None),
+    ("import sympy", [sys.executable, "-c", "import sympy"], None),
+    ("symi --help", [sys.executable, SYMI, "--help"], None),
+    ("symi --batch: vars", [sys.executable, SYMI, "--batch"], "vars\n"),
+    ("symi --batch: options", [sys.executable, SYMI, "--batch"],
+     "tau_kills_pi on\noptions\n"),
+    ("symi --batch: x^2", [sys.executable, SYMI, "--batch"], "x^2\n"),
+]
+
+
+# Main ________________________________________________________________________
+
+def timing(command, stdin, runs):
+    """
+    Wall times of the launches of a command, in seconds
+    """
+    times = []
+    for _ in range(runs):
+        start = default_timer()
+        subprocess.run(command, input=stdin, text=True, check=True,
+                       stdout=subprocess.DEVNULL)
+        times.append(default_timer() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10,
+                        help="Number of launches of every command")
+    args = parser.parse_args()
+
+    print(f"{'launch':<28}{'min (ms)':>12}{'median (ms)':>14}")
+    for name, command, stdin in LAUNCHES:
+        times = timing(command, stdin, args.runs)
+        print(f"{name:<28}{min(times) * 1e3:>12.1f}"
+              f"{median(times) * 1e3:>14.1f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Benchmark suite of the Symi hot paths: parsing the expressions
+(find_everything, get_tree, render_from_tree, replace_many), converting them
+to Sympy (expr2sympy), substituting the variables (subs / sub_num), the
+numeric evaluation at several precisions (evalf), evaluating an expression
+over an array (vectorized, compared to sub_num at every point) or a grid
+(table), and evaluating whole worksheets (SymiInstance.parse_line).
+
+The expressions are synthetic ones of growing size and depth, and the
+worksheets in benchmarks/worksheets. The results can be saved as JSON and
+compared to the ones of another commit to catch regressions.
+
+Run from the repository root:
+
+    python benchmarks/bench_suite.py [--filter TEXT] [--repeat N]
+        [--min-time SECONDS] [--output FILE] [--compare FILE]
+        [--threshold RATIO]
+
+The exit status is 1 if a case is slower than in the compared results by more
+than the threshold.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from glob import glob
+from io import StringIO
+from os.path import join, dirname, abspath, basename, splitext
+from statistics import median
+from timeit import default_timer
+
+ROOT = join(dirname(abspath(__file__)), "..")
+sys.path.insert(0, join(ROOT, "symi"))
+
+import sympy  # noqa: E402
+import vectorize  # noqa: E402
+from expr_manager import find_everything, get_tree, render_from_tree, \
+    replace_many  # noqa: E402
+from expr2sympy import expr2sympy, replacement_tables, sub_num, \
+    SIMPLIFY_CACHE  # noqa: E402
+from variables import VariableStore  # noqa: E402
+from SymiInstance import SymiInstance  # noqa: E402
+
+
+OPTIONS = {"implicit_multiplication": True,
+           "num_tolerance": 1e-10,
+           "num_precision": None,
+           "simplify_cache": 0,
+           "simplify_level": "full",
+           "integration_variable": None,
+           "diff_variable": None,
+           "tau_kills_pi": False,
+           "always_sub": False,
+           "always_num": False}
+
+# The simplify cache is shared by the whole session, so that it is disabled
+# to time the same computation again and again, except in the cases showing
+# its effect
+CACHED_OPTIONS = dict(OPTIONS, simplify_cache=64)
+
+
+# Synthetic expressions _______________________________________________________
+
+def polynomial(n_terms):
+    """
+    1*x^1+2*x^2+...+n*x^n
+    """
+    return "+".join(f"{i}*x^{i}" for i in range(1, n_terms + 1))
+
+
+def composition(depth):
+    """
+    sin(cos(sin(...(x)...))), depth functions
+    """
+    functions = ["sin(", "cos("]
+    return "".join(functions[i % 2] for i in range(depth)) + "x" + \
+        ")" * depth
+
+
+def fraction(depth):
+    """
+    Continued fraction 1/(1+1/(1+...1/(1+x)...)), depth levels
+    """
+    return "1/(1+" * depth + "x" + ")" * depth
+
+
+def variables_chain(length):
+    """
+    Variables x0 = x1 + 0*y, x1 = x2 + 1*y, ..., and an expression using
+    all of them. The store keeps the substituted values between the calls,
+    like in a session
+    """
+    variables = {f"x{i}": sympy.parse_expr(f"x{i + 1} + {i}*y")
+                 for i in range(length)}
+    expression = sympy.parse_expr("+".join(f"x{i}" for i in range(length)))
+    return VariableStore(variables), expression
+
+
+# Cases _______________________________________________________________________
+
+def cases():
+    """
+    Benchmark cases
+
+    Returns
+    -------
+    cases : list of tuple
+        Name of the case, and function without arguments to time
+    """
+    tables = replacement_tables(OPTIONS)
+    all_cases = []
+
+    # Parsing . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    for name, generator, sizes in [("polynomial", polynomial, [10, 100, 1000]),
+                                   ("composition", composition,
+                                    [10, 100, 1000]),
+                                   ("fraction", fraction, [10, 100, 1000])]:
+        for size in sizes:
+            expr = generator(size)
+            all_op = find_everything(expr)
+
+            def build(all_op=all_op):
+                for op in all_op:
+                    op.children = [None] * len(op.indices)
+                return get_tree(all_op)
+
+            tree = build()
+            all_cases += [
+                (f"find_everything/{name}-{size}",
+                 lambda expr=expr: find_everything(expr)),
+                (f"get_tree/{name}-{size}", build),
+                (f"render_from_tree/{name}-{size}",
+                 lambda tree=tree, all_op=all_op:
+                 render_from_tree(tree, all_op)),
+                (f"replace_many/{name}-{size}",
+                 lambda expr=expr: replace_many(expr, tables["old_fct"],
+                                                tables["new_fct"]))]
+
+    # Conversion to Sympy . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    for name, generator, sizes in [("polynomial", polynomial, [5, 20, 50]),
+                                   ("composition", composition, [1, 2, 4]),
+                                   ("fraction", fraction, [2, 8, 16])]:
+        for size in sizes:
+            expr = generator(size)
+            all_cases.append((f"expr2sympy/{name}-{size}",
+                              lambda expr=expr:
+                              expr2sympy(expr, OPTIONS, {}, False)))
+    for level in ["none", "fast", "auto"]:
+        options = dict(OPTIONS, simplify_level=level)
+        for name, expr in [("polynomial-50", polynomial(50)),
+                           ("fraction-16", fraction(16))]:
+            all_cases.append((f"expr2sympy/{name}-{level}",
+                              lambda expr=expr, options=options:
+                              expr2sympy(expr, options, {}, False)))
+
+    # Substitution  . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    for length in [4, 16, 64]:
+        variables, expression = variables_chain(length)
+        all_cases += [
+            (f"subs/chain-{length}",
+             lambda v=variables, e=expression:
+             sub_num(e, OPTIONS, v, True, False)),
+            (f"sub_num/chain-{length}",
+             lambda v=variables, e=expression:
+             sub_num(e, OPTIONS, v, True, True)),
+            (f"subs/chain-{length}-simplify-cache",
+             lambda v=variables, e=expression:
+             sub_num(e, CACHED_OPTIONS, v, True, False))]
+
+    # Numeric evaluation  . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    numbers = sympy.parse_expr("+".join(
+        f"sin({i}/7)**2*exp(-{i}/3)/(1 + {i}**2)"
+        f" + sqrt({i} + 0.5)*cos(pi*{i}/9)"
+        for i in range(1, 40)))
+    for precision in [None, 15, 50]:
+        options = dict(OPTIONS, num_precision=precision)
+        all_cases.append((f"evalf/precision-{precision or 'default'}",
+                          lambda options=options:
+                          sub_num(numbers, options, {}, False, True)))
+
+    # Evaluation over an array  . . . . . . . . . . . . . . . . . . . . . . .
+
+    x = sympy.Symbol("x")
+    expression = sympy.parse_expr("sin(x)**2*exp(-x)/(1 + x**2)")
+    all_cases.append(("sub_num/points-100",
+                      lambda: [sub_num(expression, OPTIONS, {"x": i / 100},
+                                       True, True) for i in range(100)]))
+    if vectorize.NUMPY_AVAILABLE:
+        for size in [10 ** 3, 10 ** 5, 10 ** 6]:
+            values = vectorize.array("linspace", [0, 1, size])
+            all_cases.append((f"vectorized/points-{size}",
+                              lambda values=values:
+                              vectorize.evaluate(expression, x, values)))
+        y = sympy.Symbol("y")
+        grid = [vectorize.sweep(0, 1, 0.001), vectorize.sweep(1, 100)]
+        all_cases.append(("table/rows-100100",
+                          lambda: vectorize.table(expression * y, [x, y],
+                                                  grid, StringIO())))
+
+    # Worksheets  . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    for path in sorted(glob(join(ROOT, "benchmarks", "worksheets",
+                                 "*.symi"))):
+        with open(path, "r") as f:
+            lines = f.readlines()
+
+        def worksheet(lines=lines):
+            # Every run is a new session
+            SIMPLIFY_CACHE.clear()
+            symi = SymiInstance(interactive=False)
+            with redirect_stdout(StringIO()):
+                for line in lines:
+                    try:
+                        symi.parse_line(line)
+                    except Exception:
+                        pass
+
+        all_cases.append((f"parse_line/{splitext(basename(path))[0]}",
+                          worksheet))
+    return all_cases
+
+
+# Timing ______________________________________________________________________
+
+def measure(function, repeat, min_time):
+    """
+    Time a function, like timeit: the number of calls per repetition is
+    doubled until a repetition lasts at least min_time
+
+    Parameters
+    ----------
+    function : callable
+        Function without arguments
+
+    repeat : int
+        Number of repetitions
+
+    min_time : float
+        Minimum duration of a repetition, in seconds
+
+    Returns
+    -------
+    result : dict
+        "min" and "median" time of a call over the repetitions, in seconds,
+        "number" of calls per repetition, and "repeat"
+    """
+    def repetition(number):
+        start = default_timer()
+        for _ in range(number):
+            function()
+        return (default_timer() - start) / number
+
+    function()
+    number = 1
+    while repetition(number) * number < min_time:
+        number *= 2
+    times = [repetition(number) for _ in range(repeat)]
+    return {"min": min(times), "median": median(times), "number": number,
+            "repeat": repeat}
+
+
+def metadata():
+    """
+    Description of the environment of the benchmark
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit,
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sympy": sympy.__version__,
+            "platform": platform.platform()}
+
+
+# Main ________________________________________________________________________
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--filter", default="",
+                        help="Only run the cases whose name contains TEXT")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of repetitions of every case")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="Minimum duration of a repetition, in seconds")
+    parser.add_argument("--output", metavar="FILE",
+                        help="Save the results as JSON")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="Compare the results to the ones saved in FILE")
+    parser.add_argument("--threshold", type=float, default=1.1,
+                        help="Ratio to the compared time above which a case "
+                             "is a regression")
+    args = parser.parse_args()
+
+    previous = {}
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            previous = json.load(f)["results"]
+
+    results = {}
+    regressions = []
+    print(f"{'case':<36}{'min (ms)':>12}{'median (ms)':>14}"
+          f"{'previous (ms)':>16}{'ratio':>8}")
+    for name, function in cases():
+        if args.filter not in name:
+            continue
+        result = measure(function, args.repeat, args.min_time)
+        results[name] = result
+        row = f"{name:<36}{result['min'] * 1e3:>12.3f}" \
+              f"{result['median'] * 1e3:>14.3f}"
+        if name in previous:
+            ratio = result["min"] / previous[name]["min"]
+            flag = " !" if ratio > args.threshold else ""
+            if flag:
+                regressions.append(name)
+            row += f"{previous[name]['min'] * 1e3:>16.3f}{ratio:>8.2f}{flag}"
+        print(row, flush=True)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"metadata": metadata(), "results": results}, f,
+                      indent=2)
+    if regressions:
+        print(f"\n{len(regressions)} regressions above x{args.threshold}: "
+              f"{', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,28 @@
-import readline
-from collections import Iterable
+import json
+import re
+import sys
+from collections.abc import Iterable
+from contextlib import redirect_stdout
+from io import StringIO
 from os.path import join, dirname, abspath
+from timeit import default_timer
 
 
 # Color the output ____________________________________________________________
-from sympy import simplify, parse_expr, pprint_try_use_unicode, Symbol, \
-    limit, solve, pretty
-
 import libs
+import vectorize
+from cache import LRUCache, MemoryLRUCache
 from colors import bcolors
-from expr2sympy import expr2sympy, sub_num
+from killable import run_killable, picklable, FORK_AVAILABLE
+from lazy import lazy_import
+from profiler import PROFILER, table
+from variables import VariableStore
+
+# SymPy and the conversion to SymPy are loaded when the first expression is
+# evaluated. readline is only loaded by the interactive instances.
+sympy = lazy_import("sympy")
+conversion = lazy_import("expr2sympy")
+readline = lazy_import("readline")
 
 
 # Auto Completer ______________________________________________________________
@@ -37,12 +50,106 @@ class AutoCompleter(object):
             return None
 
 
+# Variables depending on ans_ _________________________________________________
+
+def depends_on_ans(value):
+    """
+    Returns True if the value of a variable contains the variable ans_
+
+    Parameters
+    ----------
+    value : Sympy Expression
+        Value of a variable
+
+    Returns
+    -------
+    bool
+    """
+    return any(str(symbol) == "ans_"
+               for symbol in getattr(value, "free_symbols", ()))
+
+
+# JSON Output _________________________________________________________________
+
+class JSONOutput:
+    """
+    Text printed by a command line in JSON output mode, saved in the "output"
+    string of its record (see SymiInstance.parse_line_json()). The text is
+    kept in memory up to BUFFER_SIZE characters. Beyond, the beginning of the
+    record is printed, and the text is written in it as it is printed, so
+    that a big output (e.g. a table, see vectorize.table()) does not fill the
+    memory.
+
+    Parameters
+    ----------
+
+    record : dict
+        JSON record of the line
+
+    stream : file-like object
+        Text stream to print the record in
+
+    Attributes
+    ----------
+
+    streaming : bool
+        True once the beginning of the record is printed
+    """
+
+    BUFFER_SIZE = 65536
+
+    def __init__(self, record, stream):
+        """Class constructor. Read class docstring for more details"""
+        self.record = record
+        self.stream = stream
+        self.streaming = False
+        self._buffer = StringIO()
+
+    def write(self, text):
+        if self.streaming:
+            self.stream.write(json.dumps(text)[1:-1])
+            return len(text)
+        self._buffer.write(text)
+        if self._buffer.tell() > self.BUFFER_SIZE:
+            # The output key follows the input, the others are printed at
+            # the end
+            self.stream.write(
+                json.dumps({"input": self.record["input"]})[:-1] +
+                ', "output": "' + json.dumps(self._buffer.getvalue())[1:-1])
+            self.streaming = True
+            self._buffer = None
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def print_record(self):
+        """
+        Print the record, or its end if its beginning is already printed
+        """
+        if not self.streaming:
+            self.record["output"] = self._buffer.getvalue()
+            self.stream.write(json.dumps(self.record) + "\n")
+            return
+        end = {key: value for key, value in self.record.items()
+               if key not in ["input", "output"]}
+        self.stream.write('", ' + json.dumps(end)[1:] + "\n")
+
+
 # Symi Instance _______________________________________________________________
 
 class SymiInstance:
     """
     Instantiate this to create a Symi instance in your CLI
 
+    Parameters
+    ----------
+
+    interactive: bool, optional
+        If False, the instance does not print the welcome message, and does
+        not use readline for the auto completion and the history (batch
+        mode). Default is True
+
     Attributes
     ----------
 
@@ -50,17 +157,52 @@ class SymiInstance:
         Symi options dict. Contains the following keys:
             "implicit_multiplication",
             "num_tolerance",
+            "num_precision",
+            "simplify_cache",
+            "simplify_level",
             "integration_variable",
             "diff_variable",
             "tau_kills_pi",
             "always_sub",
-            "always_num"
+            "always_num",
+            "output",
+            "timeout",
+            "profile"
+
+    variables: variables.VariableStore of Sympy expressions
+        Contains the variables saved by the user. Single variables must be
+        saved with set_variable()
+
+    variables_version: int
+        Incremented every time the variables change, except for the automatic
+        update of ans_ when no other variable depends on it
+
+    ans_version: int
+        Incremented every time ans_ changes
+
+    ans_dependents: set of str
+        Names of the variables whose value depends on ans_
+
+    record: dict
+        JSON record of the line being parsed in JSON output mode, None
+        otherwise (see parse_line_json())
 
-    variables: dict of Sympy expressions
-        Contains the variables saved by the user
+    parse_cache: cache.LRUCache
+        Expressions already converted to Sympy (see expr2sympy)
+
+    simplify_cache: cache.MemoryLRUCache
+        Expressions already simplified (see expr2sympy.cached_simplify()),
+        up to the memory budget of the simplify_cache option
+
+    variables_index: dict
+        Variable names converted to Sympy, and the corresponding names (see
+        find_variable())
     """
 
     PS1 = "\nsymi> "
+    OUTPUT_FORMATS = ["pretty", "json"]
+    SIMPLIFY_LEVELS = ["none", "fast", "full", "auto"]
+    PARSE_CACHE_SIZE = 256
     welcome_msg = """
   _____                 _ 
  / ____|               (_)
@@ -74,24 +216,45 @@ class SymiInstance:
 
     # Constructor .............................................................
 
-    def __init__(self):
+    def __init__(self, interactive=True):
         """Class constructor. Read class docstring for more details"""
 
-        pprint_try_use_unicode()
+        self.interactive = interactive
+        self.variables_version = 0
+        self.ans_version = 0
+        self.ans_dependents = set()
+        self.variables_index = {}
+        self.variables_index_options = None
         self.variables = {}
+        self.parse_cache = LRUCache(self.PARSE_CACHE_SIZE)
         self.options = {
             "implicit_multiplication": True,
             "num_tolerance": 1e-10,
+            "num_precision": None,
+            "simplify_cache": 64,
+            "simplify_level": "full",
             "integration_variable": None,
             "diff_variable": None,
             "tau_kills_pi": False,
             "always_sub": False,
-            "always_num": False}
+            "always_num": False,
+            "output": "pretty",
+            "timeout": None,
+            "profile": False}
+        # Sympy is loaded when the size of the first entry is estimated
+        self.simplify_cache = MemoryLRUCache(
+            int(self.options["simplify_cache"] * 2 ** 20),
+            lambda key, simplified: conversion.simplification_size(
+                key, simplified))
+        self.record = None
         self.update_completer()
 
         self.sub = False
         self.num = False
 
+        if not self.interactive:
+            return
+
         # History . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
 
         path = join(dirname(abspath(__file__)), ".symi_history")
@@ -109,6 +272,117 @@ class SymiInstance:
 
         print(self.welcome_msg)
 
+    # Variables ...............................................................
+
+    @property
+    def variables(self):
+        """Variables saved by the user"""
+        return self._variables
+
+    @variables.setter
+    def variables(self, variables):
+        self._variables = VariableStore(variables)
+        self.variables_version += 1
+        self.ans_version += 1
+        self.ans_dependents = {name for name, value in self._variables.items()
+                               if name != "ans_" and depends_on_ans(value)}
+        self.variables_index_options = None
+
+    def set_variable(self, name, value):
+        """
+        Save a variable and update the variables version. ans_ is saved after
+        every result: it only changes the version of the variables if another
+        variable depends on it, and the conversions of the expressions using
+        ans_ are keyed on its own version (see parse_version()).
+
+        Parameters
+        ----------
+        name : str
+            Name of the variable
+
+        value : Sympy Expression
+            Value of the variable
+        """
+        if self.record is not None:
+            self.record["variables"][name] = self.forms(value)
+        if name not in self._variables and self.variables_index_options == \
+                tuple(self.options[option]
+                      for option in conversion.PARSE_OPTIONS):
+            self.variables_index.setdefault(self.name2sympy(name), name)
+        self._variables[name] = value
+        if name == "ans_":
+            self.ans_version += 1
+            if not self.ans_dependents:
+                return
+        elif depends_on_ans(value):
+            self.ans_dependents.add(name)
+        else:
+            self.ans_dependents.discard(name)
+        self.variables_version += 1
+
+    def parse_version(self, expr):
+        """
+        Version of the variables the conversion of an expression depends on
+        (see expr2sympy.parse_key())
+
+        Parameters
+        ----------
+        expr : str
+            Expression to convert
+
+        Returns
+        -------
+        version : tuple
+            Version of the variables, and version of ans_ if the expression
+            may use it
+        """
+        uses_ans = "ans_" in expr or bool(self.ans_dependents)
+        return self.variables_version, self.ans_version if uses_ans else None
+
+    def name2sympy(self, name):
+        """
+        Convert a variable name to Sympy, without substitution
+
+        Parameters
+        ----------
+        name : str
+            Name of the variable
+
+        Returns
+        -------
+        sym_name : Sympy Expression
+            Variable name converted to Sympy
+        """
+        return conversion.expr2sympy(name, self.options, self.variables,
+                                     False, self.parse_cache,
+                                     self.parse_version(name),
+                                     self.simplify_cache)
+
+    def find_variable(self, expr):
+        """
+        Find the variable whose name is the expression. The variable names
+        are converted to Sympy once for every state of the parsing options.
+
+        Parameters
+        ----------
+        expr : Sympy Expression
+            Expression to look for
+
+        Returns
+        -------
+        name : str
+            Name of the first variable whose name is expr, None if there is
+            none
+        """
+        options = tuple(self.options[option]
+                        for option in conversion.PARSE_OPTIONS)
+        if self.variables_index_options != options:
+            self.variables_index = {}
+            for name in self.variables:
+                self.variables_index.setdefault(self.name2sympy(name), name)
+            self.variables_index_options = options
+        return self.variables_index.get(expr)
+
     # Update Completer ........................................................
 
     def update_completer(self):
@@ -119,6 +393,8 @@ class SymiInstance:
         -------
         None.
         """
+        if not self.interactive:
+            return
         completer = AutoCompleter(self.options, self.variables)
         readline.set_completer(completer.complete)
         readline.parse_and_bind('tab: complete')
@@ -127,7 +403,8 @@ class SymiInstance:
 
     def print(self, expr):
         """
-        Print the expression with Sympy pretty
+        Print the expression with Sympy pretty. In JSON output mode, the
+        expression is added to the record of the line instead.
 
         Parameters
         ----------
@@ -145,13 +422,22 @@ class SymiInstance:
                     obj[i] = recursive_subs(o)
                 return obj
             else:
-                obj = simplify(obj.subs(parse_expr("tau"), parse_expr("2*pi")))
-                obj = obj.subs(parse_expr("pi"), parse_expr("tau/2"))
+                obj = conversion.cached_simplify(
+                    obj.subs(sympy.parse_expr("tau"),
+                             sympy.parse_expr("2*pi")), self.options,
+                    self.simplify_cache)
+                obj = obj.subs(sympy.parse_expr("pi"),
+                               sympy.parse_expr("tau/2"))
                 return obj
 
         if self.options["tau_kills_pi"]:
             expr = recursive_subs(expr)
-        result = pretty(expr)
+        if self.record is not None:
+            self.record["results"].append(self.forms(expr))
+            return
+        with PROFILER.stage("pretty"):
+            sympy.pprint_try_use_unicode()
+            result = sympy.pretty(expr)
         if len(result.split('\n')) > 1:
             print('')
             print(result)
@@ -175,15 +461,85 @@ class SymiInstance:
             -1 (error)
         """
 
+        if self.record is not None:
+            self.record["error"] = string
+            return -1
         print(f"{bcolors.FAIL}[ ERROR ] {string}{bcolors.ENDC}")
         return -1
 
+    # Machine-readable output .................................................
+
+    @staticmethod
+    def forms(expr):
+        """
+        Machine-readable forms of an expression
+
+        Parameters
+        ----------
+        expr : Sympy Expression
+            Expression to convert
+
+        Returns
+        -------
+        forms : dict
+            Contains the "str", "srepr" and "latex" forms of the expression
+        """
+        return {"str": str(expr), "srepr": sympy.srepr(expr),
+                "latex": sympy.latex(expr)}
+
+    def parse_line_json(self, line):
+        """
+        Parse a Symi command line like parse_line(), and print a JSON record
+        of the line instead of pretty printing the results.
+
+        The record contains the following keys:
+            "input": Symi command line
+            "status": status of the line (see parse_line())
+            "time": time spent parsing the line, in seconds
+            "results": forms of the printed expressions (see forms())
+            "variables": forms of the variables saved by the line
+            "output": any other text printed by the line
+            "error": error description, None if there is no error
+
+        A big output is printed as it comes, right after the input (see
+        JSONOutput).
+
+        Parameters
+        ----------
+        line : str
+            Symi command line
+
+        Returns
+        -------
+
+        status : int
+            Status of the line (see parse_line())
+        """
+        self.record = {"input": line.rstrip("\r\n"), "status": 1, "time": 0.,
+                       "results": [], "variables": {}, "output": "",
+                       "error": None}
+        output = JSONOutput(self.record, sys.stdout)
+        start = default_timer()
+        try:
+            with redirect_stdout(output):
+                status = self.parse_line(line)
+        except Exception as e:
+            status = self.perr(f"{type(e).__name__}: {e}")
+        output.record, self.record = self.record, None
+
+        output.record["time"] = default_timer() - start
+        output.record["status"] = status
+        output.print_record()
+        return status
+
     # Exit ....................................................................
 
     def exit(self):
         """
         Display an exit message and save the history.
         """
+        if not self.interactive:
+            return
         print("Thanks for using Symi ! See you later !")
         path = join(dirname(abspath(__file__)), ".symi_history")
         with open(path, "w+") as f:
@@ -210,7 +566,10 @@ class SymiInstance:
         sym_expr : Sympy Expression
             expr converted to Sympy
         """
-        return expr2sympy(expr, self.options, self.variables, self.sub)
+        return conversion.expr2sympy(expr, self.options, self.variables,
+                                     self.sub, self.parse_cache,
+                                     self.parse_version(expr),
+                                     self.simplify_cache)
 
     # Substitution ............................................................
 
@@ -241,9 +600,173 @@ class SymiInstance:
                     obj[i] = recursive_subs(o)
                 return obj
             else:
-                return sub_num(obj, self.options, self.variables, self.sub, self.num)
+                return conversion.sub_num(obj, self.options, self.variables,
+                                          self.sub, self.num,
+                                          self.simplify_cache)
         return recursive_subs(expr)
 
+    # Profiling ...............................................................
+
+    def parse_line_profiled(self, line):
+        """
+        Parse a Symi command line like parse_line(), timing the stages of its
+        evaluation (see profiler.Profiler). The table of the stages is printed
+        after the results, or saved in the "profile" key of the JSON record.
+        Only the evaluations are profiled: parse_line() processes the special
+        commands and the option updates before calling this method.
+
+        Parameters
+        ----------
+        line : str
+            Symi command line
+
+        Returns
+        -------
+
+        status : int
+            Status of the line (see parse_line())
+        """
+        PROFILER.enabled = True
+        start = default_timer()
+        try:
+            status = self.parse_line(line)
+        finally:
+            PROFILER.enabled = False
+            stats = PROFILER.end_line(default_timer() - start)
+        if self.record is not None:
+            self.record["profile"] = {name: {"calls": calls, "time": time}
+                                      for name, (calls, time) in stats.items()}
+        elif self.options["profile"]:
+            print(table(stats))
+        return status
+
+    # Dependencies ............................................................
+
+    def dependencies(self, line, names):
+        """
+        Variables used and saved by a Symi command line, to evaluate it in
+        another Symi instance having the same options and these variables (see
+        parallel.run_parallel()).
+
+        A line uses the variables whose name is mentioned in the line, or all
+        the variables if the substitution is applied. A name is considered
+        mentioned if the line contains one of the identifiers of the name,
+        because of the implicit multiplication.
+
+        Parameters
+        ----------
+        line : str
+            Symi command line
+
+        names : iterable of str
+            Names of the variables that may exist when the line is evaluated
+
+        Returns
+        -------
+
+        dependencies : tuple of set of str or None
+            Names of the variables the line may use, and of the variables it
+            may save. None if the line must be evaluated by this instance,
+            once the previous lines are evaluated (commands, options updates,
+            and lines saving variables with the substitution applied)
+        """
+        line = line.strip()
+        if line in ["", "vars", "options", "cache", "stats", "clear"] or \
+                line.lower() == "exit" or \
+                line.split(" ")[0] in self.options or \
+                line.split(" ")[0] == "import":
+            return None
+
+        sub = line[-1] == "!" or self.options["always_sub"]
+        line = line.rstrip("!")
+
+        # Saved variables . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+        if vectorize.parse(line) is not None or \
+                vectorize.TABLE_SYNTAX.fullmatch(line) is not None:
+            saved = set()
+        elif line[:3] == "lim" and "?" in line and "->" in line:
+            saved = {"ans_"}
+        elif "?" in line or "=" in line:
+            if sub:
+                return None
+            if "?" in line:
+                targets = [x for x in line.split("?")[1].strip().split(";")
+                           if x.strip() != ""]
+            else:
+                targets = [line.split("=")[0]]
+            try:
+                with redirect_stdout(StringIO()):
+                    saved = {str(self.name2sympy(x)) for x in targets}
+            except Exception:
+                return None
+        else:
+            saved = {"ans_"}
+
+        # Used variables  . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+        if sub or "@" in line:
+            return set(names), saved
+        used = set()
+        for name in names:
+            identifiers = re.findall(r"[^\W\d]\w*", name)
+            if not identifiers or any(x in line for x in identifiers):
+                used.add(name)
+        return used, saved
+
+    # Killable evaluation .....................................................
+
+    def evaluate_killable(self, line):
+        """
+        Evaluate a Symi command line like evaluate(), in a child process that
+        is killed if the evaluation takes more than the timeout option. The
+        variables saved by the child process, and the entries it added to the
+        parse and simplify caches, are saved again in this instance, which is
+        left unchanged if the evaluation is killed.
+
+        Parameters
+        ----------
+        line : str
+            Symi command line, stripped
+
+        Returns
+        -------
+
+        status : int
+            1 : Continue
+            -1 : error
+        """
+        caches = [self.parse_cache, self.simplify_cache]
+
+        def evaluation():
+            PROFILER.line = {}
+            before = dict(self.variables)
+            snapshots = [cache.snapshot() for cache in caches]
+            status = self.evaluate(line)
+            saved = {name: value for name, value in self.variables.items()
+                     if name not in before or value is not before[name]}
+            changes = []
+            for cache, snapshot in zip(caches, snapshots):
+                entries, hits, misses = cache.changes(snapshot)
+                changes.append(([entry for entry in entries
+                                 if picklable(entry)], hits, misses))
+            return status, saved, self.record, PROFILER.line, changes
+
+        try:
+            status, saved, record, stages, changes = run_killable(
+                evaluation, self.options["timeout"])
+        except TimeoutError as e:
+            return self.perr(str(e))
+        PROFILER.merge(stages)
+        for cache, cache_changes in zip(caches, changes):
+            cache.merge(cache_changes)
+        for name in saved:
+            self.set_variable(name, saved[name])
+        if saved:
+            self.update_completer()
+        self.record = record
+        return status
+
     # Parse line ..............................................................
 
     def parse_line(self, line):
@@ -253,10 +776,15 @@ class SymiInstance:
         Special commands:
             - "vars" : display the user-stored variables
             - "options": display Symi options
+            - "cache": display the parse and simplify caches statistics
+            - "stats": display the profiling statistics of the session
             - "clear": clear all Symi variables
             - "exit": exit Symi
             - "import": To import variables
 
+        In JSON output mode, a JSON record of the line is printed instead of
+        the results (see parse_line_json())
+
         Parameters
         ----------
         line : str
@@ -271,6 +799,9 @@ class SymiInstance:
             0 : exit
         """
 
+        if self.options["output"] == "json" and self.record is None:
+            return self.parse_line_json(line)
+
         line = line.strip()
 
         # Empty line  . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
@@ -292,6 +823,24 @@ class SymiInstance:
                 print(option, ":", self.options[option])
             return 1
 
+        # Show cache statistics . . . . . . . . . . . . . . . . . . . . . . . .
+
+        if line == "cache":
+            for key, value in self.parse_cache.stats().items():
+                print(key, ":", value)
+            conversion.resize_simplify_cache(self.simplify_cache,
+                                             self.options)
+            for key, value in self.simplify_cache.stats().items():
+                print(f"simplify_{key}", ":", value)
+            return 1
+
+        # Show profiling statistics . . . . . . . . . . . . . . . . . . . . . .
+
+        if line == "stats":
+            print(f"{PROFILER.lines} lines profiled")
+            print(table(PROFILER.session))
+            return 1
+
         # Clear variables . . . . . . . . . . . . . . . . . . . . . . . . . . .
 
         if line == "clear":
@@ -301,7 +850,7 @@ class SymiInstance:
         # Update options . . . . . . . . . . . . . . . . . . . . . . . . . . .
 
         if line.split(" ")[0] in self.options:
-            if line.split(" ")[0] in ["implicit_multiplication", "tau_kills_pi", "always_sub", "always_num"]:
+            if line.split(" ")[0] in ["implicit_multiplication", "tau_kills_pi", "always_sub", "always_num", "profile"]:
                 if len(line.split(" ")) == 1:
                     self.options[line.split(" ")[0]] = True
                     return 1
@@ -314,6 +863,62 @@ class SymiInstance:
                          f":\n"
                          f"symi> {line.split(' ')[0]} on|off")
                 return 1
+            elif line.split(" ")[0] in ["output", "simplify_level"]:
+                choices = {"output": self.OUTPUT_FORMATS,
+                           "simplify_level": self.SIMPLIFY_LEVELS}[
+                    line.split(" ")[0]]
+                if len(line.split(" ")) < 2 or \
+                        line.split(" ")[1].lower() not in choices:
+                    return self.perr(f"Error updating option "
+                         f"{line.split(' ')[0]}. Please follow the syntax "
+                         f":\n"
+                         f"symi> {line.split(' ')[0]} "
+                         f"{'|'.join(choices)}")
+                self.options[line.split(" ")[0]] = line.split(" ")[1].lower()
+                return 1
+            elif line.split(" ")[0] in ["timeout"]:
+                try:
+                    val = line.split(" ")[1].lower()
+                    val = None if val in ["off", "none"] else float(val)
+                    if val is not None and val <= 0:
+                        raise ValueError(val)
+                except (IndexError, ValueError):
+                    return self.perr(f"Error updating option "
+                         f"{line.split(' ')[0]}. Please follow the syntax "
+                         f":\n"
+                         f"symi> {line.split(' ')[0]} seconds|off")
+                if val is not None and not FORK_AVAILABLE:
+                    return self.perr(f"Error updating option "
+                         f"{line.split(' ')[0]}. The evaluations cannot be "
+                         f"interrupted on this platform")
+                self.options[line.split(" ")[0]] = val
+                return 1
+            elif line.split(" ")[0] in ["num_precision"]:
+                try:
+                    val = line.split(" ")[1].lower()
+                    val = None if val in ["off", "none"] else int(val)
+                    if val is not None and val < 1:
+                        raise ValueError(val)
+                except (IndexError, ValueError):
+                    return self.perr(f"Error updating option "
+                         f"{line.split(' ')[0]}. Please follow the syntax "
+                         f":\n"
+                         f"symi> {line.split(' ')[0]} digits|off")
+                self.options[line.split(" ")[0]] = val
+                return 1
+            elif line.split(" ")[0] in ["simplify_cache"]:
+                try:
+                    val = line.split(" ")[1].lower()
+                    val = 0 if val == "off" else float(val)
+                    if val < 0:
+                        raise ValueError(val)
+                except (IndexError, ValueError):
+                    return self.perr(f"Error updating option "
+                         f"{line.split(' ')[0]}. Please follow the syntax "
+                         f":\n"
+                         f"symi> {line.split(' ')[0]} megabytes|off")
+                self.options[line.split(" ")[0]] = val
+                return 1
             elif line.split(" ")[0] in ["num_tolerance"]:
                 try:
                     val = eval(line.split(" ")[1])
@@ -358,6 +963,46 @@ class SymiInstance:
             self.exit()
             return 0
 
+        # Evaluation  . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+        if self.options["profile"] and not PROFILER.enabled:
+            return self.parse_line_profiled(line)
+        if self.options["timeout"] is not None:
+            return self.evaluate_killable(line)
+        return self.evaluate(line)
+
+    # Evaluation ..............................................................
+
+    def evaluate(self, line):
+        """
+        Evaluate a Symi command line that is not a special command (see
+        parse_line()): expression, limit, equations or affectation.
+
+        Parameters
+        ----------
+        line : str
+            Symi command line, stripped
+
+        Returns
+        -------
+
+        status : int
+            1 : Continue
+            -1 : error
+        """
+
+        # Evaluation over arrays  . . . . . . . . . . . . . . . . . . . . . . .
+
+        array = vectorize.parse(line)
+        if array is not None:
+            return self.evaluate_array(*array)
+        try:
+            table = vectorize.parse_table(line)
+        except ValueError as e:
+            return self.perr(str(e))
+        if table is not None:
+            return self.evaluate_table(*table)
+
         # Substitution  . . . . . . . . . . . . . . . . . . . . . . . . . . . .
 
         if line[-2:] == "!!":
@@ -386,15 +1031,17 @@ class SymiInstance:
 
             fct = self.expr2sympy(line.split("?")[1])
             oldlimvar = limvar
-            sub_sym = Symbol("__SUB__SYMBOL__LIMIT__")
+            sub_sym = sympy.Symbol("__SUB__SYMBOL__LIMIT__")
             if type(limvar) != type(sub_sym):
                 fct = fct.subs(limvar, sub_sym)
                 limvar = sub_sym
 
-            lim = simplify(
-                limit(fct, limvar, limvalue, dir=direction).subs(sub_sym, oldlimvar))
+            with PROFILER.stage("limit"):
+                lim = sympy.limit(fct, limvar, limvalue, dir=direction)
+            lim = conversion.cached_simplify(lim.subs(sub_sym, oldlimvar),
+                                             self.options, self.simplify_cache)
             self.print(lim)
-            self.variables["ans_"] = lim
+            self.set_variable("ans_", lim)
             return 1
 
         # Solve Equation  . . . . . . . . . . . . . . . . . . . . . . . . . . .
@@ -418,10 +1065,11 @@ class SymiInstance:
                     tru_eqns.append(lft - rht)
 
             tru_vars = [self.expr2sympy(x) for x in varss if x.strip() != '']
-            sol = solve(tru_eqns, tru_vars)
+            with PROFILER.stage("solve"):
+                sol = sympy.solve(tru_eqns, tru_vars)
             if isinstance(sol, dict):
                 for s in sol:
-                    self.variables[str(s)] = sol[s]
+                    self.set_variable(str(s), sol[s])
             sol = self.sub_num(sol)
             self.print(sol)
             return 1
@@ -432,7 +1080,7 @@ class SymiInstance:
             var_name = self.expr2sympy(line.split("=")[0])
             var_val = self.expr2sympy(line.split("=")[1])
 
-            self.variables[str(var_name)] = self.sub_num(var_val)
+            self.set_variable(str(var_name), self.sub_num(var_val))
             self.update_completer()
             return 1
 
@@ -440,10 +1088,201 @@ class SymiInstance:
 
         else:
             simplified = self.sub_num(self.expr2sympy(line))
-            for var in self.variables:
-                if simplified - self.expr2sympy(var) == 0:
-                    self.print(self.sub_num(self.variables[var]))
-                    return 1
+            var = self.find_variable(simplified)
+            if var is not None:
+                self.print(self.sub_num(self.variables[var]))
+                return 1
             self.print(simplified)
-            self.variables["ans_"] = simplified
+            self.set_variable("ans_", simplified)
+            return 1
+
+    # Evaluation over arrays ................................................
+
+    def real_number(self, expr):
+        """
+        Numeric value of an expression, with the substitution applied
+
+        Parameters
+        ----------
+        expr : str
+            Expression to evaluate
+
+        Returns
+        -------
+        value : float
+
+        Raises
+        ------
+        ValueError
+            If the value is not a real number
+        """
+        value = conversion.sub_num(self.expr2sympy(expr), self.options,
+                                   self.variables, True, False,
+                                   self.simplify_cache).evalf()
+        if not value.is_real:
+            raise ValueError(f"{expr} is not a real number")
+        return float(value)
+
+    def array_expression(self, expr, names):
+        """
+        Convert an expression to evaluate over arrays to Sympy. The variables
+        that do not take the values of an array are substituted.
+
+        Parameters
+        ----------
+        expr : str
+            Expression to convert
+
+        names : list of str
+            Names of the variables taking the values of the arrays
+
+        Returns
+        -------
+        symbols : list of Sympy Symbol
+            Variables taking the values of the arrays
+
+        expression : Sympy Expression
+            Expression whose free symbols are among these variables
+
+        Raises
+        ------
+        ValueError
+            If a name is not a variable name, or if the expression depends on
+            other variables that are not defined
+        """
+        symbols = [self.name2sympy(name) for name in names]
+        for name, symbol in zip(names, symbols):
+            if not isinstance(symbol, sympy.Symbol):
+                raise ValueError(f"{name} is not a variable name")
+
+        expression = self.expr2sympy(expr)
+
+        # The variables taking the values of the arrays are not substituted,
+        # even if they are defined
+        variables = self.variables
+        if any(name in variables for name in names):
+            variables = VariableStore({
+                name: value for name, value in variables.items()
+                if name not in names})
+        with PROFILER.stage("substitution"):
+            expression = variables.substitute(expression)
+        unknown = expression.free_symbols - set(symbols)
+        if unknown:
+            raise ValueError(f"The expression depends on "
+                             f"{', '.join(sorted(map(str, unknown)))} that "
+                             f"must be defined to evaluate it over an array")
+        return symbols, expression
+
+    def evaluate_array(self, expr, name, array, args, path):
+        """
+        Evaluate an expression numerically for all the values of an array
+        (see vectorize.py), and print a summary of the values or save them in
+        a file. The other variables of the expression are substituted, so
+        that the variable of the array is its only free symbol.
+
+        Parameters
+        ----------
+        expr : str
+            Expression to evaluate
+
+        name : str
+            Name of the variable taking the values of the array
+
+        array : str
+            Name of the array (see vectorize.ARRAYS)
+
+        args : list of str
+            Arguments of the array, substituted and evaluated numerically
+
+        path : str or None
+            Path of the file to save the values in, None to print a summary
+
+        Returns
+        -------
+
+        status : int
+            1 : Continue
+            -1 : error
+        """
+        if not vectorize.NUMPY_AVAILABLE:
+            return self.perr("NumPy is needed to evaluate an expression over "
+                             "an array. Please install it with:\n"
+                             "pip install numpy")
+        if array not in vectorize.ARRAYS:
+            return self.perr(f"Unknown array {array}. Please use one of:\n" +
+                             "\n".join(f"{a}({arguments})" for a, arguments
+                                       in vectorize.ARRAYS.items()))
+        self.sub = False
+        self.num = False
+
+        try:
+            values = vectorize.array(array,
+                                     [self.real_number(arg) for arg in args])
+            (symbol,), expression = self.array_expression(expr, [name])
+        except ValueError as e:
+            return self.perr(str(e))
+        results = vectorize.evaluate(expression, symbol, values)
+
+        if path is not None:
+            vectorize.export(path, name, values, results)
+            print(f"{results.size} values saved to {path}")
+            return 1
+        summary = vectorize.summary(results)
+        if self.record is not None:
+            # JSON has no complex numbers
+            self.record["array"] = {key: str(value) if isinstance(
+                value, complex) else value for key, value in summary.items()}
+            return 1
+        for key, value in summary.items():
+            print(key, ":", value)
+        return 1
+
+    def evaluate_table(self, expr, ranges, path):
+        """
+        Write the CSV table of the numeric values of an expression for all
+        the combinations of the values of the ranges of its variables (see
+        vectorize.table()). The other variables of the expression are
+        substituted.
+
+        Parameters
+        ----------
+        expr : str
+            Expression to evaluate
+
+        ranges : list of tuple
+            Name of each variable, and list of the bounds of its range: start,
+            stop (included) and optionally step (1 by default), substituted
+            and evaluated numerically
+
+        path : str or None
+            Path of the CSV file to write the table in, None to print it
+
+        Returns
+        -------
+
+        status : int
+            1 : Continue
+            -1 : error
+        """
+        if not vectorize.NUMPY_AVAILABLE:
+            return self.perr("NumPy is needed to write a table. Please "
+                             "install it with:\npip install numpy")
+        self.sub = False
+        self.num = False
+
+        try:
+            values = [vectorize.sweep(*[self.real_number(bound)
+                                        for bound in bounds])
+                      for _, bounds in ranges]
+            symbols, expression = self.array_expression(
+                expr, [name for name, _ in ranges])
+        except ValueError as e:
+            return self.perr(str(e))
+
+        if path is None:
+            vectorize.table(expression, symbols, values, sys.stdout)
             return 1
+        with open(path, "w") as f:
+            rows = vectorize.table(expression, symbols, values, f)
+        print(f"{rows} rows saved to {path}")
+        return 1
@@ -1,15 +1,165 @@
 """
 Command-line interface of Symi
 """
-from SymiInstance import SymiInstance, bcolors
+from client import default_socket, run_client
+import argparse
+import os
+import sys
 import traceback
 
 
+def run_batch(symi, lines):
+    """
+    Evaluate Symi command lines one after the other, without prompt
+
+    Parameters
+    ----------
+    symi : SymiInstance
+        Symi instance evaluating the lines
+
+    lines : iterable of str
+        Symi command lines
+
+    Returns
+    -------
+    status : int
+        0 if all the lines were evaluated successfully, 1 otherwise
+    """
+    status = 0
+    for line in lines:
+        try:
+            result = symi.parse_line(line)
+        except BrokenPipeError:
+            raise
+        except Exception:
+            traceback.print_exc()
+            status = 1
+            continue
+        if result == 0:
+            break
+        if result == -1:
+            status = 1
+    return status
+
+
+def options(args):
+    """
+    Symi options set by the command-line arguments
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Command-line arguments
+
+    Returns
+    -------
+    options : dict
+        Values of the "output", "timeout" and "profile" options
+    """
+    return {"output": "json" if args.json else "pretty",
+            "timeout": args.timeout,
+            "profile": args.profile}
+
+
 def main():
     """
     Symi main function
     """
+    parser = argparse.ArgumentParser(
+        prog="symi",
+        description="Command-Line Interface for Symbolic Computation")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--file", metavar="SCRIPT",
+                        help="evaluate the lines of a Symi script and exit")
+    source.add_argument("--batch", action="store_true",
+                        help="evaluate the lines read from the standard "
+                             "input and exit")
+    source.add_argument("--serve", action="store_true",
+                        help="run a server keeping warm Symi sessions, "
+                             "listening on a Unix socket")
+    source.add_argument("--client", metavar="LINE", nargs="*",
+                        help="send the lines (or the lines read from the "
+                             "standard input if there is none) to the Symi "
+                             "server, and print the results")
+    parser.add_argument("--session", default="default",
+                        help="name of the server session evaluating the "
+                             "lines of the client (default: default)")
+    parser.add_argument("--socket", metavar="PATH", default=default_socket(),
+                        help="path of the socket of the server (default: "
+                             "%(default)s)")
+    parser.add_argument("--json", action="store_true",
+                        help="print one JSON record per line instead of "
+                             "the pretty printed results")
+    parser.add_argument("--jobs", metavar="N", type=int, default=1,
+                        help="number of processes evaluating the independent "
+                             "lines in batch mode (default: 1)")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the time spent in each stage of the "
+                             "evaluation after every line (see the profile "
+                             "option)")
+    parser.add_argument("--timeout", metavar="SECONDS", type=float,
+                        help="interrupt the evaluations taking more than "
+                             "SECONDS (see the timeout option)")
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.timeout is not None and args.timeout <= 0:
+        parser.error("--timeout must be positive")
+
+    # Client mode  . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    if args.client is not None:
+        if args.json or args.profile or args.timeout is not None or \
+                args.jobs > 1:
+            parser.error("the options of a server session are updated by "
+                         "sending Symi lines, e.g. symi --client "
+                         "'output json'")
+        sys.exit(run_client(args.client or sys.stdin, args.session,
+                            args.socket))
+
+    # The modules are only imported by the modes using them, so that Symi
+    # starts faster (the client does not even import Symi)
+    from SymiInstance import SymiInstance, bcolors
+
+    # Server mode  . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    if args.serve:
+        from server import serve
+        sys.exit(serve(args.socket, options(args)))
+
+    # Batch mode . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    if args.file is not None or args.batch:
+        if not sys.stdout.isatty():
+            bcolors.disable()
+        symi = SymiInstance(interactive=False)
+        symi.options.update(options(args))
+        if args.jobs > 1:
+            from parallel import run_parallel
+
+            def run(lines):
+                return run_parallel(symi, lines, args.jobs)
+        else:
+            def run(lines):
+                return run_batch(symi, lines)
+        try:
+            if args.file is not None:
+                with open(args.file, "r") as f:
+                    status = run(f)
+            else:
+                status = run(sys.stdin)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # The reader of the output is gone (e.g. symi --batch | head):
+            # the output left to flush is dropped
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            status = 1
+        sys.exit(status)
+
+    # Interactive mode  . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
     symi = SymiInstance()
+    symi.options.update(options(args))
     while 1:
         try:
             line = input(symi.PS1)
@@ -25,4 +175,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
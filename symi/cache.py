@@ -0,0 +1,240 @@
+"""
+Bounded caches used by Symi to avoid doing the same conversions / computations
+many times in a session.
+"""
+
+from collections import OrderedDict
+
+
+# LRU Cache ___________________________________________________________________
+
+class LRUCache:
+    """
+    Least recently used cache holding a bounded number of entries. When the
+    cache is full, the least recently used entry is dropped.
+
+    Attributes
+    ----------
+
+    max_size : int
+        Maximum number of entries
+
+    hits : int
+        Number of lookups that found their key
+
+    misses : int
+        Number of lookups that did not find their key
+    """
+
+    def __init__(self, max_size=256):
+        """Class constructor. Read class docstring for more details"""
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Returns the value of the key, and marks it as the most recently used
+
+        Parameters
+        ----------
+        key : hashable
+            Key to look up
+
+        default : any, optional
+            Value returned if the key is not in the cache. Default is None
+
+        Returns
+        -------
+        value : any
+            Value of the key, default if the key is not in the cache
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Saves the value of the key, dropping the least recently used entries
+        if the cache is full
+
+        Parameters
+        ----------
+        key : hashable
+            Key of the value
+
+        value : any
+            Value to save
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all the entries and resets the statistics
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def snapshot(self):
+        """
+        Returns the state of the cache, to find the changes made afterwards
+        (see changes())
+
+        Returns
+        -------
+        snapshot : tuple
+            Keys of the entries, hits and misses
+        """
+        return set(self._entries), self.hits, self.misses
+
+    def changes(self, snapshot):
+        """
+        Returns the entries saved and the lookups counted since a snapshot,
+        e.g. to merge them in the cache of another process (see merge())
+
+        Parameters
+        ----------
+        snapshot : tuple
+            State of the cache returned by snapshot()
+
+        Returns
+        -------
+        changes : tuple
+            List of the new (key, value) entries, and numbers of hits and
+            misses counted since the snapshot
+        """
+        keys, hits, misses = snapshot
+        return ([(key, value) for key, value in self._entries.items()
+                 if key not in keys],
+                self.hits - hits, self.misses - misses)
+
+    def merge(self, changes):
+        """
+        Saves the entries and counts the lookups of changes made in another
+        cache
+
+        Parameters
+        ----------
+        changes : tuple
+            Changes returned by changes()
+        """
+        entries, hits, misses = changes
+        for key, value in entries:
+            self.put(key, value)
+        self.hits += hits
+        self.misses += misses
+
+    def stats(self):
+        """
+        Returns the statistics of the cache
+
+        Returns
+        -------
+        stats : dict
+            Contains the keys "size", "max_size", "hits", "misses" and
+            "hit_rate"
+        """
+        lookups = self.hits + self.misses
+        return {"size": len(self),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.}
+
+
+# Memory-Bounded LRU Cache ____________________________________________________
+
+class MemoryLRUCache(LRUCache):
+    """
+    Least recently used cache holding entries up to an estimated memory
+    budget. When the budget is exceeded, the least recently used entries are
+    dropped. Entries larger than the whole budget are not saved.
+
+    Parameters
+    ----------
+
+    max_memory : int
+        Memory budget, in bytes
+
+    size_of : callable
+        Estimated memory used by an entry, in bytes, from its key and value
+
+    Attributes
+    ----------
+
+    memory : int
+        Estimated memory used by the entries, in bytes
+    """
+
+    def __init__(self, max_memory, size_of):
+        """Class constructor. Read class docstring for more details"""
+        super().__init__(max_size=None)
+        self.max_memory = max_memory
+        self.size_of = size_of
+        self.memory = 0
+        self._sizes = {}
+
+    def put(self, key, value):
+        size = self.size_of(key, value)
+        if size > self.max_memory:
+            return
+        self.memory += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self.shrink()
+
+    def resize(self, max_memory):
+        """
+        Changes the memory budget, dropping the least recently used entries
+        if it is exceeded
+
+        Parameters
+        ----------
+        max_memory : int
+            Memory budget, in bytes
+        """
+        self.max_memory = max_memory
+        self.shrink()
+
+    def shrink(self):
+        """
+        Drops the least recently used entries until the memory budget is
+        respected
+        """
+        while self.memory > self.max_memory:
+            key, _ = self._entries.popitem(last=False)
+            self.memory -= self._sizes.pop(key)
+
+    def clear(self):
+        super().clear()
+        self._sizes.clear()
+        self.memory = 0
+
+    def stats(self):
+        """
+        Returns the statistics of the cache
+
+        Returns
+        -------
+        stats : dict
+            Contains the keys "size", "memory", "max_memory", "hits",
+            "misses" and "hit_rate"
+        """
+        stats = super().stats()
+        del stats["max_size"]
+        return {"size": stats.pop("size"), "memory": self.memory,
+                "max_memory": self.max_memory, **stats}
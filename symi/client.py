@@ -0,0 +1,86 @@
+"""
+Thin client sending Symi command lines to a Symi server (see server.py)
+through a local Unix socket. It does not import SymPy, so that it starts in a
+few milliseconds.
+
+Protocol: the client sends one JSON request per line, {"session": name,
+"line": Symi command line}, and the server answers one JSON response per
+line, {"status": status of the line, "output": printed text, "error":
+traceback of the exception raised by the line or None}.
+"""
+
+import json
+import os
+import socket
+import sys
+import tempfile
+
+
+def default_socket():
+    """
+    Path of the socket of the Symi server of the user
+
+    Returns
+    -------
+    path : str
+        $XDG_RUNTIME_DIR/symi.sock if XDG_RUNTIME_DIR is defined, else
+        symi-<uid>.sock in the temporary directory
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "symi.sock")
+    return os.path.join(tempfile.gettempdir(), f"symi-{os.getuid()}.sock")
+
+
+def run_client(lines, session, path):
+    """
+    Send Symi command lines to the server, and print the results
+
+    Parameters
+    ----------
+    lines : iterable of str
+        Symi command lines
+
+    session : str
+        Name of the session evaluating the lines. Every session has its own
+        variables and options
+
+    path : str
+        Path of the socket of the server
+
+    Returns
+    -------
+    status : int
+        0 if all the lines were evaluated successfully, 1 otherwise
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+    except OSError as e:
+        connection.close()
+        print(f"Cannot connect to the Symi server on {path} ({e}). Start it "
+              f"with:\nsymi --serve", file=sys.stderr)
+        return 1
+
+    status = 0
+    with connection, connection.makefile("rw", encoding="utf-8") as stream:
+        for line in lines:
+            stream.write(json.dumps({"session": session,
+                                     "line": line.rstrip("\r\n")}) + "\n")
+            stream.flush()
+            response = stream.readline()
+            if not response:
+                print("The Symi server closed the connection",
+                      file=sys.stderr)
+                return 1
+            response = json.loads(response)
+            sys.stdout.write(response["output"])
+            if response["error"] is not None:
+                sys.stdout.flush()
+                sys.stderr.write(response["error"])
+                status = 1
+            elif response["status"] == -1:
+                status = 1
+            if response["status"] == 0:
+                break
+    return status
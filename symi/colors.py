@@ -7,4 +7,13 @@ class bcolors:
     FAIL = '\033[91m'
     ENDC = '\033[0m'
     BOLD = '\033[1m'
-    UNDERLINE = '\033[4m'
\ No newline at end of file
+    UNDERLINE = '\033[4m'
+
+    @classmethod
+    def disable(cls):
+        """
+        Remove the colors, e.g. when the output is not a terminal
+        """
+        for name in ["HEADER", "OKBLUE", "OKCYAN", "OKGREEN", "WARNING",
+                     "FAIL", "ENDC", "BOLD", "UNDERLINE"]:
+            setattr(cls, name, "")
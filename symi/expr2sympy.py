@@ -1,18 +1,37 @@
+import sys
+
+from cache import LRUCache, MemoryLRUCache
 from colors import bcolors
-from expr_manager import replace_many, apply_to_leaves, get_root_operation, \
-    is_supported, pipe_to_func
+from expr_manager import ExprTree
+from numeric import FLOAT_DIGITS, evalf
+from profiler import PROFILER
 from sympy.parsing.sympy_parser import parse_expr, standard_transformations, \
     function_exponentiation, \
     implicit_multiplication_application, split_symbols, implicit_application,\
     convert_xor
 from special_values import get_values
+from variables import VariableStore
 from sympy import Wild, nsimplify, integrate, diff, gamma, factorial, simplify
-from sympy import Symbol, Add, Mul, Pow, Function, Integer, Float
+from sympy import Symbol, Add, Mul, Pow, Function, Integer, Float, pi
+from sympy import Basic, Expr, Lambda, preorder_traversal, cancel, gcd, \
+    powsimp, count_ops
+from sympy.core.traversal import bottom_up
+from sympy.concrete.expr_with_limits import ExprWithLimits
+from sympy.polys.polyerrors import PolynomialError
+
+
+# Options changing the conversion of an expression
+PARSE_OPTIONS = ("implicit_multiplication", "tau_kills_pi", "diff_variable",
+                 "integration_variable", "simplify_level")
 
 
-def expr2sympy(expr, options, variables, sub):
+def parse_key(expr, options, sub, variables_version):
     """
-    Converts a string expression to a Sympy expression.
+    Key of the conversion of an expression in a parse cache.
+
+    The variables version is only part of the key if the conversion depends
+    on the variables, that is if the substitution is applied or if the
+    expression may contain the substitution operator @.
 
     Parameters
     ----------
@@ -20,37 +39,68 @@ def expr2sympy(expr, options, variables, sub):
         String containing a Symi expression
 
     options : dict
-        dict containing the options for parsing.
-        Might contain :
-
-        {"implicit_multiplication" : ,
-         "num_tolerance": ,
-         "tau_kills_pi":
-        }
-
-    variables: dict
-        Symi variables
+        Symi options
 
     sub : bool
         True if the substitution must be applied.
 
+    variables_version : hashable
+        Version of the Symi variables
+
     Returns
     -------
-    Sympy Expression
+    key : tuple
+        Key of the conversion
+    """
+    uses_variables = sub or "@" in expr
+    return (expr, sub, tuple(options[option] for option in PARSE_OPTIONS),
+            variables_version if uses_variables else None)
 
+
+# Replacement tables built for every state of the parsing options
+REPLACEMENT_TABLES = LRUCache(16)
+
+
+def replacement_tables(options):
     """
+    Tables used by expr2sympy to convert the expressions. They are built once
+    for every state of the parsing options (see PARSE_OPTIONS) and reused.
 
-    if not is_supported(expr):
-        print(f"{bcolors.WARNING}WARNING : The result given by this expression might be incorrect.\n"
-              "Try to retype the expression without implicit multiplication.\n"
-              "This warning can happen if you wrote useless parentheses, in "
-              f"which case, the result should be correct.{bcolors.ENDC}")
+    Parameters
+    ----------
+    options : dict
+        Symi options
 
-    if sub:
-        expr = apply_to_leaves(expr, ["@u", False])
+    Returns
+    -------
+    tables : dict
+        Contains the following keys:
+            "transformations" : parse_expr transformations
+            "trans_i" : parse_expr transformations without implicit
+                multiplication
+            "global_dict" : parse_expr global dict
+            "old_fct", "new_fct" : functions / operators replaced, and their
+                replacements (see ExprTree.replace_many())
+            "constants" : Sympy substitutions of the constants, for
+                xreplace()
+            "constants_tau" : same substitutions, also replacing tau by
+                2*pi if the tau_kills_pi option is enabled
+            "advanced" : advanced functions replacements, except __SUB that
+                depends on the variables
+            "patterns" : list of (advanced function name, Wild pattern), in
+                the order of the replacements
+
+        The tables are shared and must not be modified.
+    """
+    key = tuple(options[option] for option in PARSE_OPTIONS)
+    tables = REPLACEMENT_TABLES.get(key)
+    if tables is not None:
+        return tables
 
     fcts, operators, constants, advanced = get_values()
 
+    # Transformations . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
     transformations_ = [implicit_application, function_exponentiation,
                         convert_xor]
     add_trans = []
@@ -61,6 +111,8 @@ def expr2sympy(expr, options, variables, sub):
                        tuple(transformations_+add_trans))
     trans_i = standard_transformations + tuple(transformations_)
 
+    # Functions and operators . . . . . . . . . . . . . . . . . . . . . . . . .
+
     old_fct = []
     new_fct = []
     for fct in fcts:
@@ -78,61 +130,215 @@ def expr2sympy(expr, options, variables, sub):
     new_fct.append(["__diff", True])
     old_fct.append(["!s", False])
     new_fct.append(["factorial", True])
-    expr = pipe_to_func(expr)
-    expr = replace_many(expr, old_fct, new_fct)
-    is_smp = is_simplified(expr)
-    expr = apply_to_leaves(expr, ["MySymbol", True], True)
-    sym = parse_expr(expr, evaluate=True, transformations=trans_i,
-                     global_dict={"Symbol": Symbol,
-                                  "Add": Add,
-                                  "Mul": Mul,
-                                  "Pow": Pow,
-                                  "Function": Function,
-                                  "Integer": Integer,
-                                  "Float": Float,
-                                  "MySymbol": advanced["sym"]})
-    if options["tau_kills_pi"]:
-        constants["itau"] = "I*tau"
-    for const in constants:
-        sym = sym.subs(parse_expr(const), parse_expr(constants[const]))
+
+    # Constants . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    # Applied simultaneously, no value contains a constant except itau's one
+    # that contains tau
+    constants = {parse_expr(const): parse_expr(constants[const])
+                 for const in constants}
+    constants_tau = constants
     if options["tau_kills_pi"]:
-        sym = sym.subs(parse_expr("tau"), parse_expr("2*pi"))
+        tau = parse_expr("tau")
+        constants[parse_expr("itau")] = parse_expr("I*tau")
+        constants_tau = {const: value.xreplace({tau: 2 * pi})
+                         for const, value in constants.items()}
+        constants_tau[tau] = 2 * pi
+
+    # Advanced functions  . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    diff_variable = options["diff_variable"]
+    integration_variable = options["integration_variable"]
+
+    advanced = dict(advanced)
     advanced["__diff"] = (lambda __wild_sym__:
-                          diff(parse_expr(str(__wild_sym__), transformations=transformations), parse_expr(options["diff_variable"]))
-                          if options["diff_variable"] is not None
+                          diff(parse_expr(str(__wild_sym__), transformations=transformations), parse_expr(diff_variable))
+                          if diff_variable is not None
                           else diff(parse_expr(str(__wild_sym__), transformations=transformations)))
     advanced["__integrate"] = (lambda __wild_sym__:
-                               integrate(parse_expr(str(__wild_sym__), transformations=transformations), parse_expr(options["integration_variable"]))
-                               if options["integration_variable"] is not None
+                               integrate(parse_expr(str(__wild_sym__), transformations=transformations), parse_expr(integration_variable))
+                               if integration_variable is not None
                                else integrate(parse_expr(str(__wild_sym__), transformations=transformations)))
 
-    advanced["__SUB"] = lambda __wild_sym__: subs(__wild_sym__, variables)
+    # Replaced in reverse order, __SUB being the last advanced function
     wild_sym = Wild("__wild_sym__")
-    for adv in list(advanced)[::-1]:
+    patterns = []
+    for adv in ["__SUB"] + list(advanced)[::-1]:
         f = parse_expr(adv + "(__tmp_sym__)")
-        f = f.subs("__tmp_sym__", wild_sym)
-        sym = sym.replace(f, advanced[adv])
+        patterns.append((adv, f.subs("__tmp_sym__", wild_sym)))
+
+    tables = {"transformations": transformations,
+              "trans_i": trans_i,
+              "global_dict": {"Symbol": Symbol,
+                              "Add": Add,
+                              "Mul": Mul,
+                              "Pow": Pow,
+                              "Function": Function,
+                              "Integer": Integer,
+                              "Float": Float,
+                              "MySymbol": advanced["sym"]},
+              "old_fct": old_fct,
+              "new_fct": new_fct,
+              "constants": constants,
+              "constants_tau": constants_tau,
+              "advanced": advanced,
+              "patterns": patterns}
+    REPLACEMENT_TABLES.put(key, tables)
+    return tables
+
+
+def warn_unsupported():
+    """
+    Warns the user that the expression syntax is not fully supported
+    """
+    print(f"{bcolors.WARNING}WARNING : The result given by this expression might be incorrect.\n"
+          "Try to retype the expression without implicit multiplication.\n"
+          "This warning can happen if you wrote useless parentheses, in "
+          f"which case, the result should be correct.{bcolors.ENDC}")
+
+
+def expr2sympy(expr, options, variables, sub, cache=None,
+               variables_version=0, simplify_cache=None):
+    """
+    Converts a string expression to a Sympy expression.
+
+    Parameters
+    ----------
+    expr : str
+        String containing a Symi expression
+
+    options : dict
+        dict containing the options for parsing.
+        Might contain :
+
+        {"implicit_multiplication" : ,
+         "num_tolerance": ,
+         "tau_kills_pi":
+        }
+
+    variables: dict
+        Symi variables
+
+    sub : bool
+        True if the substitution must be applied.
+
+    cache : cache.LRUCache, optional
+        Conversions already done. If given, the conversion is looked up in it
+        before being done, and saved in it after. Default is None
 
-    sym = parse_expr(str(sym), evaluate=True,
-                     transformations=transformations)
-    for const in constants:
-        sym = sym.subs(parse_expr(const), parse_expr(constants[const]))
+    variables_version : hashable, optional
+        Version of the variables, that must change every time the variables
+        the conversion depends on change when a cache is used. Default is 0
+
+    simplify_cache : cache.MemoryLRUCache, optional
+        Simplified expressions (see cached_simplify()). Default is None
+
+    Returns
+    -------
+    Sympy Expression
+
+    """
+
+    if cache is not None:
+        key = parse_key(expr, options, sub, variables_version)
+        cached = cache.get(key)
+        if cached is not None:
+            supported, sym = cached
+            if not supported:
+                warn_unsupported()
+            return sym
+
+    with PROFILER.stage("is_supported"):
+        expr_tree = ExprTree(expr)
+        supported = expr_tree.is_supported()
+    if not supported:
+        warn_unsupported()
+
+    tables = replacement_tables(options)
+
+    with PROFILER.stage("replace_many"):
+        passes = [lambda: expr_tree.pipe_to_func(),
+                  lambda: expr_tree.replace_many(tables["old_fct"],
+                                                 tables["new_fct"])]
+        if sub:
+            passes.insert(0, lambda: expr_tree.apply_to_leaves(["@u", False]))
+        for rewrite in passes:
+            rewrite()
+            if not supported:
+                expr_tree.reparse()
+        is_smp = is_simplified(expr_tree)
+        expr_tree.apply_to_leaves(["MySymbol", True], True)
+        expr = expr_tree.render()
+
+    with PROFILER.stage("parse_expr"):
+        sym = parse_expr(expr, evaluate=True,
+                         transformations=tables["trans_i"],
+                         global_dict=tables["global_dict"])
+    with PROFILER.stage("constants"):
+        sym = replace_constants(sym, tables["constants_tau"])
+
+    advanced = {**tables["advanced"],
+                "__SUB": lambda __wild_sym__: subs(__wild_sym__, variables,
+                                                   options, simplify_cache)}
+    with PROFILER.stage("advanced"):
+        for adv, pattern in tables["patterns"]:
+            sym = sym.replace(pattern, advanced[adv])
+
+    with PROFILER.stage("parse_expr"):
+        sym = parse_expr(str(sym), evaluate=True,
+                         transformations=tables["transformations"])
+    with PROFILER.stage("constants"):
+        sym = replace_constants(sym, tables["constants"])
 
     if is_smp:
-        return simplify(sym)
-    else:
-        return sym
+        sym = cached_simplify(sym, options, simplify_cache)
 
+    if cache is not None:
+        cache.put(key, (supported, sym))
+    return sym
 
-def subs(exp, variables):
+
+def replace_constants(sym, constants):
+    """
+    Substitutes the constants in the expression, in a single xreplace pass.
+    xreplace also replaces the bound variables of the sums, integrals,
+    lambdas... (e.g. i in Sum(i, (i, 1, 10))), that must stay variables: the
+    expressions containing some are substituted with subs instead, one
+    constant after the other.
+
+    Parameters
+    ----------
+    sym : Sympy Expression
+
+    constants : dict
+        Constants and their values (see replacement_tables())
+
+    Returns
+    -------
+    sub_sym : Sympy Expression
+        Expression with the constants substituted
+    """
+    if sym.has(ExprWithLimits, Lambda):
+        return sym.subs(list(constants.items()))
+    return sym.xreplace(constants)
+
+
+def subs(exp, variables, options, cache=None):
     """
     Substitutes all the variables in the expression
     Parameters
     ----------
     exp : Sympy Expression
 
-    variables : dict
-        Keys are the old expressions, value the new ones
+    variables : dict or variables.VariableStore
+        Keys are the old expressions, value the new ones. Substituted values
+        of the variables are only kept between calls by a VariableStore
+
+    options : dict
+        Symi options
+
+    cache : cache.MemoryLRUCache, optional
+        Simplified expressions (see cached_simplify()). Default is None
 
     Returns
     -------
@@ -140,29 +346,193 @@ def subs(exp, variables):
         Expression substituted
     """
 
-    var_tuple = [(parse_expr(key), variables[key]) for key in variables]
-
-    def recursive_sub(expr, replace):
-        for _ in range(0, len(replace) + 1):
-            new_expr = expr.subs(replace)
-            if new_expr == expr:
-                return new_expr, True
-            else:
-                expr = new_expr
-        return new_expr, False
-
-    res, _ = recursive_sub(exp, var_tuple)
+    if not isinstance(variables, VariableStore):
+        variables = VariableStore(variables)
+    with PROFILER.stage("substitution"):
+        res = variables.substitute(exp)
 
     if is_simplified(str(exp)):
-        return simplify(res)
+        return cached_simplify(res, options, cache)
     else:
         return res
 
 
-def sub_num(exp, options, variables, sub, num):
+def simplification_size(key, simplified):
+    """
+    Estimated memory used by a simplify cache entry, in bytes. The
+    subexpressions shared by the expression and its simplified form are
+    counted twice.
+
+    Parameters
+    ----------
+    key : tuple
+        Simplification level and expression
+
+    simplified : Sympy Expression
+        Simplified expression
+
+    Returns
+    -------
+    size : int
+    """
+    size = 0
+    for root in (key[1], simplified):
+        for node in preorder_traversal(root):
+            size += sys.getsizeof(node) + sys.getsizeof(node.args)
+    return size
+
+
+# Largest number of operations of the expressions fully simplified at the
+# "auto" simplification level
+AUTO_SIMPLIFY_OPS = 100
+
+
+def resize_simplify_cache(cache, options):
+    """
+    Applies the simplify_cache option (memory budget in MB) to a simplify
+    cache
+
+    Parameters
+    ----------
+    cache : cache.MemoryLRUCache
+        Simplified expressions
+
+    options : dict
+        Symi options
+    """
+    budget = int(options["simplify_cache"] * 2 ** 20)
+    if cache.max_memory != budget:
+        cache.resize(budget)
+
+
+def cancel_fraction(expr):
+    """
+    Cancels the common factors of the numerator and the denominator of a
+    fraction, or of a sum of fractions with the same denominator. Unlike
+    Sympy's cancel, the fractions without common factors and the other
+    expressions are left as they are, not expanded.
+
+    Parameters
+    ----------
+    expr : Sympy Expression
+
+    Returns
+    -------
+    cancelled : Sympy Expression
+        Cancelled expression, never longer than expr (see Sympy's count_ops)
+    """
+    if expr.is_Add:
+        denoms = {term.as_numer_denom()[1] for term in expr.args}
+        if len(denoms) > 1:
+            return expr
+    elif not (expr.is_Mul or expr.is_Pow):
+        return expr
+    numer, denom = expr.as_numer_denom()
+    if numer.is_number or denom.is_number:
+        return expr
+    try:
+        if gcd(numer, denom).is_number:
+            return expr
+        cancelled = cancel(expr)
+    except PolynomialError:
+        return expr
+    return cancelled if count_ops(cancelled) <= count_ops(expr) else expr
+
+
+def fast_simplify(expr):
+    """
+    Cheap simplification: the fractions are cancelled (see cancel_fraction())
+    and the powers combined. Unlike simplify, it does not try the
+    trigonometric, logarithmic... identities, and it does not expand the
+    expression: the result is never longer than the expression.
+
+    Parameters
+    ----------
+    expr : Sympy Expression
+
+    Returns
+    -------
+    simplified : Sympy Expression
+        Simplified expression
+    """
+    if isinstance(expr, Expr):
+        simplified = powsimp(bottom_up(expr, cancel_fraction))
+        return simplified if count_ops(simplified) <= count_ops(expr) \
+            else expr
+    # Relations, tuples, conditions... are simplified in place
+    if not isinstance(expr, Basic) or not expr.args:
+        return expr
+    return expr.func(*(fast_simplify(arg) for arg in expr.args))
+
+
+def cached_simplify(expr, options, cache=None):
+    """
+    Simplifies the expression according to the simplify_level option, reusing
+    the result if the same expression was already simplified with the cache.
+    The levels are:
+        - "none": the expression is left as is
+        - "fast": cheap simplification (see fast_simplify())
+        - "full": Sympy's simplify
+        - "auto": "full" if the expression has AUTO_SIMPLIFY_OPS operations
+          or fewer (see Sympy's count_ops), "fast" otherwise
+
+    The cache is keyed by the level and the expression itself: Sympy
+    expressions are immutable, and their hash and equality compare their
+    canonical form (the one shown by srepr). Its memory budget is the
+    simplify_cache option, in MB (0 disables the cache).
+
+    Parameters
+    ----------
+    expr : Sympy Expression
+
+    options : dict
+        Symi options
+
+    cache : cache.MemoryLRUCache, optional
+        Simplified expressions, every Symi instance has its own. Default is
+        None, the expression is simplified again
+
+    Returns
+    -------
+    simplified : Sympy Expression
+        Simplified expression
+    """
+    level = options["simplify_level"]
+    if level == "none":
+        return expr
+    if level == "auto":
+        level = "full" if count_ops(expr) <= AUTO_SIMPLIFY_OPS else "fast"
+    function = simplify if level == "full" else fast_simplify
+
+    if cache is not None:
+        resize_simplify_cache(cache, options)
+    if cache is None or cache.max_memory == 0 or \
+            not isinstance(expr, Basic):
+        with PROFILER.stage("simplify"):
+            return function(expr)
+
+    key = (level, expr)
+    simplified = cache.get(key)
+    if simplified is None:
+        with PROFILER.stage("simplify"):
+            simplified = function(expr)
+        cache.put(key, simplified)
+    return simplified
+
+
+def sub_num(exp, options, variables, sub, num, cache=None):
     """
     Applies the substitution and the numeric computation
 
+    The numeric computation depends on the num_precision option:
+        - None: the expression is rationalized with the num_tolerance
+          option, and evaluated with evalf
+        - 15 digits or fewer: the expression is evaluated with float64
+          numbers (see numeric.evalf())
+        - More than 15 digits: the floats of the expression are converted
+          to the rationals they represent, and the expression is evaluated
+          with evalf at this precision
+
     Parameters
     ----------
     exp : Sympy Expression
@@ -179,6 +549,9 @@ def sub_num(exp, options, variables, sub, num):
     num : bool
         True if the numeric application must be done
 
+    cache : cache.MemoryLRUCache, optional
+        Simplified expressions (see cached_simplify()). Default is None
+
     Returns
     -------
 
@@ -186,14 +559,24 @@ def sub_num(exp, options, variables, sub, num):
         Updated expression
     """
     if sub:
-        exp = subs(exp, variables)
+        exp = subs(exp, variables, options, cache)
     if num:
-        if options["tau_kills_pi"]:
-            exp = exp.subs(parse_expr("tau"), parse_expr("2*pi"))
-        if options["num_tolerance"] is not None:
-            exp = nsimplify(exp, tolerance=options["num_tolerance"]).evalf()
-        else:
-            exp = nsimplify(exp).evalf()
+        with PROFILER.stage("evalf"):
+            if options["tau_kills_pi"]:
+                exp = exp.subs(parse_expr("tau"), parse_expr("2*pi"))
+            precision = options["num_precision"]
+            if precision is None:
+                if options["num_tolerance"] is not None:
+                    exp = nsimplify(exp,
+                                    tolerance=options["num_tolerance"]).evalf()
+                else:
+                    exp = nsimplify(exp).evalf()
+            elif precision <= FLOAT_DIGITS:
+                # Double precision: no rationalization, float64 evaluation
+                exp = evalf(exp, precision)
+            else:
+                # The tolerance would limit the precision of the result
+                exp = nsimplify(exp, rational=True).evalf(precision)
     return exp
 
 
@@ -204,7 +587,7 @@ def is_simplified(expr):
 
     Parameters
     ----------
-    expr : str
+    expr : str or ExprTree
         Mathematical expression
 
     Returns
@@ -219,5 +602,7 @@ def is_simplified(expr):
                     "expand_power_base", "powdenest", "expand_log", "logcombine",
                     "rewrite", "expand_func", "hyperexpand", "combsimp", "gammasimp"]
 
-    root = get_root_operation(expr)
+    if isinstance(expr, str):
+        expr = ExprTree(expr)
+    root = expr.get_root_operation()
     return not (root[1] and any([x == root[0] for x in rewrite_fcts]))
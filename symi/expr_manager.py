@@ -6,7 +6,8 @@ Created on Sat Jun 20 14:50:36 2020
 """
 
 import re
-from anytree import Node
+from bisect import bisect_left, bisect_right
+from array import array
 
 
 # Get rid of scientific notations ____________________________________________
@@ -64,6 +65,47 @@ def convert_all_sci_to_dbl(string):
     return string
 
 
+# Operators precedence _______________________________________________________
+
+# Operators with the same precedence, priority descending
+SAME_PRECEDENCE = [
+    ['[]'],
+    ["@u"],
+    ["!s"],
+    ['**', '^'],
+    ['+u', '-u', '~'],
+    ['/'],
+    ['//'],
+    ['%'],
+    ['*'],
+    ['@'],
+    ['-'],
+    ['+'],
+    ['$u'],
+    ["'s"],
+    ['<<', '>>'],
+    ['&'],
+    ['|'],
+    ['in', 'not in', 'is', 'is not', '<', '<=', '>', '>=', '!=',
+     '=='],
+    ['not'],
+    ['and'],
+    ['or'],
+]
+
+# All the operators, priority descending
+PRIORITY = ['[]', '@u', '!s', '**', '^', '-u', '+u', '~', '/', '//', '*', '@',
+            '%', '-', '+', '$u', "'s",
+            '<<', '>>', '&', '^', '|', '==', '!=', '>', '>=', '<',
+            '<=', 'is', 'is not', 'in', 'not in', 'not', 'and']
+
+# Precedence level of the operators : an operator has a higher priority than
+# all the operators with a greater level, and the same precedence as the ones
+# with the same level
+LEVEL = {op: min(PRIORITY.index(o) for o in group)
+         for group in SAME_PRECEDENCE for op in group if op in PRIORITY}
+
+
 # Getting operators with the same precedence _________________________________
 
 def same_precedence_opers(op):
@@ -90,33 +132,7 @@ def same_precedence_opers(op):
 
     """
 
-    # List of operators with the same precedence
-    list_op = [
-        ['[]'],
-        ["@u"],
-        ["!s"],
-        ['**', '^'],
-        ['+u', '-u', '~'],
-        ['/'],
-        ['//'],
-        ['%'],
-        ['*'],
-        ['@'],
-        ['-'],
-        ['+'],
-        ['$u'],
-        ["'s"],
-        ['<<', '>>'],
-        ['&'],
-        ['|'],
-        ['in', 'not in', 'is', 'is not', '<', '<=', '>', '>=', '!=',
-         '=='],
-        ['not'],
-        ['and'],
-        ['or'],
-    ]
-
-    for oper in list_op:
+    for oper in SAME_PRECEDENCE:
         if op in oper:
             return oper
 
@@ -155,710 +171,467 @@ def higher_priority_oper(op):
     >>> higher_priority_oper('**')
     ['[]']
     """
-    opers = ['[]', '@u', '!s', '**', '^', '-u', '+u', '~', '/', '//', '*', '@',
-             '%', '-', '+', '$u', "'s",
-             '<<', '>>', '&', '^', '|', '==', '!=', '>', '>=', '<',
-             '<=', 'is', 'is not', 'in', 'not in', 'not', 'and']
+    return PRIORITY[0:PRIORITY.index(op)]
+
+
+# Parent operations priorities requiring parentheses ________________________
+
+# For every operator, priorities of the parent operations in which an
+# operation of this operator must be put between parentheses
+PARENTHESIZED_IN = {op: set(higher_priority_oper(op) +
+                            same_precedence_opers(op))
+                    for op in PRIORITY}
+
+
+# Operators caught by find_everything ________________________________________
+
+CAUGHT_OPERATORS = ['+', '-', '*', '@', '@u', "$u", '/', '**', '-u', '+u',
+                    "^", '!s', "'s", '|']
+
+# Operators that can have more than 2 operands
+COMMUTATIVE_OPERATORS = ['+', '*']
+
+
+# Word characters ____________________________________________________________
 
-    return opers[0:opers.index(op)]
+def is_word(char):
+    """
+    Returns True if the char is a word character (letter, digit or '_')
+    """
+    return char.isalnum() or char == '_'
 
 
-# Catch operator _____________________________________________________________
+# Tokenize the expression ____________________________________________________
 
-def catch_operator(string, operator):
+def tokenize(string):
     """
-    Catches the whole sequence around an operator or inside a function string.
+    Description
+    -----------
 
-    Returns  a  list  containing  one list per match. Every sublist contains a
-    tuple  containing  the beginning index and the end index of the operand so
-    that string[beginning:end] matches exactly the operand.
+    Reads  the  string  once  and  splits  it  into  groups.  A group is the
+    content  of  a  pair  of brackets (or the whole string), in which nested
+    groups  are  atoms.  Every  group  contains  the  tokens  found at its own
+    level : operators, commas and any other character that ends an operand.
 
     Parameters
     ----------
-    string : str
-        String in which one you want to catch operator
 
-    operator : str
-        operator to look for
+    string : str
+        Mathematical expression, without spaces
 
     Returns
     -------
-    List of list of tuple with 2 elements
-        Returns a list containing one list per match. Every sublist contains a
-        tuple containing  the beginning index and the end index of the operand
-        so that string[beginning:end] matches exactly the operand.
-
-    Examples
-    --------
-
-    >>> catch_operator("2+4+5*1-1", '+')
-    [[(0, 1), (2, 5)]]
 
-    >>> catch_operator("2+4*1-5*8", '*')
-    [[(6, 7), (8, 9)], [(2, 3), (4, 5)]]
+    list of dict :
+        List of all the groups, the whole string first.
+        Every dict is formatted like this :
+            'kind' : 'call', 'subscription', 'list' or None for the whole
+            string and for the other brackets
+            'name' : name of the called / subscripted function
+            'first' : index of the beginning of the group content
+            'close' : index of the closing bracket (end of the string for
+            the whole string)
+            'tokens' : list of tuple (beginning index, end index, operator).
+            The operator is '' if the token is not an operator (commas,
+            '=', unmatched brackets, ...)
+            'commas' : list of the indices of the commas of the group
+            'nested' : list of the groups directly nested in the group
     """
 
-    # Unary Operator checker .................................................
+    # Finding the whole operator  . . . . . . . . . . . . . . . . . . . . . . .
 
-    def check_unary(string_, index):
+    def find_whole_operator(index, last):
         """
-        Description
-        -----------
-        
-        Checks if the operator at the char i of the string is unary or binary.
-        
-        An operator is considered as unary  if and only if the first non-space
-        character  on its left is an operator,  an  opening bracket, a coma or
-        nothing.
-        
-        Parameters
-        ----------
-        
-        string_ : str
-            String containing a mathematical function
-        index : int
-            String index where the operator is located
-            
-        Returns
-        -------
-        
-        str :
-            String  of  the operator followed by 'u' if the operator is unary,
-            operator else.
-        
-        Examples
-        --------
-        
-        TODO
-        
+        Returns the whole operator starting at the char 'index'. 'last' is
+        the first non-space character on the left of the operator. The
+        operators  '+', '-', '@' and '$' are unary if 'last' is not an
+        operand-like char.
         """
-        # '+' and '-' are the only unary / binary operators
-        if string_[index] in ['+', '-', '@', '$']:
+        char = string[index]
+        if char in '+-@$':
+            if last.isalnum() or (last != '' and last in '!\')}]_'):
+                return char
+            return char + 'u'
+        if char in '\'!':
+            return char + 's'
+        if char in '~%^|&':
+            return char
+        if index + 1 < len(string):
+            following = string[index + 1]
+            if char == '*':
+                return '**' if following == '*' else '*'
+            if char == '/':
+                return '//' if following == '/' else '/'
+            if char in '<>':
+                return char + following if following in char + '=' else char
+            if char == '=' and following == '=':
+                return '=='
+        return ''
 
-            # If  we  are  at  the  beginning  of the string, there is no left
-            # operand, the operator is thus unary
-            if index == 0:
-                return string_[index] + 'u'
+    # Main function ..........................................................
 
-            # Finding  the  first  non-space  character  on  the left. This is
-            # equivalent to find the last non-space character in the substring
-            # going from 0 to i
+    whole = {'kind': None, 'name': '', 'first': 0, 'close': len(string),
+             'tokens': [], 'commas': [], 'nested': []}
+    groups = [whole]
+    opened = [whole]
+    closing = {'(': ')', '[': ']', '{': '}'}
 
-            # Pattern matching every non-space character
-            pattern = re.compile(r'[\S]')
+    last = ''   # Last non-space character
+    word = 0    # Beginning of the last word
+    i = 0
+    while i < len(string):
+        char = string[i]
 
-            # Find, and keep the last occurrence
-            try:
-                last_nspace_char = re.findall(pattern, string_[0:index])[-1]
-            except IndexError:  # if no match
-                return string_[index] + 'u'
+        # Operands  . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
 
-            # If the char is an operand-like char => Binary
-            if last_nspace_char.isalnum() or last_nspace_char in '!\')}]_':
-                return string_[index]
+        if is_word(char):
+            if i == 0 or not is_word(string[i - 1]):
+                word = i
+        elif char.isspace() or char == '.':
+            pass
 
-            # If the char is an operator-like char => Unary
-            else:
-                return string_[index] + 'u'
+        # Opening brackets . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+        elif char in closing:
+            group = {'kind': None, 'name': '', 'first': i + 1,
+                     'close': len(string) - 1, 'tokens': [], 'commas': [],
+                     'nested': [], 'bracket': closing[char]}
+            if i > 0 and is_word(string[i - 1]) and char != '{':
+                group['name'] = string[word:i]
+                group['kind'] = 'call' if char == '(' else 'subscription'
+            elif char == '[':
+                group['kind'] = 'list'
+            groups.append(group)
+            opened[-1]['nested'].append(group)
+            opened.append(group)
+
+        # Closing brackets  . . . . . . . . . . . . . . . . . . . . . . . . .
 
-        elif string_[index] in ["'", "!"]:
-            return string_[index] + 's'
+        elif len(opened) > 1 and char == opened[-1]['bracket']:
+            opened.pop()['close'] = i
+
+        # Operators, commas, and other characters . . . . . . . . . . . . . . .
 
-        # If it's not a '+' or a '-', it's not ambiguous
         else:
-            return string_[index]
+            operator = find_whole_operator(i, last)
+            end = i + max(len(operator.replace('u', '').replace('s', '')), 1)
+            opened[-1]['tokens'].append((i, end, operator))
+            if char == ',':
+                opened[-1]['commas'].append(i)
+            i = end
+            last = string[end - 1]
+            continue
 
-    # Finding a more than one char operator ..................................
+        if not char.isspace():
+            last = char
+        i += 1
 
-    def find_whole_operator(string_, index, forward=True):
-        """
-        Description
-        -----------
-        
-        Returns  the  whole operator which at least one char is located at the
-        char 'index' in the string 'string'
+    return groups
 
-        Parameters
-        ----------
-        string_ : str
-            String representing a mathematical function containing operators.
-        index : int
-            String index where a char of an operator is located
-        forward : bool, optional
-            If true, looks for the rest of the operator forward, else backward
-            The default is True.
 
-        Returns
-        -------
-        str
-            String containing the whole operator
-            
-        Examples
-        --------
-        
-        TODO
+# Operands of the operators __________________________________________________
 
-        """
-        s = string_[index]
+def find_operands(tokens, first, close):
+    """
+    Description
+    -----------
 
-        # Searching Forward  . . . . . . . . . . . . . . . . . . . . . . . . .
+    Finds  the  operands of all the operators of a group. The left operand of
+    an  operator  goes  from  the first operator on its left it can not skip
+    (operator  with a lower priority, ...) to the operator. The right operand
+    goes from the operator to the first operator on its right it can not skip.
 
-        if forward:
+    The blocking operator of every token is stored, so that  when a token is
+    skipped,  the  search  can  jump  to  the  token  that  blocked  it. Each
+    operand is thus found in constant amortized time.
 
-            # 1 char operators
-            if s in '~%+-^|&@$!\'':
-                return check_unary(string_, index)
-
-            # 2 chars operators
-            if index + 1 < len(string_):
-                if s == '*':
-                    if string_[index + 1] == '*':
-                        return '**'
-                    else:
-                        return '*'
-                if s == '/':
-                    if string_[index + 1] == '/':
-                        return '//'
-                    else:
-                        return '/'
-                if s == '>':
-                    if string_[index + 1] == '>':
-                        return '>>'
-                    elif string_[index + 1] == '=':
-                        return '>='
-                    else:
-                        return '>'
-                if s == '<':
-                    if string_[index + 1] == '<':
-                        return '<<'
-                    elif string_[index + 1] == '=':
-                        return '<='
-                    else:
-                        return '<'
-                if s == '!' and string_[index + 1] == '=':
-                    return '!='
-                if s == '=' and string_[index + 1] == '=':
-                    return '=='
-
-        # Searching Backward . . . . . . . . . . . . . . . . . . . . . . . . .
+    Parameters
+    ----------
 
-        else:
+    tokens : list of tuple
+        Tokens of the group (see tokenize())
+    first : int
+        Index of the beginning of the group content
+    close : int
+        Index of the end of the group content
 
-            # One char operators
-            if s in '~%+-^|&@$!\'':
-                return check_unary(string_, index)
-
-            # 2 chars operators
-            if index - 1 >= 0:
-                if s == '*':
-                    if string_[index - 1] == '*':
-                        return '**'
-                    else:
-                        return '*'
-                if s == '/':
-                    if string_[index - 1] == '/':
-                        return '//'
-                    else:
-                        return '/'
-                if s == '>':
-                    if string_[index - 1] == '>':
-                        return '>>'
-                    else:
-                        return '>'
-                if s == '<':
-                    if string_[index - 1] == '<':
-                        return '<<'
-                    else:
-                        return '<'
-                if s == '=' and string_[index - 1] == '!':
-                    return '!='
-                if s == '=' and string_[index - 1] == '=':
-                    return '=='
-                if s == '=' and string_[index - 1] == '<':
-                    return '<='
-                if s == '=' and string_[index - 1] == '>':
-                    return '>='
-        return ""
+    Returns
+    -------
 
-    # Main function ..........................................................
+    list of tuple of int :
+        Beginning  index  of  the left operand and end index of the right
+        operand of every token
+    """
+    n_tok = len(tokens)
+    begins = [first] * n_tok
+    ends = [close] * n_tok
+    left = [-1] * n_tok
+    right = [n_tok] * n_tok
+    no_level = len(PRIORITY)
+
+    # Left operands . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    for k in range(n_tok):
+        operator = tokens[k][2]
+        if operator not in LEVEL:
+            continue
+        level = LEVEL[operator]
+        j = k - 1
+        while j >= 0:
+            o = tokens[j][2]
+            if o == operator and operator in COMMUTATIVE_OPERATORS:
+                skip = True
+            elif o == operator and operator == '**':
+                skip = False
+            else:
+                skip = LEVEL.get(o, no_level) <= level or \
+                       ('s' in o and 's' in operator and
+                        tokens[j][1] == tokens[k][0])
+            if not skip:
+                left[k] = j
+                begins[k] = tokens[j][1]
+                break
+            if 's' not in o and (o == operator or LEVEL[o] < level):
+                j = left[j]
+            else:
+                j -= 1
 
-    if 'u' in operator:
-        is_unary = True
-    else:
-        is_unary = False
-    if 's' in operator:
-        is_right_unary = True
-    else:
-        is_right_unary = False
-
-    # List of commutative operators
-    commutative_op = ['+', '*']
-
-    # Right-to-left associative operators
-    right_to_left_asso_op = ['**']
-
-    # List containing index of commutative operators with more than 2 operands
-    extra_operand_indices = []
-
-    # Matches exactly the operator sequence if it's surrounded by a word char,
-    # a spacing char or an opening / closing bracket
-    op = r"((?<=([\s\w\]"
-    if is_unary:
-        op += "+*\^\-@$/%"
-    op += r"\[\)\(,!']))|(?<=^))"
-    for char in operator.replace('u', '').replace('s', ''):
-        if char == "^":
-            char = "\^"
-        if char == "|":
-            char = "\|"
-        if char == "$":
-            char = "\$"
-        op += '[' + char + ']'
-    op += r"(?=([\s\w\]\[\)\(,$@"
-    if is_right_unary:
-        op += "+*\^\-@$/%!'"
-    op += r"-]))"
-    spec = re.compile(op)
-
-    # Finding all the operators
-    all_op = spec.finditer(string)
-
-    all_matches = []
-
-    # Find the left and right members of the operator  . . . . . . . . . . . .
-
-    for num_oper, oper in enumerate(all_op):
-
-        if find_whole_operator(string, oper.span()[0]) != operator:
+    # Right operands  . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    for k in range(n_tok - 1, -1, -1):
+        operator = tokens[k][2]
+        if operator not in LEVEL:
             continue
+        level = LEVEL[operator]
+        j = k + 1
+        while j < n_tok:
+            o = tokens[j][2]
+            if o == operator and operator in COMMUTATIVE_OPERATORS:
+                skip = True
+            elif o == operator and operator != '**' and 'u' not in o and \
+                    's' not in o:
+                skip = False
+            else:
+                skip = LEVEL.get(o, no_level) <= level or 'u' in o
+            if not skip:
+                right[k] = j
+                ends[k] = tokens[j][0]
+                break
+            if o == operator or LEVEL[o] < level:
+                j = right[j]
+            else:
+                j += 1
+
+    return list(zip(begins, ends))
 
-        extra_operand_indices.append([])
-
-        # Managing the left operand
-        # Searching the beginning index of the number / variable
-        # Iterating for i from span[0] to 0
-        beg_left_index = 0
-        i = oper.span()[0] - 1
-
-        # Until the beginning of the string
-        while i >= 0:
-
-            # If there is a closing parenthesis, we catch the opening one
-            if string[i] == ")":
-                closebr = 1
-                i -= 1
-                while closebr != 0:
-                    if string[i] == ')':
-                        closebr += 1
-                    elif string[i] == '(':
-                        closebr -= 1
-                    if i == 0:
-                        break
-                    i -= 1
-
-            # If there is a closing bracket, we catch the opening one
-            if string[i] == "]":
-                closebr = 1
-                i -= 1
-                while closebr != 0:
-                    if string[i] == ']':
-                        closebr += 1
-                    elif string[i] == '[':
-                        closebr -= 1
-                    if i == 0:
-                        break
-                    i -= 1
-
-            # if there is a closing curly brace, we catch the opening one
-            if string[i] == "}":
-                closebr = 1
-                i -= 1
-                while closebr != 0:
-                    if string[i] == '}':
-                        closebr += 1
-                    elif string[i] == '{':
-                        closebr -= 1
-                    if i == 0:
-                        break
-                    i -= 1
-
-            # If we bump into an operator-like char
-            if not (string[i].isalnum() or string[i] in "]. ){}_"):
-
-                # Find whole operator searching backward (on the left)
-                o = find_whole_operator(string, i, False)
-
-                # Checking if the operator is the same as 'operator'
-                if operator == o and operator in commutative_op:
-                    extra_operand_indices[num_oper].append(i)
-                elif operator == o and operator in right_to_left_asso_op:
-                    beg_left_index = i + 1
-                    break
-
-                # Checking if the operator has a higher priority level
-                elif o in higher_priority_oper(operator) or o in \
-                        same_precedence_opers(operator) or 's' in o and 's' in operator and i == oper.span()[0] - 1:
-
-                    # If so, we skip it and continue searching
-                    i -= len(o.replace('u', '').replace("s", '')) - 1
-
-                else:
-
-                    # If  not,  i  is  the  index of the beginning of the left
-                    # operand
-                    beg_left_index = i + 1  # beginning is right after this
-                    break
-
-            # Going to the next char on the left
-            i -= 1
-
-        # Finding the right operand  . . . . . . . . . . . . . . . . . . . . .
-
-        # Managing the right operand
-        # Searching the ending index of the number / variable / expression
-        # Iterating for span[1] to end of string
-        end_right_index = len(string)
-        i = oper.span()[1]
-
-        # Until the end of the string
-        while i < len(string):
-
-            # If there is an opening parenthesis, we catch the closing one
-            if string[i] == "(":
-                closebr = 1
-                i += 1
-                while closebr != 0:
-                    if string[i] == '(':
-                        closebr += 1
-                    elif string[i] == ')':
-                        closebr -= 1
-                    if i == len(string) - 1:
-                        break
-                    i += 1
-
-            # If there is an opening bracket, we catch the closing one
-            if string[i] == "[":
-                closebr = 1
-                i += 1
-                while closebr != 0:
-                    if string[i] == '[':
-                        closebr += 1
-                    elif string[i] == ']':
-                        closebr -= 1
-                    if i == len(string) - 1:
-                        break
-                    i += 1
-
-            # If there is an opening curly brace, we catch the closing one
-            if string[i] == "{":
-                closebr = 1
-                i += 1
-                while closebr != 0:
-                    if string[i] == '{':
-                        closebr += 1
-                    elif string[i] == '}':
-                        closebr -= 1
-                    if i == len(string) - 1:
-                        break
-                    i += 1
-
-            # If we bump into an operator-like char
-            if not (string[i].isalnum() or string[i] in "[.({} _"):
-
-                # Find the whole operator searching froward (on the right)
-                o = find_whole_operator(string, i)
-
-                # Checking if the operator is the same as 'operator'
-                if operator == o and operator in commutative_op:
-                    extra_operand_indices[num_oper].append(i)
-                elif operator == o and operator not in right_to_left_asso_op and 'u' not in o and 's' not in o:
-                    end_right_index = i
-                    break
-
-                # Checking if the operator has a higher priority level
-                elif o in higher_priority_oper(operator) or o in \
-                        same_precedence_opers(operator) or 'u' in o:
-
-                    # If so, we skip it and continue searching
-                    i += len(o.replace('u', '').replace("s", '')) - 1
-
-                else:
-
-                    # If not, i is the index of the end of the right operand
-                    end_right_index = i
-                    break
-
-            # Going to the next char on the right
-            i += 1
-
-        # [left begin, left end, right begin, right end]
-        if is_unary:
-            all_matches.append([[oper.span()[1], end_right_index]])
-        elif is_right_unary:
-            all_matches.append([[beg_left_index, oper.span()[0]]])
-        else:
-            all_matches.append([[beg_left_index, oper.span()[0]],
-                                [oper.span()[1], end_right_index]])
 
-    # Splitting at every same operator
-    for i, _ in enumerate(all_matches):
-        extra_operand_indices[i].sort()
-        for j, operand in enumerate(all_matches[i]):
-            for extra_op in extra_operand_indices[i]:
-                if operand[0] < extra_op < operand[1]:
-                    all_matches[i].append([extra_op + 1, operand[1]])
-                    all_matches[i][j][1] = extra_op
-            all_matches[i][j] = tuple(all_matches[i][j])
-        all_matches[i].sort()
-    return [list(item) for item in set(tuple(row) for row in all_matches)]
+# Adjacent bracket groups ____________________________________________________
 
+# A group closed right before another one is opened, e.g. "f(x)[1]". Going to
+# the left, the previous scanner skipped the second group, and then went on
+# inside the first one when they are closed by these brackets : an operand
+# ending after "f(x)[1]" thus begins in "x". Going to the right, it went on
+# inside the second group when they are opened by these brackets.
+ENTERED_ON_LEFT = {'(': ')', '[': ')]', '{': ')]}'}
+ENTERED_ON_RIGHT = {'(': '(', '[': '([', '{': '([{'}
 
-# Find all functions in the string ___________________________________________
 
-def find_all_functions(string, char='('):
+def entered_groups(string, group, forward):
     """
     Description
     -----------
-    
-    Finds all the function calls in the string. Functions calls are defined
-    by a word character (\w) followed by an openning parenthesis.
-    
-    Parameter
-    ---------
-    
+
+    Returns  the  groups  nested  in  a  group  that  an  operand  scanned
+    through goes inside, as the previous scanner did (see ENTERED_ON_LEFT
+    and ENTERED_ON_RIGHT).
+
+    Parameters
+    ----------
+
     string : str
-        String containing a mathematical function
-    
-    char : str, optional default is '('
-        '(' for functions, '[' for lists
-    
+        Mathematical expression
+    group : dict
+        Group (see tokenize())
+    forward : bool
+        True for the groups entered going to the right, False going to the
+        left
+
     Returns
     -------
-    
-    set of str :
-        Set containing all the names of the functions called in the string
-        
-    Examples
-    --------
-    
-    TODO
-    
+
+    list of int :
+        Index  from  which  every  group  is entered (opening bracket of the
+        skipped group going to the right, closing bracket going to the left),
+        ascending
+    list of dict :
+        Entered groups
+    """
+    indices = []
+    entered = []
+    nested = group['nested']
+    for before, after in zip(nested, nested[1:]):
+        if after['first'] - 1 != before['close'] + 1:
+            continue
+        if forward:
+            if string[after['first'] - 1] in \
+                    ENTERED_ON_RIGHT[string[before['first'] - 1]]:
+                indices.append(before['first'] - 1)
+                entered.append(after)
+        elif string[before['close']] in \
+                ENTERED_ON_LEFT[string[after['first'] - 1]]:
+            indices.append(after['close'])
+            entered.append(before)
+    return indices, entered
+
+
+def scan_group(string, group, operator, forward):
     """
+    Description
+    -----------
 
-    # Functions are at least one word char followed by '('
-    if char == '(':
-        pattern = re.compile(r'\w+(?=([(]))')
-    else:
-        pattern = re.compile(r'\w+(?=([\[]))')
+    Finds  where  an  operand  going  inside  a  group ends (forward) or
+    begins,  with  the  same  rules  as  find_operands().  The  same
+    commutative operators found in the group split the operand.
 
-    all_matches = re.finditer(pattern, string)
+    Parameters
+    ----------
+
+    string : str
+        Mathematical expression
+    group : dict
+        Entered group (see tokenize())
+    operator : str
+        Operator of the operand
+    forward : bool
+        True for a right operand, False for a left operand
 
-    all_functions = []
+    Returns
+    -------
 
-    for match in all_matches:
-        all_functions.append(match.group(0))
+    int :
+        End (forward) or beginning index of the operand
+    list of int :
+        Indices of the same commutative operators found
+    """
+    level = LEVEL[operator]
+    no_level = len(PRIORITY)
+    splits = []
+    events = [(token[0], token) for token in group['tokens']] + \
+        list(zip(*entered_groups(string, group, forward)))
+    events.sort(key=lambda event: event[0], reverse=not forward)
+
+    for _, event in events:
+        if isinstance(event, dict):
+            index, inner = scan_group(string, event, operator, forward)
+            return index, splits + inner
+        o = event[2]
+        if o == operator and operator in COMMUTATIVE_OPERATORS:
+            splits.append(event[0])
+            continue
+        if forward:
+            if o == operator and operator != '**' and 'u' not in o and \
+                    's' not in o:
+                return event[0], splits
+            skip = LEVEL.get(o, no_level) <= level or 'u' in o
+        else:
+            if o == operator and operator == '**':
+                return event[1], splits
+            skip = LEVEL.get(o, no_level) <= level
+        if not skip:
+            return (event[0] if forward else event[1]), splits
 
-    return set(all_functions)
+    return (group['close'] if forward else group['first']), splits
 
 
-# Catch function calls in the string _________________________________________
+# Caught operators ___________________________________________________________
 
-def catch_function(string, func_name, char='('):
+def is_caught(string, token):
     """
     Description
     -----------
-    
-    Returns all the occurences of the 'func_name' function calls in the string
-    
+
+    Returns True if the operator token must be caught as an operation : it is
+    in  CAUGHT_OPERATORS  and  surrounded  by  a word char, a spacing char or
+    an opening / closing bracket.
+
     Parameters
     ----------
-    
+
     string : str
-        String  of  the  mathematical  function in which you want to catch the
-        function
-    func_name : str
-        Name of the function you want to catch
-    char : str, optional, default is '('
-        '(' for functions, '[' for lists subscriptions
-    
+        Mathematical expression
+    token : tuple
+        Token (see tokenize())
+
     Returns
     -------
-    
-    list of list of tuple of int :
-        List of int containing all the function calls :
-            [[(beg_arg_0_0, end_arg_0_0), ... (beg_arg_k_0, end_arg_k_0))]
-                          .
-                          . For m function calls
-                          .
-            [(beg_arg_0_n, end_arg_0_n), ... (beg_arg_k_n, end_arg_k_n))]
-        
-    Examples
-    --------
-    
-    TODO
-    
+
+    bool
     """
+    begin, end, operator = token
+    if operator not in CAUGHT_OPERATORS:
+        return False
 
-    # Function call pattern (function name + opening parenthesis not preceded
-    # by a word character or at the beginning of the string)
-    if char == '(':
-        pattern = re.compile(r'(?:^|(?<=(\W)))' + func_name + r'(?=([\(]))')
-    else:
-        pattern = re.compile(r'(?:^|(?<=(\W)))' + func_name + r'(?=([\[]))')
+    before = "][)(,!'" + ("+*^-@$/%" if 'u' in operator else '')
+    after = "][)(,$@-" + ("+*^-@$/%!'" if 's' in operator else '')
+    if begin > 0:
+        char = string[begin - 1]
+        if not (char.isspace() or is_word(char) or char in before):
+            return False
+    if end >= len(string):
+        return False
+    char = string[end]
+    return char.isspace() or is_word(char) or char in after
 
-    other_char = '(' if char == '[' else '['
 
-    other_char_close = ')' if char == '[' else ']'
+# Operation record ___________________________________________________________
 
-    char_close = ')' if char == '(' else ']'
+class Operation:
+    """
+    Operation or function call found in an expression (see find_everything())
 
-    all_matches = re.finditer(pattern, string)
+    Attributes
+    ----------
 
-    all_func_calls = []
+    operator : str
+        Operator string or function name
 
-    for m, match in enumerate(all_matches):
-        all_func_calls.append([])
-        i = match.span()[1]  # Index of opening parenthesis
-        closebr = 1
-        i += 1
-        beg_index = i
-        end_index = i
-        while closebr != 0:
-
-            # If there is an openning bracket, we catch the closing one
-            if string[i] == other_char:
-                closebra = 1
-                i += 1
-                while closebra != 0:
-                    if string[i] == other_char:
-                        closebra += 1
-                    elif string[i] == other_char_close:
-                        closebra -= 1
-                    if i == len(string) - 1:
-                        break
-                    i += 1
-
-            # If there is an openning curly brace, we catch the closing one
-            if string[i] == "{":
-                closebra = 1
-                i += 1
-                while closebra != 0:
-                    if string[i] == '{':
-                        closebra += 1
-                    elif string[i] == '}':
-                        closebra -= 1
-                    if i == len(string) - 1:
-                        break
-                    i += 1
-
-            # New argument
-            if string[i] == ',' and closebr == 1:
-                end_index = i
-                all_func_calls[m].append((beg_index, end_index))
-                beg_index = i + 1
-            if string[i] == char:
-                closebr += 1
-            elif string[i] == char_close:
-                closebr -= 1
-            if i == len(string) - 1:
-                i += 1
-                break
-            i += 1
-        all_func_calls[m].append((beg_index, i - 1))
+    priority : str
+        Operator used for the precedence ('[]' for subscriptions, the function
+        name for function calls)
 
-    return all_func_calls
+    is_fct : bool
+        True if it is a function, False if it is an operator
 
+    indices : list of tuple
+        Beginning and end indices of all the operands / arguments
 
-# Find all lists (special operator) __________________________________________
+    str_val : list of str
+        String value of the operands / arguments
 
-def find_all_lists(string):
-    """
-    Description
-    -----------
-    
-    Finds all the lists operations with the operator []
-    
-    Parameter
-    ---------
-    
-    string : str
-        String containing a mathematical function
-    
-    Returns
-    -------
-    
-    list of list of tuple of int :
-        List of int containing all the lists :
-            [[(beg_arg_0_0, end_arg_0_0), ... (beg_arg_k_0, end_arg_k_0))]
-                          .
-                          . For m list operations
-                          .
-            [(beg_arg_0_n, end_arg_0_n), ... (beg_arg_k_n, end_arg_k_n))]
-        
-    Examples
-    --------
-    
-    TODO
-    
+    length : int
+        Length of the operation in the expression
+
+    children : list of int
+        Index of the operation nested in every operand, None if the operand is
+        a leaf (see get_tree())
     """
 
-    # Matching openning brackets
-    pattern = re.compile(r'(?:^|(?<=(\W)))' + r'\[')
+    __slots__ = ('operator', 'priority', 'is_fct', 'indices', 'str_val',
+                 'length', 'children')
 
-    all_matches = re.finditer(pattern, string)
+    def __init__(self, operator, priority=None, is_fct=False, indices=(),
+                 str_val=()):
+        """Class constructor. Read class docstring for more details"""
+        self.operator = operator
+        self.priority = operator if priority is None else priority
+        self.is_fct = is_fct
+        self.indices = list(indices)
+        self.str_val = list(str_val)
+        self.length = indices[-1][1] - indices[0][0] if indices else 0
+        self.children = [None] * len(self.indices)
 
-    all_lists = []
-
-    for m, match in enumerate(all_matches):
-        all_lists.append([])
-        i = match.span()[0]  # Index of openning bracket
-        closebr = 1
-        i += 1
-        beg_index = i
-        end_index = i
-        while closebr != 0:
-
-            # If there is an openning bracket, we catch the closing one
-            if string[i] == "(":
-                closebra = 1
-                i += 1
-                while closebra != 0:
-                    if string[i] == '(':
-                        closebra += 1
-                    elif string[i] == ')':
-                        closebra -= 1
-                    if i == len(string) - 1:
-                        break
-                    i += 1
-
-            # If there is an openning curly brace, we catch the closing one
-            if string[i] == "{":
-                closebra = 1
-                i += 1
-                while closebra != 0:
-                    if string[i] == '{':
-                        closebra += 1
-                    elif string[i] == '}':
-                        closebra -= 1
-                    if i == len(string) - 1:
-                        break
-                    i += 1
-
-            # New element
-            if string[i] == ',' and closebr == 1:
-                end_index = i
-                all_lists[m].append((beg_index, end_index))
-                beg_index = i + 1
-            if string[i] == '[':
-                closebr += 1
-            elif string[i] == ']':
-                closebr -= 1
-            if i == len(string) - 1:
-                i += 1
-                break
-            i += 1
-        all_lists[m].append((beg_index, i - 1))
-    return all_lists
+    def __repr__(self):
+        return f"Operation({self.operator!r}, {self.str_val!r})"
 
 
 # Find every operation and function __________________________________________
@@ -879,138 +652,160 @@ def find_everything(string):
     Returns
     -------
     
-    list of dict :
-        List of all the operations in the same order than the tree list.
-        Every dict is formatted like this :
-            'operator' : operator string or function name
-            'operation' : dict formatted like this :
-                'indices' : list of tuple containing the beginning and the end
-                indices  of  all  the  operands / arguments of the operation /
-                function
-                'str_val' : string value of the arguments / operands
-                'len' : length of the operation
-            'is_fct' : True if it is a funciton, false if it's an operator
+    list of Operation :
+        List of all the operations in the same order than the tree list
     
     """
-    # List containing all func calls and operations (no key)
-    all_operations = []
 
     string = ' ' + string.replace(' ', '') + '  '
     string = convert_all_sci_to_dbl(string)
 
-    # All functions ..........................................................
-
-    all_fct = find_all_functions(string)
-
-    # Element of all_operations
-    operation = {'operator': '', 'operation': {}, 'is_fct': False}
-
-    for fct in all_fct:
-
-        # Getting all calls of this function
-        all_fct_calls = catch_function(string, fct)
-
-        for call in all_fct_calls:
-            dict_oper = {'indices': [], 'str_val': [], 'len': 0,
-                         'children': []}
-            for arg in call:
-                dict_oper['indices'].append(arg)
-                dict_oper['str_val'].append(string[arg[0]:arg[1]])
-                dict_oper['children'].append(None)
-
-            # Length of the function call
-            dict_oper['len'] = dict_oper['indices'][-1][1] - \
-                               dict_oper['indices'][0][0]
-
-            operation['operation'] = dict_oper.copy()
-            operation['operator'] = fct
-            operation['priority'] = fct
-            operation['is_fct'] = True
-
-            all_operations.append(operation.copy())
-
-    # All subscriptions ......................................................
-
-    all_fct = find_all_functions(string, char='[')
+    groups = tokenize(string)
 
-    # Element of all_operations
-    operation = {'operator': '', 'operation': {}, 'is_fct': False}
+    def operation(operator, priority, indices, is_fct):
+        return Operation(operator, priority, is_fct, indices,
+                         [string[i[0]:i[1]] for i in indices])
 
-    for fct in all_fct:
+    # All functions, subscriptions and lists .................................
 
-        # Getting all calls of this function
-        all_fct_calls = catch_function(string, fct, char='[')
+    brackets = {'call': [], 'subscription': [], 'list': []}
 
-        for call in all_fct_calls:
-            dict_oper = {'indices': [], 'str_val': [], 'len': 0,
-                         'children': []}
-            for arg in call:
-                dict_oper['indices'].append(arg)
-                dict_oper['str_val'].append(string[arg[0]:arg[1]])
-                dict_oper['children'].append(None)
+    for group in groups[1:]:
+        if group['kind'] is None:
+            continue
+        bounds = [group['first'] - 1] + group['commas'] + [group['close']]
+        indices = [(bounds[i] + 1, bounds[i + 1])
+                   for i in range(len(bounds) - 1)]
+        if group['kind'] == 'call':
+            brackets['call'].append(
+                operation(group['name'], group['name'], indices, True))
+        elif group['kind'] == 'subscription':
+            brackets['subscription'].append(
+                operation(group['name'] + '[]', '[]', indices, True))
+        else:
+            brackets['list'].append(operation('[]', '[]', indices, False))
 
-            # Length of the function call
-            dict_oper['len'] = dict_oper['indices'][-1][1] - \
-                               dict_oper['indices'][0][0]
+    # Retrieving all operators ...............................................
 
-            operation['operation'] = dict_oper.copy()
-            operation['operator'] = fct + '[]'
-            operation['priority'] = '[]'
-            operation['is_fct'] = True
+    # Position and operands of every operator
+    operators = {operator: [] for operator in CAUGHT_OPERATORS}
 
-            all_operations.append(operation.copy())
+    for group in groups:
+        tokens = group['tokens']
+        operands = find_operands(tokens, group['first'], group['close'])
 
-    # All lists  .............................................................
+        # Operands of commutative operators are split at every same operator
+        # inside them
+        positions = {operator: [token[0] for token in tokens
+                                if token[2] == operator]
+                     for operator in COMMUTATIVE_OPERATORS}
+        entered_left = entered_groups(string, group, False)
+        entered_right = entered_groups(string, group, True)
+        caught = set()
 
-    all_lists = find_all_lists(string)
+        for token, (begin, end) in zip(tokens, operands):
+            if not is_caught(string, token):
+                continue
+            operator = token[2]
+
+            # Operands going inside adjacent bracket groups
+            inside = []
+            i_e = bisect_left(entered_left[0], token[0]) - 1
+            if i_e >= 0 and entered_left[0][i_e] > begin and \
+                    'u' not in operator:
+                begin, inside = scan_group(string, entered_left[1][i_e],
+                                           operator, False)
+            i_e = bisect_left(entered_right[0], token[1])
+            if i_e < len(entered_right[0]) and \
+                    entered_right[0][i_e] < end and 's' not in operator:
+                end, inside_right = scan_group(string, entered_right[1][i_e],
+                                               operator, True)
+                inside += inside_right
+
+            if 'u' in operator:
+                indices = [(token[1], end)]
+            elif 's' in operator:
+                indices = [(begin, token[0])]
+            elif operator in COMMUTATIVE_OPERATORS:
+                # Same operators with the same operands are caught once
+                key = (operator, begin, end, token[0] == begin, tuple(inside))
+                if key in caught:
+                    continue
+                caught.add(key)
+                split = sorted(inside + positions[operator][
+                    bisect_right(positions[operator], begin):
+                    bisect_left(positions[operator], end)])
+                if token[0] == begin:
+                    split = [begin] + split
+                bounds = [begin - 1] + split + [end]
+                indices = [(bounds[i] + 1, bounds[i + 1])
+                           for i in range(len(bounds) - 1)]
+            else:
+                indices = [(begin, token[0]), (token[1], end)]
+            operators[operator].append((token[0], tuple(indices)))
 
-    for lis in all_lists:
-        dict_oper = {'indices': [], 'str_val': [], 'len': 0,
-                     'children': []}
+    # Same operators with the same operands are caught once. They are listed
+    # in the order of the set of their operands, filled from left to right,
+    # like the previous scanner did : get_tree() nests the first one of the
+    # operations with the same length, so this order changes the tree of
+    # expressions such as "--x**2"
+    return brackets['call'] + brackets['subscription'] + brackets['list'] + \
+        [operation(operator, operator, indices, False)
+         for operator in CAUGHT_OPERATORS
+         for indices in set(indices for _, indices
+                            in sorted(operators[operator]))]
 
-        for elem in lis:
-            dict_oper['indices'].append(elem)
-            dict_oper['str_val'].append(string[elem[0]:elem[1]])
-            dict_oper['children'].append(None)
 
-        # Length of the operation
-        dict_oper['len'] = dict_oper['indices'][-1][1] - \
-                           dict_oper['indices'][0][0]
+# Operations tree ____________________________________________________________
 
-        operation['operation'] = dict_oper.copy()
-        operation['operator'] = '[]'
-        operation['priority'] = '[]'
-        operation['is_fct'] = False
+class Tree:
+    """
+    Operations / functions call tree, stored as the index of the parent of
+    every operation and the list of the operations nested in every operation.
+    Operations are referred to by their index in the operations list.
 
-        all_operations.append(operation.copy())
+    Attributes
+    ----------
 
-    # Retrieving all operators ...............................................
+    parents : array.array of int
+        Index of the parent of every operation, -1 for the roots
 
-    for operator in ['+', '-', '*', '@', '@u', "$u", '/', '**', '-u', '+u', "^", '!s', "'s", '|']:
+    children : list of list of int
+        Indices of the operations nested in every operation
 
-        # Getting all operations with this operator
-        all_op_calls = catch_operator(string, operator)
+    root : int
+        Index of the first root operation, -1 if the tree is empty
+    """
 
-        for call in all_op_calls:
-            dict_oper = {'indices': [], 'str_val': [], 'len': 0,
-                         'children': []}
-            for operand in call:
-                dict_oper['indices'].append(operand)
-                dict_oper['str_val'].append(string[operand[0]:operand[1]])
-                dict_oper['children'].append(None)
+    __slots__ = ('parents', 'children', 'root')
+
+    def __init__(self, parents):
+        """Class constructor. Read class docstring for more details"""
+        self.parents = parents
+        self.children = [[] for _ in parents]
+        self.root = -1
+        for i_op, parent in enumerate(parents):
+            if parent == -1:
+                if self.root == -1:
+                    self.root = i_op
+            else:
+                self.children[parent].append(i_op)
 
-            # Length of the operation
-            dict_oper['len'] = dict_oper['indices'][-1][1] - \
-                               dict_oper['indices'][0][0]
+    def __len__(self):
+        return len(self.parents)
 
-            operation['operation'] = dict_oper.copy()
-            operation['operator'] = operator
-            operation['priority'] = operator
-            operation['is_fct'] = False
+    def is_root(self, index):
+        """Returns True if the operation has no parent"""
+        return self.parents[index] == -1
 
-            all_operations.append(operation.copy())
+    def is_leaf(self, index):
+        """Returns True if no operation is nested in the operation"""
+        return not self.children[index]
 
-    return all_operations
+    def parent(self, index):
+        """Returns the index of the parent of the operation, None if root"""
+        parent = self.parents[index]
+        return None if parent == -1 else parent
 
 
 # Build the operations tree __________________________________________________
@@ -1020,132 +815,119 @@ def get_tree(operations_list):
     Description
     -----------
     
-    Create  the  operations  /  functions  call  tree  from  a list of dict of
-    operations
+    Create  the  operations  /  functions  call  tree  from  a list of
+    operations. The children of every operation are set in place.
     
     Parameter
     ---------
     
-    operations_list : list of dict
-        List of all the operations from which you want to create the tree.
-        Every dict is formatted like this :
-            'operator' : operator string or function name
-            'operation' : dict formatted like this :
-                'indices' : list of tuple containing the beginning and the end
-                indices  of  all  the  operands / arguments of the operation /
-                function
-                'str_val' : string value of the arguments / operands
-                'len' : length of the operation
-            'is_fct' : True if it is a function, false if it's an operator
+    operations_list : list of Operation
+        List of all the operations from which you want to create the tree
+        (see find_everything())
     
     Returns
     -------
     
-    list of anytree.node.node.Node
-        List of all Nodes of operations (linked)
+    Tree
+        Operations tree (linked)
     """
 
-    # List of all index of operations / functions that have already a Node
-    have_a_node = []
-
-    # Find the root operation ................................................
-
-    def find_leaf(min_index, max_index, exclude_op, general=False):
-        """
-        Description
-        -----------
-        
-        Returns the index of the leaf  operation between the indices min_index
-        and max_index
-        
-        Parameters
-        ----------
-        
-        min_index : int
-            Minimum index
-        max_index : int
-            Maximum index
-        exclude_op : int
-            Index of the operation you want to ignore
-        general : bool
-            If True, the three above arguments are ignored
-            Default is False
-            
-        Returns
-        -------
-        
-        Index of the leave (longest) operation between the 2 indices
-        None if there is no leaf
-        
-        Global Variables Used
-        ---------------------
-        
-        - operations_list
-        
-        """
-        max_len = -1
-        index = None
-        for i_op, op in enumerate(operations_list):
-            # Checking the index
-            if not general:
-                if op['operation']['indices'][0][0] < min_index or \
-                        op['operation']['indices'][-1][1] > max_index or \
-                        i_op == exclude_op:
-                    continue
-            if op['operation']['len'] > max_len:
-                max_len = op['operation']['len']
-                index = i_op
-        return index
-
-    # Main function ..........................................................
-
-    all_nodes = []
+    # Operation spans ........................................................
+
+    spans = [(op.indices[0][0], op.indices[-1][1], op.length)
+             for op in operations_list]
+
+    # The leaf of an operand is the longest operation (the first one in the
+    # list if many have the same length) nested in the operand. Candidates
+    # are compared with the key (length, -index), the highest key wins.
+    no_leaf = (-2, 0)
+
+    def best_two(first, second, key):
+        if key > first:
+            return key, first
+        if key > second:
+            return first, key
+        return first, second
+
+    # Nesting the operations in the operands .................................
+
+    # Sweeping the operands by ending index, the operations ending before the
+    # operand are stored in a Fenwick tree indexed by their beginning index
+    # (reversed) that keeps the two best keys, so that the operation itself
+    # can be ignored
+    starts = sorted(set(span[0] for span in spans))
+    fenwick = [(no_leaf, no_leaf)] * (len(starts) + 1)
+
+    def insert(i_op):
+        key = (spans[i_op][2], -i_op)
+        i_f = len(starts) - bisect_left(starts, spans[i_op][0])
+        while i_f < len(fenwick):
+            fenwick[i_f] = best_two(*fenwick[i_f], key)
+            i_f += i_f & -i_f
+
+    def query(min_index):
+        first = second = no_leaf
+        i_f = len(starts) - bisect_left(starts, min_index)
+        while i_f > 0:
+            for key in fenwick[i_f]:
+                first, second = best_two(first, second, key)
+            i_f -= i_f & -i_f
+        return first, second
+
+    by_end = sorted(range(len(spans)), key=lambda i_op: spans[i_op][1])
+    operands = sorted(((leaf_index[1], leaf_index[0], i_op, i_i)
+                       for i_op, op in enumerate(operations_list)
+                       for i_i, leaf_index in enumerate(op.indices)))
+
+    leaves = {}
+    i_end = 0
+    for max_index, min_index, i_op, i_i in operands:
+        while i_end < len(by_end) and spans[by_end[i_end]][1] <= max_index:
+            insert(by_end[i_end])
+            i_end += 1
+        for key in query(min_index):
+            if key != no_leaf and -key[1] != i_op:
+                leaves[i_op, i_i] = -key[1]
+                break
 
-    # Creating a Node per operation
-    for i_op, op in enumerate(operations_list):
-        all_nodes.append(Node(str(i_op)))
+    # Linking the operations together ........................................
 
-    # Linking Nodes toghther
+    # If an operation is the leaf of many operands, its parent is the last one
+    parents = array('l', [-1]) * len(operations_list)
     for i_op, op in enumerate(operations_list):
-        for i_i, leaf_index in enumerate(op['operation']['indices']):
-            leaf = find_leaf(leaf_index[0], leaf_index[1], i_op)
+        for i_i in range(len(op.indices)):
+            leaf = leaves.get((i_op, i_i))
             if leaf is not None:
-                all_nodes[leaf].parent = all_nodes[i_op]
-                operations_list[i_op]['operation']['children'][i_i] = leaf
-    return all_nodes
+                parents[leaf] = i_op
+                op.children[i_i] = leaf
+    return Tree(parents)
 
 
 # Operation to string ________________________________________________________
 
-def render(operation_dict, parentheses=False):
+def render(operation, parentheses=False, str_val=None):
     """
     Description
     -----------
     
-    Converts the operation dict to the string representation
+    Converts the operation to the string representation
     
     Parameter
     ---------
     
-    operation_dict : dict
-        Operation you want to convert to string
-        Every dict is formatted like this :
-            'operator' : operator string or function name
-            'operation' : dict formatted like this :
-                'indices' : list of tuple containing the beginning and the end
-                indices  of  all  the  operands / arguments of the operation /
-                function
-                'str_val' : string value of the arguments / operands
-                'len' : length of the operation
-            'is_fct' : True if it is a function, false if it's an operator
+    operation : Operation
+        Operation you want to convert to string (see find_everything())
+    parentheses : bool, optional
+        If True, add parentheses around the expression. Default is False
+    str_val : list of str, optional
+        Operands / arguments to render instead of the ones of the operation.
+        Default is None
             
     Returns
     -------
     
     str
         String representation of the operation
-    parentheses : bool, optional
-        If True, add parentheses around the expression. Default is False
     
     Examples
     --------
@@ -1153,70 +935,88 @@ def render(operation_dict, parentheses=False):
     TODO
     
     """
+    operator = operation.operator
+    if str_val is None:
+        str_val = operation.str_val
+
     # Rendering functions ....................................................
 
-    if operation_dict['is_fct']:
+    if operation.is_fct:
 
         # Subscription
-        if '[]' == operation_dict['priority']:
-            string = operation_dict['operator'][:-1]
+        if '[]' == operation.priority:
+            string = operator[:-1]
+            closing = operator[-1]
 
         # Function name
         else:
-            string = operation_dict['operator'] + '('
+            string = operator + '('
+            closing = ')'
 
         # Arguments
-        for i, arg in enumerate(operation_dict['operation']['str_val']):
-            string += arg
-
-            if i == len(operation_dict['operation']['str_val']) - 1:
-                string += operation_dict['operator'][-1] \
-                    if '[]' == operation_dict['priority'] else ')'
-            else:
-                string += ','
+        if str_val:
+            string += ','.join(str_val) + closing
 
     # Rendering operations ...................................................
 
     else:
         # If it is a list
-        if operation_dict['operator'] == '[]':
-            string = '['
-
-            # Elements
-            for i, elem in enumerate(operation_dict['operation']['str_val']):
-                string += elem
-
-                if i == len(operation_dict['operation']['str_val']) - 1:
-                    string += ']'
-                else:
-                    string += ','
-            return string
+        if operator == '[]':
+            return '[' + ','.join(str_val) + ']' if str_val else '['
 
         # Classic operator
-        string = '(' if parentheses else ''
-
-        if len(operation_dict['operation']['str_val']) > 1:
-            for i, operand in enumerate(operation_dict['operation']
-                                        ['str_val']):
-                string += operand
-
-                if i != len(operation_dict['operation']['str_val']) - 1:
-                    string += operation_dict['operator'].replace('u', '').replace("s", '')
-        elif 's' not in operation_dict['operator']:
-            string += operation_dict['operator'].replace('u', '').replace("s", '') + \
-                      operation_dict['operation']['str_val'][0]
+        symbol = operator.replace('u', '').replace("s", '')
+
+        if len(str_val) > 1:
+            string = symbol.join(str_val)
+        elif 's' not in operator:
+            string = symbol + str_val[0]
         else:
-            string += operation_dict['operation']['str_val'][0] + \
-                      operation_dict['operator'].replace('u', '').replace("s", '')
+            string = str_val[0] + symbol
 
-        string += ')' if parentheses else ''
+        if parentheses:
+            string = '(' + string + ')'
 
     return string.replace(' ', '')
 
 
+# Wrap a leaf with a function or an operator _________________________________
+
+def wrap(string, func):
+    """
+    Description
+    -----------
+
+    Applies a function or a unary operator to a string operand
+
+    Parameters
+    ----------
+
+    string : str
+        Operand to wrap
+    func : list of 3 elements
+        func[0] : str
+            Function / operator name
+        func[1] : bool
+            True is it is a function, false if it is an operator
+        func[2] : bool
+            True if the operand must be converted as a string before applying
+            the function
+
+    Returns
+    -------
+
+    str :
+        String representation of the wrapped operand
+    """
+    if func[2]:
+        string = f"'{string}'"
+    return render(Operation(func[0], is_fct=func[1]), str_val=[string])
+
+
 # Render whole expression from tree __________________________________________
 
-def render_from_tree(tree, all_op):
+def render_from_tree(tree, all_op, wrappers=None):
     """
     Description
     -----------
@@ -1226,20 +1026,18 @@ def render_from_tree(tree, all_op):
     Parameters
     ----------
     
-    tree : list of anytree.node.node.Node
-        List of all Nodes of operations (linked)
+    tree : Tree
+        Operations tree (see get_tree())
     
-    all_op : list of dict
-        List of all the operations in the same order than the tree list.
-        Every dict is formatted like this :
-            'operator' : operator string or function name
-            'operation' : dict formatted like this :
-                'indices' : list of tuple containing the beginning and the end
-                indices  of  all  the  operands / arguments of the operation /
-                function
-                'str_val' : string value of the arguments / operands
-                'len' : length of the operation
-            'is_fct' : True if it is a funciton, false if it's an operator
+    all_op : list of Operation
+        List of all the operations in the same order than the tree list
+
+    wrappers : dict, optional
+        Functions / operators to apply on the leaves or on the operations
+        while rendering (see ExprTree). Keys are (operation index, operand
+        index) for the leaves and (operation index, None) for the operations.
+        Values are lists of wrappers (see wrap()), the innermost first.
+        Default is None
     
     Returns
     -------
@@ -1249,83 +1047,64 @@ def render_from_tree(tree, all_op):
     
     """
 
-    # 1 - Copying the list of operations .....................................
-
-    def copy(old):
-        return {'operator': old['operator'],
-                'priority': old['priority'],
-                'operation': {
-                    'indices': old['operation']['indices'].copy(),
-                    'str_val': old['operation']['str_val'].copy(),
-                    'len': old['operation']['len'],
-                    'children': old['operation']['children'].copy()
-                },
-                'is_fct': old['is_fct']
-                }
-
-    # Finding root of the tree
-    i_root = 0
-    for i_n, node in enumerate(tree):
-        if node.is_root:
-            i_root = i_n
-            break
-
-    def recursive_render(index):
-        if tree[index].is_leaf:
-            if tree[index].parent is None:
-                par = False
-            elif not all_op[int(tree[index].name)]['is_fct'] and "u" in all_op[int(tree[index].name)]['operator']:
-                par = False
-            elif all_op[int(tree[index].name)]['is_fct']:
-                par = False
-            elif all_op[int(tree[index].parent.name)]['priority'] == '[]':
-                par = False
-            elif all_op[int(tree[index].parent.name)]['priority'] in \
-                    higher_priority_oper(all_op[int(tree[index].name)] \
-                                                 ['priority']) or \
-                    all_op[int(tree[index].parent.name)]['priority'] in \
-                    same_precedence_opers(all_op[int(tree[index].name)] \
-                                                  ['priority']):
-                par = True
-            else:
-                par = False
-            return render(all_op[index], parentheses=par)
-        else:
-            operands = []
-            for i_c, child in enumerate(all_op[index]['operation'] \
-                                                ['children']):
-                if child is not None:
-                    operands.append(recursive_render(child))
-                else:
-                    operands.append(all_op[index]['operation'] \
-                                        ['str_val'][i_c])
-            operation = copy(all_op[index])
-            operation['operation']['str_val'] = operands
-
-            if tree[index].parent is None:
-                par = False
-
-            elif all_op[int(tree[index].name)]['is_fct']:
-                par = False
-
-            elif not all_op[int(tree[index].name)]['is_fct'] and ("u" in all_op[int(tree[index].name)]['operator'] or "s" in all_op[int(tree[index].name)]['operator']):
-                par = False
-
-            elif all_op[int(tree[index].parent.name)]['priority'] == '[]':
-                par = False
-
-            elif all_op[int(tree[index].parent.name)]['priority'] in \
-                    higher_priority_oper(all_op[int(tree[index].name)] \
-                                                 ['priority']) or \
-                    all_op[int(tree[index].parent.name)]['priority'] in \
-                    same_precedence_opers(all_op[int(tree[index].name)] \
-                                                  ['priority']):
-                par = True
-            else:
-                par = False
-            return render(operation, parentheses=par)
+    if wrappers is None:
+        wrappers = {}
+
+    # 1 - Applying the wrappers ..............................................
+
+    def apply_wrappers(string, key):
+        for func in wrappers.get(key, []):
+            string = wrap(string, func)
+        return string
 
-    return recursive_render(i_root)
+    # 2 - Parentheses ........................................................
+
+    def parentheses(index, parent):
+        operation = all_op[index]
+        if parent is None or operation.is_fct or \
+                all_op[parent].priority == '[]':
+            return False
+        if "u" in operation.operator or \
+                ("s" in operation.operator and not tree.is_leaf(index)):
+            return False
+        outer = PARENTHESIZED_IN.get(operation.priority)
+        if outer is None:
+            outer = higher_priority_oper(operation.priority) + \
+                same_precedence_opers(operation.priority)
+        return all_op[parent].priority in outer
+
+    # 3 - Rendering ..........................................................
+
+    # The operations are rendered after all their children, using an
+    # explicit stack so that the depth of the tree is not limited by the
+    # recursion limit
+    rendered = [None] * len(all_op)
+    stack = [(tree.root, False)]
+    while stack:
+        index, children_rendered = stack.pop()
+        if rendered[index] is not None:
+            continue
+        operation = all_op[index]
+
+        # The operands of the leaves are rendered from their string values
+        children = [None] * len(operation.children) if tree.is_leaf(index) \
+            else operation.children
+
+        if not children_rendered:
+            stack.append((index, True))
+            stack.extend((child, False) for child in children
+                         if child is not None)
+            continue
+
+        operands = [apply_wrappers(str_val, (index, i_c)) if child is None
+                    else rendered[child]
+                    for i_c, (str_val, child) in
+                    enumerate(zip(operation.str_val, children))]
+        par = parentheses(index, tree.parent(index))
+        rendered[index] = apply_wrappers(render(operation, par, operands),
+                                          (index, None))
+
+    return rendered[tree.root]
 
 
 # Replace an operator / function by another __________________________________
@@ -1383,13 +1162,208 @@ def replace(string, operator, new_operator):
     tree = get_tree(all_op)
 
     for op in all_op:
-        if op['operator'] == operator[0] and op['is_fct'] == operator[1]:
-            op['operator'] = new_operator[0]
-            op['is_fct'] = new_operator[1]
+        if op.operator == operator[0] and op.is_fct == operator[1]:
+            op.operator = new_operator[0]
+            op.is_fct = new_operator[1]
 
     return render_from_tree(tree, all_op) if tree else string
 
 
+# Parsed expression __________________________________________________________
+
+class ExprTree:
+    """
+    Expression parsed once into its operations tree.
+
+    The rewrite passes (pipe to function, renaming, wrapping the leaves) are
+    applied in place on the tree, and the expression is only rendered back to
+    a string at the end, with render().
+
+    Attributes
+    ----------
+
+    expr : str
+        Parsed mathematical expression
+
+    operations : list of Operation
+        All the operations of the expression (see find_everything())
+
+    tree : Tree
+        Operations tree (see get_tree())
+
+    wrappers : dict
+        Functions / operators applied on the leaves or on the operations
+        (see render_from_tree()). The whole expression is the only leaf if it
+        does not contain any operation, its key is then (None, None).
+    """
+
+    def __init__(self, expr):
+        """Class constructor. Read class docstring for more details"""
+        self.expr = expr
+        self.operations = find_everything(expr)
+        self.tree = get_tree(self.operations)
+        self.wrappers = {}
+
+    # Render ..................................................................
+
+    def render(self):
+        """
+        Render the expression with all the rewrite passes applied
+
+        Returns
+        -------
+
+        str :
+            String of the mathematical expression
+        """
+        if not self.tree:
+            string = self.expr
+            for func in self.wrappers.get((None, None), []):
+                string = wrap(string, func)
+            return string
+        return render_from_tree(self.tree, self.operations, self.wrappers)
+
+    # Supported syntax ........................................................
+
+    def is_supported(self):
+        """
+        Returns True if the expression has a correct / supported syntax.
+        This must be checked before applying any rewrite pass.
+
+        Returns
+        -------
+
+        bool
+            True if the rendered expression matches the parsed one
+        """
+        return self.operations == [] or \
+            self.render() == self.expr.replace(" ", "")
+
+    # Parse again .............................................................
+
+    def reparse(self):
+        """
+        Parse the rendered expression again, with all the rewrite passes
+        applied so far.
+
+        The tree of an unsupported expression (see is_supported()) does not
+        render back to it. Parsing it again after every rewrite pass gives the
+        same result as applying the passes one after the other on the string.
+        """
+        self.__init__(self.render())
+
+    # Replace many objects ....................................................
+
+    def replace_many(self, operators, new_operators):
+        """
+        Replace many operators / functions by other operators / functions.
+        For more details, check the docstring of replace_many()
+
+        Parameters
+        ----------
+
+        operators : list of list
+            Operators / functions you want to replace
+
+        new_operators : list of list
+            New value of the functions / operations
+        """
+        for i, operator in enumerate(operators):
+            for op in self.operations:
+                # Subscription : removing [] if () is the subscription format
+                if operator[0] == "[]" and op.operator[-2:] == "[]":
+                    op.operator = op.operator.replace('[]',
+                                                      new_operators[i][0])
+                    continue
+                if op.operator == operator[0] and op.is_fct == operator[1]:
+                    op.operator = new_operators[i][0]
+                    op.is_fct = new_operators[i][1]
+            for funcs in self.wrappers.values():
+                for i_f, func in enumerate(funcs):
+                    if func[0] == operator[0] and func[1] == operator[1]:
+                        funcs[i_f] = [new_operators[i][0],
+                                      new_operators[i][1], func[2]]
+
+    # Apply a function to all the leaves ......................................
+
+    def apply_to_leaves(self, func, stringify=False):
+        """
+        Apply a function or an operator to all the leaves of the operation
+        tree. For more details, check the docstring of apply_to_leaves()
+
+        Parameters
+        ----------
+
+        func : list of 2 elements
+            func[0] : str
+                Function / operator name
+            func[1] : bool
+                True is it is a function, false if it is an operator
+
+        stringify : bool, optional
+            Set to True if you want to convert the leaves as strings before
+            applying the function.
+
+            Default is False
+        """
+        func = [func[0], func[1], stringify]
+        if not self.tree:
+            self.wrappers.setdefault((None, None), []).insert(0, func)
+            return
+        for i_op, op in enumerate(self.operations):
+            for i_c, child in enumerate(op.children):
+                if child is None:
+                    self.wrappers.setdefault((i_op, i_c), []).insert(0, func)
+
+    # Get the root operation ..................................................
+
+    def get_root_operation(self):
+        """
+        Returns the root operation of the expression
+
+        Returns
+        -------
+
+        operator : list of str
+            operator[0] : str
+                Operator or function
+            operator[1] : bool
+                True if the operation is a function and not an operator
+        """
+        if not self.tree:
+            funcs = self.wrappers.get((None, None))
+            return [funcs[-1][0], funcs[-1][1]] if funcs else [[], []]
+
+        if self.tree.root == -1:
+            return [[], []]
+        funcs = self.wrappers.get((self.tree.root, None))
+        if funcs:
+            return [funcs[-1][0], funcs[-1][1]]
+        return [self.operations[self.tree.root].operator,
+                self.operations[self.tree.root].is_fct]
+
+    # Pipe to function ........................................................
+
+    def pipe_to_func(self):
+        """
+        Converts the pipe notations to the function. For more details, check
+        the docstring of pipe_to_func()
+        """
+        for i_op, op in enumerate(self.operations):
+            if op.operator == "|":
+                op.operator = op.str_val[1].replace(' ', '')
+                del op.indices[1]
+                del op.str_val[1]
+                del op.children[1]
+                op.is_fct = True
+
+                # The operators applied on the function name now apply on the
+                # whole function call
+                funcs = self.wrappers.pop((i_op, 1), None)
+                if funcs:
+                    self.wrappers[(i_op, None)] = funcs
+
+
 # Render from expr ___________________________________________________________
 
 def is_supported(expr):
@@ -1406,9 +1380,7 @@ def is_supported(expr):
 
     """
 
-    all_op = find_everything(expr)
-    tree = get_tree(all_op)
-    return all_op == [] or render_from_tree(tree, all_op) == expr.replace(" ", "")
+    return ExprTree(expr).is_supported()
 
 
 # Replace many objects _______________________________________________________
@@ -1452,25 +1424,9 @@ def replace_many(string, operators, new_operators):
     
     """
 
-    all_op = find_everything(string)
-
-    if len(all_op) == 0:
-        return string
-
-    tree = get_tree(all_op)
-
-    for i, operator in enumerate(operators):
-        for op in all_op:
-            # Subscription : removing [] if () is the subscription format
-            if operator[0] == "[]" and op['operator'][-2:] == "[]":
-                op['operator'] = op['operator'] \
-                    .replace('[]', new_operators[i][0])
-                continue
-            if op['operator'] == operator[0] and op['is_fct'] == operator[1]:
-                op['operator'] = new_operators[i][0]
-                op['is_fct'] = new_operators[i][1]
-
-    return render_from_tree(tree, all_op) if tree else string
+    expr_tree = ExprTree(string)
+    expr_tree.replace_many(operators, new_operators)
+    return expr_tree.render()
 
 
 # Replace a variable _________________________________________________________
@@ -1507,9 +1463,9 @@ def replace_var(string, var, new_var):
     tree = get_tree(all_op)
 
     for op in all_op:
-        for i_a, arg in enumerate(op['operation']['str_val']):
+        for i_a, arg in enumerate(op.str_val):
             if arg == var:
-                op['operation']['str_val'][i_a] = new_var
+                op.str_val[i_a] = new_var
 
     return render_from_tree(tree, all_op) if tree else string
 
@@ -1540,31 +1496,9 @@ def apply_to_leaves(expr, func, stringify=False):
     expr : str
         New expression of the string
     """
-    op_dict = {"operator": func[0],
-               "priority": func[0],
-               "operation": {"str_val": []},
-               "is_fct": func[1]}
-    all_op = find_everything(expr)
-
-    if not all_op:
-        if stringify:
-            expr = f"'{expr}'"
-        op_dict["operation"]['str_val'] = [expr]
-        return render(op_dict)
-
-    tree = get_tree(all_op)
-
-    for op in all_op:
-        for i_c, child in enumerate(op["operation"]["children"]):
-            if child is None:
-                str_val = op["operation"]["str_val"][i_c]
-                if stringify:
-                    str_val = f"'{str_val}'"
-                op_dict["operation"]['str_val'] = [str_val]
-                r = render(op_dict)
-                op["operation"]["str_val"][i_c] = r
-
-    return render_from_tree(tree, all_op) if tree else expr
+    expr_tree = ExprTree(expr)
+    expr_tree.apply_to_leaves(func, stringify)
+    return expr_tree.render()
 
 
 # Get the root operation _____________________________________________________
@@ -1588,13 +1522,7 @@ def get_root_operation(expr):
             True if the operation is a function and not an operator
     """
 
-    all_op = find_everything(expr)
-    tree = get_tree(all_op)
-
-    for node in tree:
-        if node.is_root:
-            return [all_op[int(node.name)]["operator"], all_op[int(node.name)]["is_fct"]]
-    return [[], []]
+    return ExprTree(expr).get_root_operation()
 
 
 # Pipe to function ____________________________________________________________
@@ -1619,18 +1547,9 @@ def pipe_to_func(expr):
         Expression without pipe notation
     """
 
-    all_op = find_everything(expr)
-    tree = get_tree(all_op)
-
-    for op in all_op:
-        if op["operator"] == "|":
-            op["operator"] = op["operation"]["str_val"][1]
-            del op["operation"]["indices"][1]
-            del op["operation"]["str_val"][1]
-            del op["operation"]["children"][1]
-            op["is_fct"] = True
-
-    return render_from_tree(tree, all_op) if tree else expr
+    expr_tree = ExprTree(expr)
+    expr_tree.pipe_to_func()
+    return expr_tree.render()
 
 # ----------------------------------------------------------------------------
 # | MAIN - RUNNING TESTS                                                     |
@@ -1644,33 +1563,13 @@ if __name__ == '__main__':
 
     func_str = '[abs(cos(a1**(3-6)**5, 5-4)*arccos(x**2+5+0.1))-8-5*t**s' + \
                '(k[0]/1)+a1**(3-6)**5*r*3+cos(x), -6*R**3+cos(x)]'
-    oper = '-u'
-    matches = catch_operator(func_str, oper)
-    for match in matches:
-        print('\n' + oper + ' :\n')
-        for operand in match:
-            print(func_str[operand[0]:operand[1]])
-
-    print('\n\n\n================\n', find_all_functions(func_str))
+    for op in find_everything(func_str):
+        print('\n' + op.operator + ' :\n')
+        for operand in op.str_val:
+            print(operand)
 
     replace_var(func_str, 'ze', 'ee')
 
-    func = 'cos'
-    # func_str = func_str.replace(' ', '')
-    func_calls = catch_function(func_str, func)
-
-    for call in func_calls:
-        print('\n' + func + ' :\n')
-        for arg in call:
-            print(func_str[arg[0]:arg[1]])
-
-    print('Lists : ____________________\n')
-    lists = find_all_lists(func_str)
-    for lis in lists:
-        print('\n')
-        for elem in lis:
-            print(func_str[elem[0]:elem[1]])
-
     print('OP___________________________________________________\n')
 
     # liste, expr= optimize(func_str)
@@ -0,0 +1,138 @@
+"""
+Evaluation of functions in a child process, killed if it takes too long.
+"""
+
+import multiprocessing
+import pickle
+import sys
+import traceback
+from contextlib import redirect_stdout
+from io import StringIO
+
+
+# The child process is forked, so that it starts with the state of the caller
+FORK_AVAILABLE = "fork" in multiprocessing.get_all_start_methods()
+
+
+# Remote Traceback ____________________________________________________________
+
+class RemoteTraceback(Exception):
+    """
+    Traceback of an exception raised in the child process, set as the cause
+    of the exception raised again in the calling process
+    """
+
+    def __init__(self, tb):
+        """Class constructor. Read class docstring for more details"""
+        super().__init__(tb)
+        self.tb = tb
+
+    def __str__(self):
+        return self.tb
+
+
+# Picklable objects ___________________________________________________________
+
+def picklable(obj):
+    """
+    Returns True if the object can be sent to the calling process
+
+    Parameters
+    ----------
+    obj : any
+
+    Returns
+    -------
+    bool
+    """
+    try:
+        pickle.dumps(obj)
+    except Exception:
+        return False
+    return True
+
+
+# Run Killable ________________________________________________________________
+
+def child(function, connection):
+    """
+    Call the function in the child process and send the result
+
+    Parameters
+    ----------
+    function : callable
+        Function without arguments
+
+    connection : multiprocessing.connection.Connection
+        Connection to the calling process
+    """
+    output = StringIO()
+    try:
+        with redirect_stdout(output):
+            result = (function(), None)
+    except Exception as e:
+        result = (None, (e, traceback.format_exc()))
+    try:
+        connection.send((output.getvalue(),) + result)
+    except Exception:
+        # The result or the exception cannot be pickled
+        e = result[1][0] if result[1] is not None else None
+        error = RuntimeError(f"{type(e).__name__}: {e}" if e is not None else
+                             "The result of the evaluation cannot be sent")
+        connection.send((output.getvalue(), None,
+                         (error, traceback.format_exc())))
+    connection.close()
+
+
+def run_killable(function, timeout):
+    """
+    Call the function in a forked child process, killed if it does not
+    return in time. The state changed by the function in the child process
+    is lost, only its return value and the text it prints are sent back.
+
+    Parameters
+    ----------
+    function : callable
+        Function without arguments. Its return value must be picklable
+
+    timeout : float
+        Maximum duration of the call, in seconds
+
+    Returns
+    -------
+    result : any
+        Return value of the function
+
+    Raises
+    ------
+    TimeoutError
+        If the function does not return in time
+
+    Exception
+        Any exception raised by the function, raised again with the traceback
+        of the child process as its cause
+    """
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=child, args=(function, sender))
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            raise TimeoutError(f"The evaluation took more than {timeout} "
+                               f"seconds")
+        try:
+            output, result, error = receiver.recv()
+        except EOFError:
+            raise RuntimeError("The evaluation process stopped "
+                               "unexpectedly") from None
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+    sys.stdout.write(output)
+    if error is not None:
+        raise error[0] from RemoteTraceback(error[1])
+    return result
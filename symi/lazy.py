@@ -0,0 +1,33 @@
+"""
+Modules loaded on first use, so that Symi starts without waiting for SymPy to
+be imported (commands, options, help, client...).
+"""
+
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Import a module lazily: the module object is created right away, but the
+    module is only executed when one of its attributes is first used.
+
+    Parameters
+    ----------
+    name : str
+        Name of the module
+
+    Returns
+    -------
+    module : module
+        Module, executed on first use
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
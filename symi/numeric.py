@@ -0,0 +1,118 @@
+"""
+Numeric evaluation of Sympy expressions with the float64 arithmetic of Python
+(math module), much faster than the arbitrary precision of evalf when double
+precision is enough (see the num_precision option).
+"""
+
+import math
+
+import sympy
+
+# Largest number of significant digits given by a float64
+FLOAT_DIGITS = 15
+
+# Sympy functions and their float64 equivalent
+FUNCTIONS = {
+    sympy.sin: math.sin, sympy.cos: math.cos, sympy.tan: math.tan,
+    sympy.cot: lambda x: 1 / math.tan(x),
+    sympy.sec: lambda x: 1 / math.cos(x),
+    sympy.csc: lambda x: 1 / math.sin(x),
+    sympy.asin: math.asin, sympy.acos: math.acos, sympy.atan: math.atan,
+    sympy.atan2: math.atan2,
+    sympy.sinh: math.sinh, sympy.cosh: math.cosh, sympy.tanh: math.tanh,
+    sympy.asinh: math.asinh, sympy.acosh: math.acosh,
+    sympy.atanh: math.atanh,
+    sympy.exp: math.exp, sympy.log: math.log,
+    sympy.gamma: math.gamma, sympy.loggamma: math.lgamma,
+    sympy.erf: math.erf, sympy.erfc: math.erfc,
+    sympy.Abs: abs, sympy.floor: math.floor, sympy.ceiling: math.ceil,
+    sympy.factorial: lambda x: math.gamma(x + 1)}
+
+
+def to_float(exp, precision=FLOAT_DIGITS):
+    """
+    Evaluate a Sympy expression with float64 numbers
+
+    Parameters
+    ----------
+    exp : Sympy Expression
+        Expression without free symbols
+
+    precision : int
+        Number of significant digits the value must have
+
+    Returns
+    -------
+    value : float or complex
+
+    Raises
+    ------
+    KeyError
+        If the expression contains a function that has no float64 equivalent
+
+    TypeError, ValueError, ArithmeticError
+        If the float64 evaluation fails (complex argument of a real function,
+        value out of the domain of a function, overflow...), or if the terms
+        of a sum cancel out so much that the value does not have the
+        precision
+    """
+    if exp.is_Number or exp.is_NumberSymbol:
+        return float(exp)
+    if exp is sympy.I:
+        return 1j
+    if exp.is_Add:
+        values = [to_float(arg, precision) for arg in exp.args]
+        if any(isinstance(value, complex) for value in values):
+            value = sum(values)
+        else:
+            value = math.fsum(values)
+        # The rounding errors of the terms are about 1e-16 times the largest
+        # one: the significant digits of the sum are lost when they cancel
+        # out, e.g. in pi - 355/113
+        largest = max(abs(term) for term in values)
+        if largest > abs(value) * 10 ** (FLOAT_DIGITS + 1 - precision):
+            raise ArithmeticError("Cancellation in a sum")
+        return value
+    if exp.is_Mul:
+        value = 1.
+        for arg in exp.args:
+            value *= to_float(arg, precision)
+        return value
+    if exp.is_Pow:
+        return to_float(exp.base, precision) ** to_float(exp.exp, precision)
+    return FUNCTIONS[exp.func](*(to_float(arg, precision)
+                                 for arg in exp.args))
+
+
+def evalf(exp, precision):
+    """
+    Numeric evaluation of an expression with a number of significant digits.
+    Expressions without free symbols are evaluated with float64 numbers if
+    the precision allows it, falling back to evalf if the float64 evaluation
+    fails, loses the precision or does not give a finite number.
+
+    Parameters
+    ----------
+    exp : Sympy Expression
+
+    precision : int
+        Number of significant digits
+
+    Returns
+    -------
+    num_exp : Sympy Expression
+        Evaluated expression
+    """
+    if precision <= FLOAT_DIGITS and isinstance(exp, sympy.Expr) and \
+            not exp.free_symbols:
+        try:
+            value = to_float(exp, precision)
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            value = None
+        if isinstance(value, float) and math.isfinite(value):
+            return sympy.Float(value, precision)
+        if isinstance(value, complex) and math.isfinite(value.real) and \
+                math.isfinite(value.imag):
+            return sympy.Float(value.real, precision) + \
+                sympy.I * sympy.Float(value.imag, precision)
+    return exp.evalf(precision)
@@ -0,0 +1,300 @@
+"""
+Parallel evaluation of a Symi script across a pool of worker processes, each
+keeping its own Symi instance.
+
+The lines form a graph where a line depends on the previous lines that may
+save the variables it uses (see SymiInstance.dependencies()). A line is sent
+to a worker as soon as these lines are evaluated, with the pickled values of
+the variables it uses, so that only the data dependencies serialize the
+evaluation.
+"""
+
+import pickle
+import sys
+import traceback
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import redirect_stdout
+from io import StringIO
+
+from SymiInstance import SymiInstance
+from colors import bcolors
+from profiler import PROFILER
+
+
+# Number of lines read ahead of the oldest line not printed yet, per worker
+LINES_PER_JOB = 16
+
+
+# Worker ______________________________________________________________________
+
+# Symi instance of the worker process, created once when the worker starts
+WORKER_INSTANCE = None
+
+
+def init_worker(colored):
+    """
+    Create the Symi instance of the worker process, and load SymPy
+
+    Parameters
+    ----------
+    colored : bool
+        False if the colors are disabled (see colors.bcolors.disable())
+    """
+    global WORKER_INSTANCE
+    if not colored:
+        bcolors.disable()
+    WORKER_INSTANCE = SymiInstance(interactive=False)
+
+    # The lines print into a StringIO (see evaluate()), where the pretty
+    # printer cannot tell if unicode is supported: SymPy is loaded and checks
+    # the real standard output once, before any line
+    import sympy
+    sympy.pprint_try_use_unicode()
+
+
+def evaluate(options, line, variables):
+    """
+    Evaluate a Symi command line in the worker process
+
+    Parameters
+    ----------
+    options : dict
+        Symi options to evaluate the line with
+
+    line : str
+        Symi command line
+
+    variables : dict of bytes
+        Pickled values of the variables used by the line
+
+    Returns
+    -------
+    status : int
+        Status of the line (see SymiInstance.parse_line())
+
+    output : str
+        Text printed by the line
+
+    saved : dict of bytes
+        Pickled values of the variables saved by the line
+
+    error : str
+        Traceback of the exception raised by the line, None if there is none
+
+    stats : dict
+        Number of calls and time of each stage of the line if it is profiled
+        (see profiler.Profiler), empty otherwise
+    """
+    symi = WORKER_INSTANCE
+    symi.options = dict(options)
+    values = {name: pickle.loads(value) for name, value in variables.items()}
+    symi.variables = values
+    output = StringIO()
+    status, error = -1, None
+    PROFILER.last = {}
+    try:
+        with redirect_stdout(output):
+            status = symi.parse_line(line)
+    except Exception:
+        error = traceback.format_exc()
+    saved = {name: pickle.dumps(value)
+             for name, value in symi.variables.items()
+             if name not in values or value is not values[name]}
+    return status, output.getvalue(), saved, error, PROFILER.last
+
+
+# Scheduler ___________________________________________________________________
+
+class Node:
+    """
+    Symi command line of the script
+
+    Attributes
+    ----------
+
+    line : str
+        Symi command line
+
+    options : dict
+        Symi options when the line is evaluated
+
+    used : set of str
+        Names of the variables the line may use
+
+    result : tuple
+        Result of evaluate(), None while the line is not evaluated
+    """
+
+    __slots__ = ("line", "options", "used", "result")
+
+    def __init__(self, line, options, used):
+        """Class constructor. Read class docstring for more details"""
+        self.line = line
+        self.options = options
+        self.used = used
+        self.result = None
+
+
+def run_parallel(symi, lines, jobs):
+    """
+    Evaluate Symi command lines like __main__.run_batch(), in a pool of
+    worker processes. The lines that cannot be evaluated by a worker (see
+    SymiInstance.dependencies()) are evaluated by symi once the previous
+    lines are done. The results are printed in the order of the lines.
+
+    Parameters
+    ----------
+    symi : SymiInstance
+        Symi instance evaluating the lines that cannot be sent to a worker
+
+    lines : iterable of str
+        Symi command lines
+
+    jobs : int
+        Number of worker processes
+
+    Returns
+    -------
+    status : int
+        0 if all the lines were evaluated successfully, 1 otherwise
+    """
+    lines = iter(lines)
+    status = 0
+    exhausted = False
+
+    nodes = {}        # Lines not printed yet, by index
+    waiting = []      # Indices of the lines not sent to a worker yet
+    running = {}      # Lines evaluated by a worker, by future
+    writers = {}      # Indices of the lines saving each variable
+    base = {}         # Position and pickled value of the variables of symi
+                      # when the planning started
+    saved = {}        # Pickled variables saved by the lines already printed
+    done = {}         # Pickled variables saved by each line printed
+    barrier = None    # Index of the next line evaluated by symi
+    count = 0         # Number of lines read
+    printed = 0       # Number of lines printed
+
+    def variables(index, used):
+        """
+        Pickled values of the variables used by the line, in the order they
+        are defined. Raises KeyError if a line that may save one of them is
+        not done.
+        """
+        defined = []
+        for name in used:
+            order, pickled = None, None
+            if name in base:
+                order, pickled = (0, base[name][0]), base[name][1]
+            positions = writers.get(name, [])
+            for writer in positions[:bisect_left(positions, index)]:
+                if writer in done:
+                    line_saved = done[writer]
+                elif nodes[writer].result is not None:
+                    line_saved = nodes[writer].result[2]
+                else:
+                    raise KeyError(name)
+                if name in line_saved:
+                    pickled = line_saved[name]
+                    order = order or (1, writer)
+            if pickled is not None:
+                defined.append((order, name, pickled))
+        return {name: pickled for _, name, pickled in sorted(defined)}
+
+    def submit(index):
+        """Send the line to a worker if the lines it depends on are done"""
+        node = nodes[index]
+        try:
+            line_variables = variables(index, node.used)
+        except KeyError:
+            return False
+        future = executor.submit(evaluate, node.options, node.line,
+                                 line_variables)
+        running[future] = index
+        return True
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(bcolors.ENDC != "",)) as executor:
+        while True:
+
+            # Planning  . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+            while barrier is None and not exhausted and \
+                    count - printed < LINES_PER_JOB * jobs:
+                line = next(lines, None)
+                if line is None:
+                    exhausted = True
+                    break
+                names = set(base) | set(writers)
+                dependencies = symi.dependencies(line, names)
+                if dependencies is None:
+                    nodes[count] = Node(line, None, None)
+                    barrier = count
+                else:
+                    used, saved_names = dependencies
+                    nodes[count] = Node(line, dict(symi.options), used)
+                    waiting.append(count)
+                    for name in saved_names:
+                        writers.setdefault(name, []).append(count)
+                count += 1
+
+            # Dispatch  . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+            waiting = [index for index in waiting if not submit(index)]
+
+            # Print . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+            while printed in nodes and nodes[printed].result is not None:
+                node = nodes.pop(printed)
+                line_status, output, line_saved, error, stats = node.result
+                sys.stdout.write(output)
+                if error is not None:
+                    sys.stdout.flush()
+                    sys.stderr.write(error)
+                    status = 1
+                elif line_status == -1:
+                    status = 1
+                saved.update(line_saved)
+                if stats:
+                    PROFILER.add_line(stats)
+                done[printed] = line_saved
+                printed += 1
+
+            # Barrier . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+            if barrier is not None and barrier == printed:
+                for name, pickled in saved.items():
+                    symi.set_variable(name, pickle.loads(pickled))
+                saved.clear()
+                sys.stdout.flush()
+                try:
+                    result = symi.parse_line(nodes.pop(barrier).line)
+                except BrokenPipeError:
+                    raise
+                except Exception:
+                    traceback.print_exc()
+                    result = -1
+                if result == 0:
+                    break
+                if result == -1:
+                    status = 1
+                printed += 1
+                barrier = None
+                base = {name: (position, pickle.dumps(symi.variables[name]))
+                        for position, name in enumerate(symi.variables)}
+                writers.clear()
+                done.clear()
+                continue
+
+            if not running:
+                if exhausted and not nodes:
+                    break
+                continue
+
+            # Wait for the workers  . . . . . . . . . . . . . . . . . . . . . .
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                nodes[running.pop(future)].result = future.result()
+
+    return status
@@ -0,0 +1,220 @@
+"""
+Wall time spent in the stages of the evaluation of the Symi command lines
+(conversion to Sympy, simplification, substitution, printing...).
+"""
+
+from timeit import default_timer
+
+
+# Stage _______________________________________________________________________
+
+class Stage:
+    """
+    Context manager timing a stage of the evaluation. The time spent in the
+    stages started inside it is not counted in its own time.
+
+    Parameters
+    ----------
+
+    profiler : Profiler
+        Profiler saving the time of the stage
+
+    name : str
+        Name of the stage
+    """
+
+    __slots__ = ("profiler", "name", "start", "inner")
+
+    def __init__(self, profiler, name):
+        """Class constructor. Read class docstring for more details"""
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.
+        self.inner = 0.
+
+    def __enter__(self):
+        self.profiler.stack.append(self)
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = default_timer() - self.start
+        stack = self.profiler.stack
+        stack.pop()
+        if stack:
+            stack[-1].inner += elapsed
+        self.profiler.add(self.name, 1, elapsed - self.inner)
+        return False
+
+
+class NoStage:
+    """
+    Context manager doing nothing, used when the profiler is disabled
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_STAGE = NoStage()
+
+
+# Profiler ____________________________________________________________________
+
+class Profiler:
+    """
+    Wall time spent in each stage of the evaluation, for the line being
+    evaluated and for the whole session.
+
+    Attributes
+    ----------
+
+    enabled : bool
+        True if the stages are timed
+
+    line : dict
+        Number of calls and time of each stage of the line being evaluated,
+        in seconds
+
+    last : dict
+        Same as line, for the last line evaluated
+
+    session : dict
+        Same as line, for all the lines evaluated
+
+    lines : int
+        Number of lines evaluated
+
+    stack : list of Stage
+        Stages being timed
+    """
+
+    def __init__(self):
+        """Class constructor. Read class docstring for more details"""
+        self.enabled = False
+        self.line = {}
+        self.last = {}
+        self.session = {}
+        self.lines = 0
+        self.stack = []
+
+    def stage(self, name):
+        """
+        Context manager timing a stage, if the profiler is enabled
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage
+
+        Returns
+        -------
+        stage : Stage or NoStage
+            Context manager timing the stage
+        """
+        if not self.enabled:
+            return NO_STAGE
+        return Stage(self, name)
+
+    def add(self, name, calls, time):
+        """
+        Add calls of a stage to the line being evaluated
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage
+
+        calls : int
+            Number of calls
+
+        time : float
+            Time spent in the calls, in seconds
+        """
+        entry = self.line.get(name)
+        if entry is None:
+            self.line[name] = [calls, time]
+        else:
+            entry[0] += calls
+            entry[1] += time
+
+    def merge(self, stats):
+        """
+        Add the stages timed in another process to the line being evaluated
+
+        Parameters
+        ----------
+        stats : dict
+            Number of calls and time of each stage
+        """
+        for name, (calls, time) in stats.items():
+            self.add(name, calls, time)
+
+    def end_line(self, total):
+        """
+        Ends the line being evaluated, and adds its stages to the session
+
+        Parameters
+        ----------
+        total : float
+            Time spent evaluating the line, in seconds. The time not spent in
+            any stage is saved as the "other" stage
+
+        Returns
+        -------
+        stats : dict
+            Number of calls and time of each stage of the line
+        """
+        other = total - sum(time for _, time in self.line.values())
+        self.add("other", 1, max(other, 0.))
+        self.last, self.line = self.line, {}
+        self.add_line(self.last)
+        return self.last
+
+    def add_line(self, stats):
+        """
+        Adds the stages of a line to the session
+
+        Parameters
+        ----------
+        stats : dict
+            Number of calls and time of each stage of the line
+        """
+        for name, (calls, time) in stats.items():
+            entry = self.session.setdefault(name, [0, 0.])
+            entry[0] += calls
+            entry[1] += time
+        self.lines += 1
+
+
+def table(stats):
+    """
+    Table of the time spent in each stage, the longest first
+
+    Parameters
+    ----------
+    stats : dict
+        Number of calls and time of each stage, in seconds
+
+    Returns
+    -------
+    table : str
+        Table with one line per stage, and the total
+    """
+    total = sum(time for _, time in stats.values())
+    rows = [f"{'stage':<16}{'calls':>8}{'time (ms)':>12}{'%':>8}"]
+    for name, (calls, time) in sorted(stats.items(), key=lambda x: -x[1][1]):
+        percent = 100 * time / total if total else 0.
+        rows.append(f"{name:<16}{calls:>8}{time * 1e3:>12.3f}"
+                    f"{percent:>8.1f}")
+    rows.append(f"{'total':<16}{'':>8}{total * 1e3:>12.3f}{100.:>8.1f}")
+    return "\n".join(rows)
+
+
+# Profiler of the stages run in this process
+PROFILER = Profiler()
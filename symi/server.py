@@ -0,0 +1,178 @@
+"""
+Symi server keeping warm Symi instances behind a local Unix socket, so that
+the clients (see client.py) do not pay for the Python startup, the SymPy
+import and the Symi initialization on every call.
+
+Every client connection is answered by its own thread, so that an idle client
+does not hold up the others. The lines are evaluated one after the other, in
+named sessions. Every session is a Symi instance with its own variables,
+options and caches.
+"""
+
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from contextlib import redirect_stdout
+from io import StringIO
+
+from SymiInstance import SymiInstance
+
+
+# Request Handler _____________________________________________________________
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Answers the requests of a client connection, one JSON object per line
+    (see client.py for the protocol)
+    """
+
+    def handle(self):
+        for request in self.rfile:
+            try:
+                request = json.loads(request)
+                response = self.server.evaluate(
+                    str(request.get("session", "default")),
+                    str(request["line"]))
+            except (ValueError, KeyError, AttributeError) as e:
+                response = {"status": -1, "output": "",
+                            "error": f"Invalid request: {e}\n"}
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+
+# Server ______________________________________________________________________
+
+class SymiServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Unix socket server evaluating Symi command lines in named sessions, with
+    a thread per client connection
+
+    Parameters
+    ----------
+
+    path : str
+        Path of the socket
+
+    options : dict
+        Symi options of the new sessions, that differ from the default ones
+
+    Attributes
+    ----------
+
+    sessions : dict
+        Symi instances of the sessions, by name
+
+    lock : threading.Lock
+        Held while a line is evaluated
+    """
+
+    # The threads of the clients still connected do not keep the server
+    # running when it stops
+    daemon_threads = True
+
+    def __init__(self, path, options):
+        """Class constructor. Read class docstring for more details"""
+        self.options = options
+        self.sessions = {}
+        self.lock = threading.Lock()
+        super().__init__(path, RequestHandler)
+
+    def server_bind(self):
+        # Only the user can connect: the lines may run any Python code
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def evaluate(self, session, line):
+        """
+        Evaluate a Symi command line in a session. The session is created on
+        its first line, and removed when it exits.
+
+        The lines of all the sessions are evaluated one at a time: the
+        standard output redirection and SymPy are shared by the threads.
+
+        Parameters
+        ----------
+        session : str
+            Name of the session
+
+        line : str
+            Symi command line
+
+        Returns
+        -------
+        response : dict
+            Contains the "status" of the line (see SymiInstance.parse_line()),
+            its printed "output", and the traceback of the exception it
+            raised as "error" (None if there is none)
+        """
+        with self.lock:
+            symi = self.sessions.get(session)
+            if symi is None:
+                symi = self.sessions[session] = SymiInstance(
+                    interactive=False)
+                symi.options.update(self.options)
+            output = StringIO()
+            status, error = -1, None
+            try:
+                with redirect_stdout(output):
+                    status = symi.parse_line(line)
+            except Exception:
+                error = traceback.format_exc()
+            if status == 0:
+                del self.sessions[session]
+        return {"status": status, "output": output.getvalue(),
+                "error": error}
+
+
+def serve(path, options):
+    """
+    Run a Symi server until it is interrupted or terminated
+
+    Parameters
+    ----------
+    path : str
+        Path of the socket
+
+    options : dict
+        Symi options of the new sessions, that differ from the default ones
+
+    Returns
+    -------
+    status : int
+        0 if the server stopped normally, 1 if it could not start
+    """
+    if os.path.exists(path):
+        # Remove the socket of a server that did not stop properly
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+        else:
+            print(f"A Symi server is already running on {path}",
+                  file=sys.stderr)
+            return 1
+        finally:
+            probe.close()
+
+    # SymPy is loaded before the first request, not when it is evaluated
+    import expr2sympy  # noqa: F401
+
+    # Terminating the server stops it like an interruption
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    with SymiServer(path, options) as server:
+        print(f"Symi server listening on {path}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+    return 0
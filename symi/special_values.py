@@ -3,16 +3,22 @@ This  file  contains all the special values supported by Symi expressions, and
 how they are converted to SymPy functions.
 """
 
+from functools import lru_cache
+
 from sympy.parsing.sympy_parser import parse_expr
 from sympy import laplace_transform, Symbol, simplify, Heaviside, DiracDelta, \
     inverse_laplace_transform
 
 
+@lru_cache(maxsize=None)
 def get_values():
     """
     Get the special values as a dict where the keys are the Symi expressions
     ans the values are the corresponding SymPy values.
 
+    The values are only built on the first call. The same dicts are returned
+    on every call, so they must be copied before being modified.
+
     Returns
     -------
     values : tuple of dict
@@ -0,0 +1,212 @@
+"""
+Storage of the Symi variables, resolving the variables substitution.
+"""
+
+from lazy import lazy_import
+
+# SymPy is loaded when the first variable is saved
+sympy = lazy_import("sympy")
+
+
+# Variable Store ______________________________________________________________
+
+class VariableStore(dict):
+    """
+    Dict of the Symi variables, where the keys are the variable names and the
+    values their expressions.
+
+    The store keeps the fully substituted value of every variable, and the
+    variables each one depends on. When a variable changes, only the values
+    depending on it are substituted again, so that substituting the variables
+    in an expression is a single pass.
+
+    Variables whose name is not a symbol (e.g. "f(x)") cannot be tracked.
+    When there is one, the substitution is repeated until a fixed point is
+    reached, like a plain dict of variables.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Class constructor. Read class docstring for more details"""
+        super().__init__()
+        self._keys = {}
+        self._untracked = set()
+        self._resolved = {}
+        self._dependents = {}
+        self._resolving = set()
+        self.update(*args, **kwargs)
+
+    # Changes .................................................................
+
+    def __setitem__(self, name, value):
+        super().__setitem__(name, value)
+        self.changed(name)
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self.changed(name)
+
+    def pop(self, name, *default):
+        value = super().pop(name, *default)
+        self.changed(name)
+        return value
+
+    def popitem(self):
+        name, value = super().popitem()
+        self.changed(name)
+        return name, value
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        for name, value in dict(*args, **kwargs).items():
+            self[name] = value
+
+    def clear(self):
+        super().clear()
+        self._keys.clear()
+        self._untracked.clear()
+        self._resolved.clear()
+        self._dependents.clear()
+
+    def changed(self, name):
+        """
+        Forgets the substituted values depending on the variable
+
+        Parameters
+        ----------
+        name : str
+            Name of the variable that changed
+        """
+        key = self._keys.pop(name, None)
+        if key is None:
+            key = sympy.parse_expr(name)
+        self._untracked.discard(name)
+        if name in self:
+            self._keys[name] = key
+            if not isinstance(key, sympy.Symbol) or str(key) != name:
+                self._untracked.add(name)
+
+        self._resolved.pop(name, None)
+        stack = [key]
+        while stack:
+            symbol = stack.pop()
+            for dependent in self._dependents.pop(symbol, ()):
+                if self._resolved.pop(dependent, None) is not None:
+                    stack.append(self._keys[dependent])
+
+    # Substitution ............................................................
+
+    def resolve(self, name):
+        """
+        Returns the value of a variable where all the variables are
+        substituted. Variables depending on themselves are substituted until
+        their own name is found again, which is kept as a symbol: with
+        a = b + 1 and b = a + 1, a resolves to a + 2 and b to b + 2, whatever
+        the order of the definitions and of the lookups.
+
+        Parameters
+        ----------
+        name : str
+            Name of the variable
+
+        Returns
+        -------
+        value : Sympy Expression
+            Substituted value of the variable
+        """
+        return self.resolve_from(name)[0]
+
+    def resolve_from(self, name):
+        """
+        Resolves a variable while the variables being resolved are kept as
+        symbols (see resolve())
+
+        Parameters
+        ----------
+        name : str
+            Name of the variable
+
+        Returns
+        -------
+        value : Sympy Expression
+            Substituted value of the variable
+
+        cycles : set of str
+            Variables being resolved that were kept as symbols. The value only
+            depends on the variables being resolved if there are some, it is
+            then not saved.
+        """
+        value = self._resolved.get(name)
+        if value is not None:
+            return value, set()
+
+        value = sympy.sympify(self[name])
+        self._resolving.add(name)
+        cycles = set()
+        try:
+            substitutions = {}
+            for symbol in value.free_symbols:
+                self._dependents.setdefault(symbol, set()).add(name)
+                dependency = str(symbol)
+                if dependency not in self:
+                    continue
+                if dependency in self._resolving:
+                    cycles.add(dependency)
+                    continue
+                substitutions[symbol], found = self.resolve_from(dependency)
+                cycles |= found
+        finally:
+            self._resolving.discard(name)
+
+        if substitutions:
+            value = value.subs(substitutions)
+        if not cycles:
+            self._resolved[name] = value
+        return value, cycles
+
+    def substitute(self, exp):
+        """
+        Substitutes all the variables in the expression
+
+        Parameters
+        ----------
+        exp : Sympy Expression
+            Expression to substitute the variables in
+
+        Returns
+        -------
+        sub_exp : Sympy Expression
+            Expression substituted
+        """
+        if self._untracked:
+            return self.fixed_point(exp)
+
+        substitutions = {symbol: self.resolve(str(symbol))
+                         for symbol in exp.free_symbols if str(symbol) in self}
+        return exp.subs(substitutions) if substitutions else exp
+
+    def fixed_point(self, exp):
+        """
+        Substitutes all the variables in the expression again and again until
+        it does not change anymore
+
+        Parameters
+        ----------
+        exp : Sympy Expression
+            Expression to substitute the variables in
+
+        Returns
+        -------
+        sub_exp : Sympy Expression
+            Expression substituted
+        """
+        replace = [(self._keys[name], self[name]) for name in self]
+        for _ in range(0, len(replace) + 1):
+            new_exp = exp.subs(replace)
+            if new_exp == exp:
+                return new_exp
+            exp = new_exp
+        return exp
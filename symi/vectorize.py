@@ -0,0 +1,350 @@
+"""
+Numeric evaluation of an expression over an array of values of one of its
+variables, e.g. "sin(x)/x @ x in linspace(1, 10, 1e6)", or over a grid of
+values of several variables, e.g. "table a*b for a in 0:1:0.01, b in 1:10".
+The expression is compiled once with Sympy's lambdify, and evaluated over
+whole arrays in vectorized calls to NumPy.
+
+NumPy is an optional dependency: it is only needed by these evaluations.
+"""
+
+import importlib.util
+import math
+import re
+
+from lazy import lazy_import
+from profiler import PROFILER
+
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+# SymPy and NumPy are loaded when the first array is evaluated
+sympy = lazy_import("sympy")
+if NUMPY_AVAILABLE:
+    numpy = lazy_import("numpy")
+
+# Arrays of values and the meaning of their arguments
+ARRAYS = {"linspace": "start, stop, num",
+          "arange": "start, stop, step",
+          "logspace": "start, stop, num"}
+
+SYNTAX = re.compile(r"(?P<expr>.*[\w)\]'])\s+@\s*(?P<variable>[^\W\d]\w*)"
+                    r"\s+in\s+(?P<array>[^\W\d]\w*)\s*\((?P<args>.*)\)"
+                    r"\s*(?:>\s*(?P<path>[^\s>]+))?")
+TABLE_SYNTAX = re.compile(r"table\s+(?P<expr>.+?)\s+for\s+(?P<ranges>.+?)"
+                          r"\s*(?:>\s*(?P<path>[^\s>]+))?")
+RANGE_SYNTAX = re.compile(r"(?P<variable>[^\W\d]\w*)\s+in\s+(?P<range>.+)")
+
+# Number of rows of a table evaluated at once, bounding the memory used
+TABLE_CHUNK = 65536
+
+
+# Parsing _____________________________________________________________________
+
+def parse(line):
+    """
+    Parse a Symi command line evaluating an expression over an array:
+
+        expression @ variable in array(arguments) [> path]
+
+    The "@" must follow the end of an operand, so that it is not mistaken
+    for the substitution operator (e.g. "x + @y").
+
+    Parameters
+    ----------
+    line : str
+        Symi command line, stripped
+
+    Returns
+    -------
+    parsed : tuple or None
+        Expression, variable name, array name, list of the arguments of the
+        array, and path of the file to save the values in (None if there is
+        none). None if the line does not evaluate an expression over an
+        array.
+    """
+    match = SYNTAX.fullmatch(line)
+    if match is None:
+        return None
+    return (match.group("expr"), match.group("variable"),
+            match.group("array"), split(match.group("args")),
+            match.group("path"))
+
+
+def parse_table(line):
+    """
+    Parse a Symi command line writing the table of the values of an
+    expression over a grid:
+
+        table expression for variable in start:stop[:step], ... [> path]
+
+    Parameters
+    ----------
+    line : str
+        Symi command line, stripped
+
+    Returns
+    -------
+    parsed : tuple or None
+        Expression, list of (variable name, list of the bounds of its range),
+        and path of the CSV file to write the table in (None to print it).
+        None if the line does not write a table.
+
+    Raises
+    ------
+    ValueError
+        If the line writes a table, but a range does not follow the syntax
+    """
+    match = TABLE_SYNTAX.fullmatch(line)
+    if match is None:
+        return None
+    ranges = []
+    for text in split(match.group("ranges")):
+        range_match = RANGE_SYNTAX.fullmatch(text)
+        bounds = [] if range_match is None else \
+            [bound.strip() for bound in range_match.group("range").split(":")]
+        if len(bounds) not in [2, 3]:
+            raise ValueError(f"Invalid range {text}. Please follow the "
+                             f"syntax:\nvariable in start:stop[:step]")
+        ranges.append((range_match.group("variable"), bounds))
+    return match.group("expr"), ranges, match.group("path")
+
+
+def split(text):
+    """
+    Split a text at the commas that are not between parentheses or brackets
+
+    Parameters
+    ----------
+    text : str
+
+    Returns
+    -------
+    parts : list of str
+        Stripped parts of the text
+    """
+    parts = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(text):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    parts.append(text[start:].strip())
+    return parts
+
+
+# Evaluation __________________________________________________________________
+
+def array(name, args):
+    """
+    Array of values, built like the NumPy function of the same name
+
+    Parameters
+    ----------
+    name : str
+        "linspace", "arange" or "logspace" (see ARRAYS)
+
+    args : list of float
+        Arguments of the array
+
+    Returns
+    -------
+    values : numpy.ndarray
+        Values of the array
+
+    Raises
+    ------
+    ValueError
+        If the arguments do not define an array
+    """
+    if len(args) != 3:
+        raise ValueError(f"{name} takes 3 arguments: {ARRAYS[name]}")
+    start, stop, last = args
+    if name == "arange":
+        if last == 0:
+            raise ValueError("The step of arange must not be 0")
+        return numpy.arange(start, stop, last)
+    if last != int(last) or last < 1:
+        raise ValueError(f"The number of values of {name} must be a "
+                         f"positive integer")
+    return getattr(numpy, name)(start, stop, int(last))
+
+
+def sweep(start, stop, step=1.):
+    """
+    Values of a range of a table, from start to stop included
+
+    Parameters
+    ----------
+    start, stop, step : float
+        Bounds and step of the range
+
+    Returns
+    -------
+    values : numpy.ndarray
+        Values of the range
+
+    Raises
+    ------
+    ValueError
+        If the range is empty
+    """
+    if step == 0:
+        raise ValueError("The step of a range must not be 0")
+    # Tolerance on the rounding errors of (stop - start) / step
+    count = math.floor((stop - start) / step * (1 + 1e-12) + 1e-9) + 1
+    if count < 1:
+        raise ValueError(f"The range {start}:{stop}:{step} is empty")
+    return start + step * numpy.arange(count)
+
+
+def evaluate(expr, symbol, values):
+    """
+    Evaluate an expression for all the values of a variable
+
+    Parameters
+    ----------
+    expr : Sympy Expression
+        Expression whose only free symbol is the variable
+
+    symbol : Sympy Symbol
+        Variable
+
+    values : numpy.ndarray
+        Values of the variable
+
+    Returns
+    -------
+    results : numpy.ndarray
+        Values of the expression, with the same shape as values
+    """
+    with PROFILER.stage("lambdify"):
+        function = sympy.lambdify(symbol, expr, "numpy")
+    with PROFILER.stage("vectorized"):
+        with numpy.errstate(all="ignore"):
+            results = numpy.asarray(function(values))
+        # Constant expressions give a single value
+        return numpy.broadcast_to(results, values.shape)
+
+
+def summary(results):
+    """
+    Summary of the values of an expression
+
+    Parameters
+    ----------
+    results : numpy.ndarray
+        Values of the expression
+
+    Returns
+    -------
+    summary : dict
+        Number of "values", number of values that are not "finite" (nan or
+        infinite), and "min", "max" and "mean" of the finite values (None if
+        there is none). Complex values only have a mean.
+    """
+    finite = results[numpy.isfinite(results)]
+    stats = {"values": results.size, "not finite": results.size - finite.size,
+             "min": None, "max": None, "mean": None}
+    if finite.size == 0:
+        return stats
+    if numpy.iscomplexobj(finite):
+        stats["mean"] = complex(finite.mean())
+    else:
+        stats["min"] = float(finite.min())
+        stats["max"] = float(finite.max())
+        stats["mean"] = float(finite.mean())
+    return stats
+
+
+def table(expr, symbols, values, stream):
+    """
+    Write the values of an expression for all the combinations of the values
+    of its variables (the last variable changing first) as CSV rows. The rows
+    are evaluated and written by chunks of TABLE_CHUNK rows, so that the
+    memory used does not depend on the size of the table.
+
+    Complex values are written in two columns, for their real and imaginary
+    parts.
+
+    Parameters
+    ----------
+    expr : Sympy Expression
+        Expression whose free symbols are among the variables
+
+    symbols : list of Sympy Symbol
+        Variables
+
+    values : list of numpy.ndarray
+        Values of each variable
+
+    stream : file-like object
+        Text stream to write the rows in, after a header line
+
+    Returns
+    -------
+    rows : int
+        Number of rows written
+    """
+    with PROFILER.stage("lambdify"):
+        function = sympy.lambdify(symbols, expr, "numpy")
+    shape = tuple(array.size for array in values)
+    rows = math.prod(shape)
+    header = [str(symbol) for symbol in symbols]
+    complex_values = None
+    for start in range(0, rows, TABLE_CHUNK):
+        with PROFILER.stage("vectorized"):
+            indices = numpy.unravel_index(
+                numpy.arange(start, min(start + TABLE_CHUNK, rows)), shape)
+            columns = [array[index] for array, index in zip(values, indices)]
+            with numpy.errstate(all="ignore"):
+                results = numpy.broadcast_to(
+                    numpy.asarray(function(*columns)), columns[0].shape)
+
+        # The header depends on the type of the first values
+        if complex_values is None:
+            complex_values = numpy.iscomplexobj(results)
+            header += ["real", "imag"] if complex_values else ["value"]
+            stream.write(",".join(header) + "\n")
+        if complex_values:
+            columns += [results.real, results.imag]
+        else:
+            columns.append(results.real)
+
+        # Formatting all the rows at once is faster than numpy.savetxt
+        chunk = numpy.column_stack(columns)
+        row = ",".join(["%r"] * chunk.shape[1]) + "\n"
+        stream.write((row * chunk.shape[0]) % tuple(chunk.ravel().tolist()))
+    return rows
+
+
+def export(path, name, values, results):
+    """
+    Save the values of the variable and of the expression in a file: a NumPy
+    file of shape (2, n) if the path ends with ".npy", else a CSV file with a
+    header line
+
+    Parameters
+    ----------
+    path : str
+        Path of the file
+
+    name : str
+        Name of the variable
+
+    values : numpy.ndarray
+        Values of the variable
+
+    results : numpy.ndarray
+        Values of the expression
+    """
+    data = numpy.stack([values, results])
+    if path.endswith(".npy"):
+        numpy.save(path, data)
+    else:
+        numpy.savetxt(path, data.T, delimiter=",", header=f"{name},value",
+                      comments="")
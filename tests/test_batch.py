@@ -0,0 +1,94 @@
+"""
+Tests of the batch mode of the command-line interface.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+
+import os
+import subprocess
+import sys
+from os.path import join, dirname, abspath
+
+import pytest
+
+SYMI = join(dirname(abspath(__file__)), "..", "symi")
+ENV = {**os.environ, "PYTHONIOENCODING": "utf-8"}
+
+
+def symi(*args, lines=(), stdout=subprocess.PIPE):
+    """
+    Run Symi in batch mode with the lines as standard input
+    """
+    return subprocess.run([sys.executable, SYMI, "--batch", *args],
+                          input="".join(line + "\n" for line in lines),
+                          stdout=stdout, stderr=subprocess.PIPE, text=True,
+                          encoding="utf-8", env=ENV, timeout=300)
+
+
+# Output ______________________________________________________________________
+
+def test_no_colors_in_pipes():
+    result = symi(lines=["sin(a)-$x+(i)**(a)", "x +* y"])
+    assert "WARNING" in result.stdout
+    assert "\033[" not in result.stdout + result.stderr
+
+
+def test_parallel_pretty_printing():
+    lines = ["sqrt(a)", "2*d", "integrate(f(x), x)"]
+    serial = symi(lines=lines)
+    assert "√a" in serial.stdout
+    assert symi("--jobs", "2", lines=lines).stdout == serial.stdout
+
+
+def test_closed_output_exits_cleanly(tmp_path):
+    script = "".join(f"x**{i}\n" for i in range(300))
+    for jobs in ["1", "2"]:
+        with open(tmp_path / "stderr", "w+") as stderr:
+            process = subprocess.Popen(
+                [sys.executable, SYMI, "--batch", "--jobs", jobs],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr,
+                text=True)
+            process.stdin.write(script)
+            process.stdin.close()
+            process.stdout.readline()
+            process.stdout.close()
+            assert process.wait(timeout=120) == 1
+            stderr.seek(0)
+            assert "Traceback" not in stderr.read()
+
+
+# Parallel evaluation _________________________________________________________
+
+SCRIPTS = {
+    "redefinitions": ["a = 2", "b = a + 1", "b!", "a = 5", "b!", "c = b*x",
+                      "c!", "a = 1", "c!", "b = 0", "c!", "vars"],
+    "functions": ["a = 2", "f(x) = x**2 + a", "f(x)!", "g = f(x) * 2",
+                  "g!", "f(x) = x - 1", "g!", "a = 3", "f(x)!", "g!"],
+    "ans": ["x**2 + 1", "ans_ * 2!", "diff(ans_, x)!", "c = ans_ + 1",
+            "c!", "sin(x)'", "ans_!", "c!", "y", "ans_ + c!", "vars"],
+    "options": ["a = x", "b = a**2", "always_sub on", "a = 3", "b", "ans_",
+                "always_sub off", "implicit_multiplication off", "2 * a",
+                "implicit_multiplication on", "2a!", "clear", "b!"],
+}
+
+
+@pytest.mark.parametrize("script", list(SCRIPTS))
+def test_parallel_output_matches_serial(script):
+    serial = symi(lines=SCRIPTS[script])
+    assert serial.returncode == 0, serial.stderr
+    for jobs in ["2", "4"]:
+        parallel = symi("--jobs", jobs, lines=SCRIPTS[script])
+        assert parallel.returncode == 0, parallel.stderr
+        assert parallel.stdout == serial.stdout
+
+
+# Imports _____________________________________________________________________
+
+def test_readline_is_not_imported():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", SYMI, "--batch"],
+        input="x\n", capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0
+    assert "readline" not in result.stderr
@@ -0,0 +1,133 @@
+"""
+Tests of the bounded caches, and of the parse cache of a Symi instance.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+
+import json
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+from os.path import join, dirname, abspath
+
+sys.path.insert(0, join(dirname(abspath(__file__)), "..", "symi"))
+
+from cache import LRUCache, MemoryLRUCache  # noqa: E402
+from SymiInstance import SymiInstance  # noqa: E402
+
+
+def run(symi, lines):
+    """
+    Results of Symi command lines, evaluated in JSON output mode
+    """
+    output = StringIO()
+    with redirect_stdout(output):
+        for line in lines:
+            symi.parse_line(line)
+    return [[result["str"] for result in json.loads(record)["results"]]
+            for record in output.getvalue().splitlines()]
+
+
+def json_instance():
+    symi = SymiInstance(interactive=False)
+    symi.options["output"] = "json"
+    return symi
+
+
+# LRU Cache ___________________________________________________________________
+
+def test_lru_drops_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_lru_stats():
+    cache = LRUCache(4)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("b", 0)
+    assert cache.stats() == {"size": 1, "max_size": 4, "hits": 1,
+                             "misses": 1, "hit_rate": 0.5}
+    cache.clear()
+    assert cache.stats()["size"] == 0
+    assert cache.stats()["hit_rate"] == 0.
+
+
+def test_lru_changes_are_merged():
+    cache = LRUCache(8)
+    cache.put("a", 1)
+    snapshot = cache.snapshot()
+    cache.get("a")
+    cache.get("b")
+    cache.put("b", 2)
+
+    other = LRUCache(8)
+    other.merge(cache.changes(snapshot))
+    assert other.get("b") == 2
+    assert other.get("a") is None
+    assert (other.hits, other.misses) == (2, 2)
+
+
+def test_memory_lru_budget():
+    cache = MemoryLRUCache(10, lambda key, value: value)
+    cache.put("a", 4)
+    cache.put("b", 4)
+    cache.put("too_large", 11)
+    assert cache.get("too_large") is None
+    cache.put("c", 4)
+    assert cache.get("a") is None
+    assert cache.memory == 8
+    cache.resize(4)
+    assert len(cache) == 1 and cache.get("c") == 4
+
+
+# Parse cache _________________________________________________________________
+
+def test_repeated_substituted_lines_hit():
+    symi = json_instance()
+    run(symi, ["x**2 + 1!"])
+    hits = symi.parse_cache.hits
+    run(symi, ["x**2 + 1!", "x**2 + 1!"])
+    assert symi.parse_cache.hits >= hits + 2
+
+
+def test_ans_is_not_stale():
+    symi = json_instance()
+    assert run(symi, ["x + 1", "ans_ * 2!", "y", "ans_ * 2!"]) == \
+        [["x + 1"], ["2*x + 2"], ["y"], ["2*y"]]
+
+
+def test_variables_depending_on_ans_are_not_stale():
+    symi = json_instance()
+    assert run(symi, ["x", "z = ans_ + 1", "z!", "y", "z!"]) == \
+        [["x"], [], ["x + 1"], ["y"], ["y + 1"]]
+
+
+# Simplify cache ______________________________________________________________
+
+def test_sessions_have_their_own_simplify_cache():
+    first, second = json_instance(), json_instance()
+    run(first, ["(x**2 - 1)/(x - 1)"])
+    size = len(first.simplify_cache)
+    assert size > 0
+    run(second, ["simplify_cache off", "(y**2 - 1)/(y - 1)"])
+    assert len(first.simplify_cache) == size
+    assert first.simplify_cache.max_memory == 64 * 2 ** 20
+    assert len(second.simplify_cache) == 0
+
+
+def test_simplify_cache_hits():
+    symi = json_instance()
+    run(symi, ["sin(x)**2 + cos(x)**2"])
+    hits = symi.simplify_cache.hits
+    assert run(symi, ["sin(x)**2 + cos(x)**2!"]) == [["1"]]
+    assert symi.simplify_cache.hits > hits
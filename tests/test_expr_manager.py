@@ -0,0 +1,98 @@
+"""
+Regression tests of the expression scanner of expr_manager.
+
+The operations found in a corpus of expressions, the expressions rendered
+after replacing operators and functions, and the supported syntax check are
+compared to the ones of the scanner that looked for every operator in turn
+(catch_operator), pinned in expr_manager_baseline.json. The unsupported
+expressions are rendered like the rewrite passes applied one after the other
+on the string did.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+
+import json
+import sys
+from os.path import join, dirname, abspath
+
+import pytest
+
+sys.path.insert(0, join(dirname(abspath(__file__)), "..", "symi"))
+
+from expr_manager import ExprTree, find_everything, is_supported, \
+    replace_many  # noqa: E402
+
+# Replacements done by expr2sympy (see replacement_tables())
+OLD_FCT = [['arccos', True], ['arcsin', True], ['arctan', True],
+           ['conj', True], ['abs', True], ['int', True], ['des', True],
+           ['@u', False], ['$u', False], ["'s", False], ['!s', False]]
+NEW_FCT = [['acos', True], ['asin', True], ['atan', True],
+           ['conjugate', True], ['Abs', True], ['integrate', True],
+           ['apart', True], ['__SUB', True], ['__integrate', True],
+           ['__diff', True], ['factorial', True]]
+
+with open(join(dirname(abspath(__file__)), "expr_manager_baseline.json"),
+          encoding="utf-8") as baseline_file:
+    BASELINE = json.load(baseline_file)
+
+
+# Renders _____________________________________________________________________
+
+def operations(expr):
+    """
+    Operator, is_fct and operands of all the operations of an expression.
+    They are sorted, the previous scanner listed the function calls in the
+    order of a set of names.
+    """
+    return sorted([op.operator, op.is_fct, op.str_val]
+                  for op in find_everything(expr))
+
+
+def conversion(expr):
+    """
+    Expression rendered with the rewrite passes of expr2sympy
+    """
+    expr_tree = ExprTree(expr)
+    supported = expr_tree.is_supported()
+    for rewrite in (expr_tree.pipe_to_func,
+                    lambda: expr_tree.replace_many(OLD_FCT, NEW_FCT)):
+        rewrite()
+        if not supported:
+            expr_tree.reparse()
+    expr_tree.apply_to_leaves(["MySymbol", True], True)
+    return expr_tree.render()
+
+
+# Tests _______________________________________________________________________
+
+@pytest.mark.parametrize("expr", list(BASELINE))
+def test_find_everything(expr):
+    assert operations(expr) == BASELINE[expr]["operations"]
+
+
+@pytest.mark.parametrize("expr", list(BASELINE))
+def test_is_supported(expr):
+    assert is_supported(expr) == BASELINE[expr]["is_supported"]
+
+
+@pytest.mark.parametrize("expr", list(BASELINE))
+def test_replace_many(expr):
+    assert replace_many(expr, OLD_FCT, NEW_FCT) == \
+        BASELINE[expr]["replace_many"]
+
+
+@pytest.mark.parametrize("expr", list(BASELINE))
+def test_conversion(expr):
+    assert conversion(expr) == BASELINE[expr]["conversion"]
+
+
+@pytest.mark.parametrize("expr, rendered", [
+    ("+x+y+z", "+MySymbol('x')+MySymbol('y')+MySymbol('z')"),
+    ("+x+2+-z*y",
+     "+MySymbol('x')+MySymbol('2')+-MySymbol('z')*MySymbol('y')")])
+def test_leading_unary_sum(expr, rendered):
+    # The previous scanner raised an IndexError on these expressions
+    assert is_supported(expr)
+    assert conversion(expr) == rendered
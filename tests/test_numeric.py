@@ -0,0 +1,87 @@
+"""
+Tests of the float64 numeric evaluation of numeric.py, against the arbitrary
+precision of evalf.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+
+import sys
+from os.path import join, dirname, abspath
+
+import pytest
+import sympy
+from sympy import S, Rational, sqrt, pi, E
+
+sys.path.insert(0, join(dirname(abspath(__file__)), "..", "symi"))
+
+from numeric import FUNCTIONS, FLOAT_DIGITS, to_float, evalf  # noqa: E402
+
+PRECISIONS = range(1, FLOAT_DIGITS + 1)
+ARGUMENTS = [Rational(3, 10), Rational(1, 3), sqrt(2) / 2, pi / 7, E / 5]
+
+# Arguments in the domain of the functions that do not take all of them
+DOMAINS = {sympy.acosh: [1 + arg for arg in ARGUMENTS]}
+
+CONSTANTS = [pi, E, sympy.EulerGamma, sympy.GoldenRatio, sympy.Catalan,
+             sqrt(2), pi ** E, E * pi / 3, 1 / pi + 2, sympy.I * pi + 1]
+
+CANCELLATIONS = [pi - Rational(355, 113), sympy.exp(Rational(1, 10 ** 8)) - 1,
+                 sqrt(2) - Rational(14142135623, 10 ** 10),
+                 sympy.sin(1) ** 2 + sympy.cos(1) ** 2 - 1]
+
+
+def expressions():
+    """
+    Calls of the functions that have a float64 equivalent
+    """
+    calls = []
+    for function in FUNCTIONS:
+        for arg in DOMAINS.get(function, ARGUMENTS):
+            args = (arg, S(2)) if function is sympy.atan2 else (arg,)
+            calls.append(pytest.param(function(*args, evaluate=False),
+                                      id=f"{function.__name__}({arg})"))
+    return calls
+
+
+def assert_close(value, expected, precision):
+    """
+    The value is the expected one up to the rounding of its last digit
+    """
+    assert abs(complex(value - expected)) <= \
+        10 ** (1 - precision) * abs(complex(expected))
+
+
+# Functions ___________________________________________________________________
+
+@pytest.mark.parametrize("exp", expressions())
+def test_functions_match_evalf(exp):
+    assert exp.func in FUNCTIONS
+    to_float(exp)
+    for precision in PRECISIONS:
+        assert_close(evalf(exp, precision), exp.evalf(precision), precision)
+
+
+@pytest.mark.parametrize("exp", CONSTANTS, ids=str)
+def test_constants_match_evalf(exp):
+    to_float(exp)
+    for precision in PRECISIONS:
+        assert_close(evalf(exp, precision), exp.evalf(precision), precision)
+
+
+# Precision ___________________________________________________________________
+
+@pytest.mark.parametrize("exp", CANCELLATIONS, ids=str)
+def test_cancellations_keep_the_precision(exp):
+    for precision in [5, 10, FLOAT_DIGITS]:
+        expected = exp.evalf(precision)
+        if expected == 0:
+            assert evalf(exp, precision) == 0
+        else:
+            assert_close(evalf(exp, precision), expected, precision)
+
+
+def test_high_precision_uses_evalf():
+    assert evalf(pi, 30) == pi.evalf(30)
+    assert str(evalf(pi, 30)) == "3.14159265358979323846264338328"
@@ -0,0 +1,99 @@
+"""
+Tests of the Symi server and of its clients.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+from os.path import join, dirname, abspath
+
+import pytest
+
+SYMI = join(dirname(abspath(__file__)), "..", "symi")
+ENV = {**os.environ, "PYTHONIOENCODING": "utf-8"}
+
+
+@pytest.fixture
+def server(tmp_path):
+    """
+    Path of the socket of a Symi server running during the test
+    """
+    path = str(tmp_path / "symi.sock")
+    process = subprocess.Popen([sys.executable, SYMI, "--serve", "--socket",
+                                path], stdout=subprocess.PIPE, text=True,
+                               env=ENV)
+    assert "listening" in process.stdout.readline()
+    yield path
+    process.send_signal(signal.SIGTERM)
+    process.wait(timeout=60)
+    process.stdout.close()
+
+
+def connect(path):
+    """
+    Connection to the server, as a file of lines
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(path)
+    connection.settimeout(60)
+    return connection, connection.makefile("rw", encoding="utf-8")
+
+
+def request(stream, session, line):
+    stream.write(json.dumps({"session": session, "line": line}) + "\n")
+    stream.flush()
+    return json.loads(stream.readline())
+
+
+def client(path, session, *lines):
+    return subprocess.run([sys.executable, SYMI, "--socket", path,
+                           "--session", session, "--client", *lines],
+                          capture_output=True, text=True, env=ENV,
+                          timeout=60)
+
+
+# Sessions ____________________________________________________________________
+
+def test_sessions_keep_their_variables(server):
+    assert client(server, "first", "a = 2").returncode == 0
+    assert client(server, "second", "a = 3").returncode == 0
+    assert client(server, "first", "a*x!").stdout == "2⋅x\n"
+    assert client(server, "second", "a*x!").stdout == "3⋅x\n"
+
+
+def test_exit_resets_the_session(server):
+    client(server, "reset", "a = 2", "exit")
+    assert client(server, "reset", "a!").stdout == "a\n"
+
+
+# Concurrent clients __________________________________________________________
+
+def test_idle_client_does_not_block_the_others(server):
+    idle, _ = connect(server)
+    try:
+        result = client(server, "other", "x**2")
+        assert result.returncode == 0
+        assert result.stdout == "\n 2\nx \n"
+    finally:
+        idle.close()
+
+
+def test_two_clients_at_once(server):
+    first, first_stream = connect(server)
+    second, second_stream = connect(server)
+    try:
+        assert request(first_stream, "first", "a = 2")["status"] == 1
+        assert request(second_stream, "second", "a = 3")["status"] == 1
+        assert request(first_stream, "first", "a*x!")["output"] == "2⋅x\n"
+        assert request(second_stream, "second", "a*x!")["output"] == \
+            "3⋅x\n"
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,73 @@
+"""
+Tests of the simplification levels of expr2sympy.cached_simplify().
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+
+import json
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+from os.path import join, dirname, abspath
+
+import pytest
+from sympy import symbols, sin, cos, exp, Eq, count_ops
+
+sys.path.insert(0, join(dirname(abspath(__file__)), "..", "symi"))
+
+from SymiInstance import SymiInstance  # noqa: E402
+from expr2sympy import expr2sympy, fast_simplify  # noqa: E402
+
+x, y, a = symbols("x y a")
+
+with open(join(dirname(abspath(__file__)), "expr_manager_baseline.json"),
+          encoding="utf-8") as baseline_file:
+    CORPUS = list(json.load(baseline_file))
+
+OPTIONS = {**SymiInstance(interactive=False).options, "simplify_level": "none"}
+
+
+def none_level(expr):
+    """
+    Expression of the corpus converted to Sympy without simplification, None
+    if it cannot be converted
+    """
+    try:
+        with redirect_stdout(StringIO()):
+            return expr2sympy(expr, OPTIONS, {}, False)
+    except Exception:
+        return None
+
+
+# Fast level __________________________________________________________________
+
+@pytest.mark.parametrize("expr, simplified", [
+    ((x ** 2 - 1) / (x - 1) + sin(x) ** 2 + cos(x) ** 2,
+     x + 1 + sin(x) ** 2 + cos(x) ** 2),
+    (sin((x ** 2 - 1) / (x - 1)), sin(x + 1)),
+    (x / (x - 1) - 1 / (x - 1), 1),
+    (x ** a * x ** 2, x ** (a + 2)),
+    (exp(x) * exp(y), exp(x + y)),
+    (Eq((x ** 2 - 1) / (x - 1), y), Eq(x + 1, y))])
+def test_fast_cancels_and_combines(expr, simplified):
+    assert fast_simplify(expr) == simplified
+
+
+@pytest.mark.parametrize("expr", [
+    (x + 1) ** 5, (x + y) ** 3 * (x - y), (x + 1) ** 12 / (y + 1),
+    sum((x + i) ** 12 / (y + i) for i in range(5)), x / (x - 1) + y / (x - 1)])
+def test_fast_does_not_expand(expr):
+    assert fast_simplify(expr) == expr
+
+
+def test_fast_is_never_longer_than_none():
+    for expr in CORPUS:
+        unsimplified = none_level(expr)
+        # Numbers and symbols are left as they are
+        if getattr(unsimplified, "is_Atom", True):
+            continue
+        simplified = fast_simplify(unsimplified)
+        assert count_ops(simplified) <= count_ops(unsimplified), expr
+        assert len(str(simplified)) <= len(str(unsimplified)), expr
@@ -0,0 +1,110 @@
+"""
+Tests of the variables substitution of variables.VariableStore.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+
+import sys
+from os.path import join, dirname, abspath
+
+import pytest
+from sympy import sympify, Symbol
+
+sys.path.insert(0, join(dirname(abspath(__file__)), "..", "symi"))
+
+from variables import VariableStore  # noqa: E402
+
+
+def store(**variables):
+    return VariableStore({name: sympify(value)
+                          for name, value in variables.items()})
+
+
+# Dependencies ________________________________________________________________
+
+def test_chain_is_substituted():
+    variables = store(a="b + 1", b="c * 2", c="x")
+    assert variables.resolve("a") == sympify("2*x + 1")
+    assert variables.substitute(sympify("a + c")) == sympify("3*x + 1")
+
+
+def test_free_symbols_are_kept():
+    variables = store(a="x + y")
+    assert variables.substitute(sympify("a * z")) == sympify("(x + y)*z")
+
+
+def test_variable_defined_after_its_dependents():
+    variables = store(a="b + 1")
+    assert variables.resolve("a") == sympify("b + 1")
+    variables["b"] = sympify("2")
+    assert variables.resolve("a") == 3
+
+
+# Invalidation ________________________________________________________________
+
+def test_redefinition_updates_dependents():
+    variables = store(a="b + 1", b="c", c="1")
+    assert variables.resolve("a") == 2
+    variables["c"] = sympify("5")
+    assert variables.resolve("a") == 6
+    variables["b"] = sympify("x")
+    assert variables.resolve("a") == sympify("x + 1")
+
+
+def test_redefinition_keeps_unrelated_values():
+    variables = store(a="b + 1", b="1", d="e", e="2")
+    variables.resolve("a")
+    variables.resolve("d")
+    variables["b"] = sympify("3")
+    assert "d" in variables._resolved
+    assert variables.resolve("a") == 4
+
+
+def test_deletion_updates_dependents():
+    variables = store(a="b + 1", b="1")
+    assert variables.resolve("a") == 2
+    del variables["b"]
+    assert variables.resolve("a") == sympify("b + 1")
+    variables["b"] = sympify("2")
+    variables.pop("b")
+    assert variables.resolve("a") == sympify("b + 1")
+
+
+def test_untracked_names_use_fixed_point():
+    variables = store(a="b + 1", b="2")
+    variables["f(x)"] = sympify("x**2")
+    assert variables.substitute(sympify("a + f(x)")) == sympify("x**2 + 3")
+
+
+# Cycles ______________________________________________________________________
+
+def test_self_reference():
+    variables = store(x="x + 1")
+    assert variables.resolve("x") == sympify("x + 1")
+
+
+@pytest.mark.parametrize("order", [["a", "b", "c"], ["b", "c", "a"],
+                                   ["c", "a", "b"], ["c", "b", "a"]])
+def test_cycle_does_not_depend_on_the_lookup_order(order):
+    variables = store(a="b + 1", b="a + 1", c="2*a")
+    resolved = {name: variables.resolve(name) for name in order}
+    assert resolved == {"a": sympify("a + 2"), "b": sympify("b + 2"),
+                        "c": sympify("2*a + 4")}
+
+
+def test_cycle_does_not_depend_on_the_definition_order():
+    first = store(a="b + 1", b="a * 2")
+    second = store(b="a * 2", a="b + 1")
+    for name in ["a", "b"]:
+        assert first.resolve(name) == second.resolve(name)
+    assert first.resolve("a") == sympify("2*a + 1")
+
+
+def test_cycle_is_broken_by_a_redefinition():
+    variables = store(a="b + 1", b="a + 1")
+    assert variables.resolve("a") == sympify("a + 2")
+    variables["b"] = sympify("1")
+    assert variables.resolve("a") == 2
+    assert variables.substitute(Symbol("b") + Symbol("a")) == 3
@@ -0,0 +1,89 @@
+"""
+Tests of the evaluation of expressions over arrays and of the tables.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+
+import json
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+from os.path import join, dirname, abspath
+
+sys.path.insert(0, join(dirname(abspath(__file__)), "..", "symi"))
+
+from SymiInstance import SymiInstance  # noqa: E402
+
+
+def run(lines):
+    """
+    Records of Symi command lines, evaluated in JSON output mode
+    """
+    symi = SymiInstance(interactive=False)
+    symi.options["output"] = "json"
+    output = StringIO()
+    with redirect_stdout(output):
+        for line in lines:
+            symi.parse_line(line)
+    return [json.loads(record) for record in output.getvalue().splitlines()]
+
+
+# Arrays ______________________________________________________________________
+
+def test_user_function_over_an_array():
+    record = run(["f(x) = x**2", "f(x) @ x in linspace(0, 1, 5)"])[-1]
+    assert record["array"] == {"values": 5, "not finite": 0, "min": 0.0,
+                               "max": 1.0, "mean": 0.375}
+
+
+def test_defined_array_variable_is_not_substituted():
+    record = run(["x = 3", "a = 2", "f(x) = a*x", "b = x + 1",
+                  "f(x) + b @ x in linspace(0, 2, 3)"])[-1]
+    assert record["array"]["min"] == 1.0
+    assert record["array"]["max"] == 7.0
+
+
+def test_undefined_variable_over_an_array():
+    record = run(["a*x @ x in linspace(0, 1, 5)"])[-1]
+    assert "a that must be defined" in record["error"]
+
+
+# Tables ______________________________________________________________________
+
+class Writes(list):
+    """
+    Standard output saving every text written in it
+    """
+
+    def write(self, text):
+        self.append(text)
+
+    def flush(self):
+        pass
+
+
+def test_small_json_table():
+    record = run(["table a*b for a in 0:1, b in 1:2"])[-1]
+    assert record["output"] == "a,b,value\n0.0,1.0,0.0\n0.0,2.0,0.0\n" \
+                               "1.0,1.0,1.0\n1.0,2.0,2.0\n"
+    assert record["status"] == 1
+
+
+def test_big_json_table_is_streamed():
+    symi = SymiInstance(interactive=False)
+    symi.options["output"] = "json"
+    writes = Writes()
+    with redirect_stdout(writes):
+        symi.parse_line("table a*b for a in 0:2999, b in 0:99")
+    text = "".join(writes)
+    assert text.endswith("\n") and text.count("\n") == 1
+    record = json.loads(text)
+    assert record["status"] == 1 and record["error"] is None
+    rows = record["output"].splitlines()
+    assert len(rows) == 300001
+    assert rows[0] == "a,b,value"
+    assert rows[-1] == "2999.0,99.0,296901.0"
+    # The table is written by chunks, not as a whole
+    assert max(map(len, writes)) < len(text) / 2